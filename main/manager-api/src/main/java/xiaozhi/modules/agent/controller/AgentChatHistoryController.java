@@ -1,19 +1,29 @@
 package xiaozhi.modules.agent.controller;
 
+import java.io.IOException;
+import java.util.List;
+
+import org.apache.commons.lang3.StringUtils;
+import org.springframework.http.MediaType;
 import org.springframework.web.bind.annotation.PostMapping;
 import org.springframework.web.bind.annotation.RequestBody;
 import org.springframework.web.bind.annotation.RequestMapping;
+import org.springframework.web.bind.annotation.RequestPart;
 import org.springframework.web.bind.annotation.RestController;
+import org.springframework.web.multipart.MultipartFile;
+import org.springframework.web.multipart.MultipartHttpServletRequest;
 
 import io.swagger.v3.oas.annotations.Operation;
 import io.swagger.v3.oas.annotations.tags.Tag;
 import jakarta.validation.Valid;
 import lombok.RequiredArgsConstructor;
+import lombok.extern.slf4j.Slf4j;
 import xiaozhi.common.utils.Result;
 import xiaozhi.modules.agent.dto.AgentChatHistoryReportDTO;
 import xiaozhi.modules.agent.service.biz.AgentChatHistoryBizService;
 
 @Tag(name = "智能体聊天历史管理")
+@Slf4j
 @RequiredArgsConstructor
 @RestController
 @RequestMapping("/agent/chat-history")
@@ -33,4 +43,63 @@ public class AgentChatHistoryController {
         Boolean result = agentChatHistoryBizService.report(request);
         return new Result<Boolean>().ok(result);
     }
+
+    /**
+     * 小智服务聊天批量上报请求
+     * <p>
+     * 小智服务把多条聊天记录合并为一次请求上报，每条记录单独处理，
+     * 个别记录失败不影响其他记录，避免整批重试造成重复记录。
+     *
+     * @param requests 聊天上报请求列表
+     * @return 处理成功的记录数
+     */
+    @Operation(summary = "小智服务聊天批量上报请求")
+    @PostMapping(value = "/report/batch", consumes = MediaType.APPLICATION_JSON_VALUE)
+    public Result<Integer> uploadFiles(@RequestBody List<AgentChatHistoryReportDTO> requests) {
+        int succeeded = 0;
+        for (AgentChatHistoryReportDTO request : requests) {
+            try {
+                if (Boolean.TRUE.equals(agentChatHistoryBizService.report(request))) {
+                    succeeded++;
+                }
+            } catch (Exception e) {
+                log.error("聊天记录批量上报中单条记录处理失败: macAddress={}", request.getMacAddress(), e);
+            }
+        }
+        return new Result<Integer>().ok(succeeded);
+    }
+
+    /**
+     * 小智服务聊天批量上报请求（multipart）
+     * <p>
+     * records字段为聊天记录的JSON数组，每条记录的音频作为单独的文件字段上传，
+     * 字段名由记录的audioPart指定，音频为Ogg封装的opus或WAV，不需要base64编码。
+     *
+     * @param records 聊天上报请求列表
+     * @param request multipart请求，用于按字段名读取音频文件
+     * @return 处理成功的记录数
+     */
+    @Operation(summary = "小智服务聊天批量上报请求（multipart）")
+    @PostMapping(value = "/report/batch", consumes = MediaType.MULTIPART_FORM_DATA_VALUE)
+    public Result<Integer> uploadMultipartFiles(@RequestPart("records") List<AgentChatHistoryReportDTO> records,
+            MultipartHttpServletRequest request) {
+        int succeeded = 0;
+        for (AgentChatHistoryReportDTO record : records) {
+            try {
+                byte[] audioData = null;
+                if (StringUtils.isNotBlank(record.getAudioPart())) {
+                    MultipartFile audio = request.getFile(record.getAudioPart());
+                    if (audio != null) {
+                        audioData = audio.getBytes();
+                    }
+                }
+                if (Boolean.TRUE.equals(agentChatHistoryBizService.report(record, audioData))) {
+                    succeeded++;
+                }
+            } catch (IOException | RuntimeException e) {
+                log.error("聊天记录批量上报中单条记录处理失败: macAddress={}", record.getMacAddress(), e);
+            }
+        }
+        return new Result<Integer>().ok(succeeded);
+    }
 }
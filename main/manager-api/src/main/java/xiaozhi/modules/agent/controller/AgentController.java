@@ -237,9 +237,13 @@ public class AgentController {
             return ResponseEntity.notFound().build();
         }
         redisUtils.delete(RedisKeys.getAgentAudioIdKey(uuid));
+        // 新版小智服务上报Ogg封装的opus，旧数据为WAV，按文件头区分
+        boolean ogg = audioData.length >= 4 && audioData[0] == 'O' && audioData[1] == 'g'
+                && audioData[2] == 'g' && audioData[3] == 'S';
         return ResponseEntity.ok()
-                .contentType(MediaType.APPLICATION_OCTET_STREAM)
-                .header(HttpHeaders.CONTENT_DISPOSITION, "attachment; filename=\"play.wav\"")
+                .contentType(MediaType.parseMediaType(ogg ? "audio/ogg" : "audio/wav"))
+                .header(HttpHeaders.CONTENT_DISPOSITION,
+                        "attachment; filename=\"play." + (ogg ? "ogg" : "wav") + "\"")
                 .body(audioData);
     }
 
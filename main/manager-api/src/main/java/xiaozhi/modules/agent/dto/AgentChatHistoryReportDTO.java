@@ -28,6 +28,10 @@ public class AgentChatHistoryReportDTO {
     private String content;
     @Schema(description = "base64编码的opus音频数据", example = "")
     private String audioBase64;
+    @Schema(description = "multipart上报时音频文件所在的表单字段名，空表示没有音频", example = "audio0")
+    private String audioPart;
+    @Schema(description = "multipart上报时的音频格式: ogg-Ogg封装的opus, wav-16kHz PCM", example = "ogg")
+    private String audioFormat;
     @Schema(description = "上报时间，十位时间戳，空时默认使用当前时间", example = "1745657732")
     private Long reportTime;
 }
@@ -19,4 +19,13 @@ public interface AgentChatHistoryBizService {
      * @return 上传结果，true表示成功，false表示失败
      */
     Boolean report(AgentChatHistoryReportDTO agentChatHistoryReportDTO);
+
+    /**
+     * 聊天上报方法，音频以二进制单独上传
+     *
+     * @param agentChatHistoryReportDTO 包含聊天上报所需信息的输入对象
+     * @param audioData                 音频数据（Ogg或WAV），为空表示没有音频
+     * @return 上传结果，true表示成功，false表示失败
+     */
+    Boolean report(AgentChatHistoryReportDTO agentChatHistoryReportDTO, byte[] audioData);
 }
@@ -48,6 +48,27 @@ public class AgentChatHistoryBizServiceImpl implements AgentChatHistoryBizServic
     @Override
     @Transactional(rollbackFor = Exception.class)
     public Boolean report(AgentChatHistoryReportDTO report) {
+        byte[] audioData = null;
+        if (report.getAudioBase64() != null && !report.getAudioBase64().isEmpty()) {
+            try {
+                audioData = Base64.getDecoder().decode(report.getAudioBase64());
+            } catch (IllegalArgumentException e) {
+                log.error("音频数据base64解码失败", e);
+            }
+        }
+        return report(report, audioData);
+    }
+
+    /**
+     * 处理聊天记录上报，音频以二进制单独上传
+     *
+     * @param report    包含聊天上报所需信息的输入对象
+     * @param audioData 音频数据，为空表示没有音频
+     * @return 上传结果，true表示成功，false表示失败
+     */
+    @Override
+    @Transactional(rollbackFor = Exception.class)
+    public Boolean report(AgentChatHistoryReportDTO report, byte[] audioData) {
         String macAddress = report.getMacAddress();
         Byte chatType = report.getChatType();
         Long reportTimeMillis = null != report.getReportTime() ? report.getReportTime() * 1000 : System.currentTimeMillis();
@@ -65,7 +86,7 @@ public class AgentChatHistoryBizServiceImpl implements AgentChatHistoryBizServic
         if (Objects.equals(chatHistoryConf, Constant.ChatHistoryConfEnum.RECORD_TEXT.getCode())) {
             saveChatText(report, agentId, macAddress, null, reportTimeMillis);
         } else if (Objects.equals(chatHistoryConf, Constant.ChatHistoryConfEnum.RECORD_TEXT_AUDIO.getCode())) {
-            String audioId = saveChatAudio(report);
+            String audioId = saveChatAudio(audioData);
             saveChatText(report, agentId, macAddress, audioId, reportTimeMillis);
         }
 
@@ -84,14 +105,13 @@ public class AgentChatHistoryBizServiceImpl implements AgentChatHistoryBizServic
     }
 
     /**
-     * base64解码report.getOpusDataBase64(),存入ai_agent_chat_audio表
+     * 音频数据存入ai_agent_chat_audio表
      */
-    private String saveChatAudio(AgentChatHistoryReportDTO report) {
+    private String saveChatAudio(byte[] audioData) {
         String audioId = null;
 
-        if (report.getAudioBase64() != null && !report.getAudioBase64().isEmpty()) {
+        if (audioData != null && audioData.length > 0) {
             try {
-                byte[] audioData = Base64.getDecoder().decode(report.getAudioBase64());
                 audioId = agentChatAudioService.saveAudio(audioData);
                 log.info("音频数据保存成功，audioId={}", audioId);
             } catch (Exception e) {
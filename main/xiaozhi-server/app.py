@@ -8,6 +8,7 @@ from config.logger import setup_logging
 from core.utils.util import get_local_ip, validate_mcp_endpoint
 from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
+from core.worker_supervisor import WorkerSupervisor
 from core.utils.util import check_ffmpeg_installed
 
 TAG = __name__
@@ -42,7 +43,22 @@ async def monitor_stdin():
         await ainput()  # 异步等待输入，消费回车
 
 
+def parse_args():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="小智服务端")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="websocket工作进程数，大于1时每个进程通过SO_REUSEPORT共同监听同一端口",
+    )
+    args, _ = parser.parse_known_args()
+    return args
+
+
 async def main():
+    args = parse_args()
     check_ffmpeg_installed()
     config = load_config()
 
@@ -54,12 +70,39 @@ async def main():
         auth_key = str(uuid.uuid4().hex)
     config["server"]["auth_key"] = auth_key
 
+    mcp_endpoint = config.get("mcp_endpoint", None)
+    if mcp_endpoint is not None and "你" not in mcp_endpoint:
+        # 校验MCP接入点格式
+        if validate_mcp_endpoint(mcp_endpoint):
+            logger.bind(tag=TAG).info("mcp接入点是\t{}", mcp_endpoint)
+            # 将mcp计入点地址转成调用点
+            mcp_endpoint = mcp_endpoint.replace("/mcp/", "/call/")
+            config["mcp_endpoint"] = mcp_endpoint
+        else:
+            logger.bind(tag=TAG).error("mcp接入点不符合规范")
+            config["mcp_endpoint"] = "你的接入点 websocket地址"
+
     # 添加 stdin 监控任务
     stdin_task = asyncio.create_task(monitor_stdin())
 
     # 启动 WebSocket 服务器
-    ws_server = WebSocketServer(config)
-    ws_task = asyncio.create_task(ws_server.start())
+    workers = args.workers
+    if workers > 1 and not WorkerSupervisor.supported():
+        logger.bind(tag=TAG).warning("当前系统不支持SO_REUSEPORT，使用单进程模式运行")
+        workers = 1
+    if workers > 1:
+        # 多进程模式：主进程只负责http服务和管理工作进程
+        supervisor = WorkerSupervisor(
+            workers,
+            {
+                "server": {"auth_key": auth_key},
+                "mcp_endpoint": config.get("mcp_endpoint"),
+            },
+        )
+        ws_task = asyncio.create_task(supervisor.run())
+    else:
+        ws_server = WebSocketServer(config)
+        ws_task = asyncio.create_task(ws_server.start())
     # 启动 Simple http 服务器
     ota_server = SimpleHttpServer(config)
     ota_task = asyncio.create_task(ota_server.start())
@@ -77,18 +120,6 @@ async def main():
         get_local_ip(),
         port,
     )
-    mcp_endpoint = config.get("mcp_endpoint", None)
-    if mcp_endpoint is not None and "你" not in mcp_endpoint:
-        # 校验MCP接入点格式
-        if validate_mcp_endpoint(mcp_endpoint):
-            logger.bind(tag=TAG).info("mcp接入点是\t{}", mcp_endpoint)
-            # 将mcp计入点地址转成调用点
-            mcp_endpoint = mcp_endpoint.replace("/mcp/", "/call/")
-            config["mcp_endpoint"] = mcp_endpoint
-        else:
-            logger.bind(tag=TAG).error("mcp接入点不符合规范")
-            config["mcp_endpoint"] = "你的接入点 websocket地址"
-
     # 获取WebSocket配置，使用安全的默认值
     websocket_port = 8000
     server_config = config.get("server", {})
@@ -0,0 +1,113 @@
+"""
+写时复制的分层配置
+
+每个连接原先都会deepcopy整份服务器配置（所有LLM/TTS/ASR提供者、插件、提示词），
+配置来自智控台时体积较大，每次连接都要复制一遍。这里改为分层：
+
+- 底层：所有连接共享的服务器配置，只读，不会被连接改动
+- 设备层：智控台下发的差异化配置，写入时直接引用，不复制
+- 连接层：LayeredConfig自身的存储，只保存对下层值的引用和本连接的修改
+
+读取嵌套的dict时才把这一层浅复制为新的LayeredConfig并记录在本层，list同样浅复制，
+之后对它的修改只落在本连接，未访问过的部分始终与底层共享。
+"""
+
+import copy
+
+import yaml
+
+
+class LayeredConfig(dict):
+    """写时复制的配置，可以像dict一样读写、序列化
+
+    list中的dict不做复制，与底层共享，不要原地修改。
+    """
+
+    __slots__ = ("_owned",)
+
+    def __init__(self, *layers):
+        """layers按优先级从低到高传入，每层只复制顶层的引用"""
+        super().__init__()
+        for layer in layers:
+            if layer:
+                dict.update(self, layer)
+        # 已复制到本层、可以直接修改的键
+        self._owned = set()
+
+    def _own(self, key, value):
+        if key in self._owned:
+            return value
+        if isinstance(value, dict):
+            value = LayeredConfig(value)
+        elif isinstance(value, list):
+            value = list(value)
+        else:
+            return value
+        dict.__setitem__(self, key, value)
+        self._owned.add(key)
+        return value
+
+    def __getitem__(self, key):
+        return self._own(key, dict.__getitem__(self, key))
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._owned.add(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._owned.discard(key)
+
+    def __iter__(self):
+        # 覆盖__iter__后dict(config)、{**config}会经过__getitem__，不会拿到底层的原始引用
+        return dict.__iter__(self)
+
+    def get(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self[key]
+        self[key] = default
+        return default
+
+    def pop(self, key, *default):
+        if not dict.__contains__(self, key):
+            return dict.pop(self, key, *default)
+        value = self[key]
+        del self[key]
+        return value
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def items(self):
+        return [(key, self[key]) for key in dict.keys(self)]
+
+    def values(self):
+        return [self[key] for key in dict.keys(self)]
+
+    def copy(self):
+        return LayeredConfig(self)
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return {
+            key: copy.deepcopy(value, memo) for key, value in dict.items(self)
+        }
+
+    def __reduce__(self):
+        return (dict, (dict(self.items()),))
+
+
+def _represent_layered_config(dumper, data):
+    return dumper.represent_dict(data)
+
+
+yaml.add_representer(LayeredConfig, _represent_layered_config, Dumper=yaml.SafeDumper)
+yaml.add_representer(LayeredConfig, _represent_layered_config, Dumper=yaml.Dumper)
@@ -1,10 +1,11 @@
 import json
-import copy
 from aiohttp import web
 from config.logger import setup_logging
+from config.layered_config import LayeredConfig
 from core.utils.util import get_vision_url, is_valid_image_file
-from core.utils.vllm import create_instance
-from config.config_loader import get_private_config_from_api
+from core.utils.vllm import acquire_instance
+from core.utils.provider_registry import provider_registry
+from core.utils.private_config import private_config_service
 from core.utils.auth import AuthToken
 import base64
 from typing import Tuple, Optional
@@ -22,6 +23,9 @@ class VisionHandler:
         self.logger = setup_logging()
         # 初始化认证工具
         self.auth = AuthToken(config["server"]["auth_key"])
+        # 多进程模式下主进程不创建WebSocketServer，这里设置差异化配置缓存和共享实例池
+        private_config_service.configure(config)
+        provider_registry.configure(config)
 
     def _create_error_response(self, message: str) -> dict:
         """创建统一的错误响应格式"""
@@ -93,10 +97,10 @@ class VisionHandler:
             image_base64 = base64.b64encode(image_data).decode("utf-8")
 
             # 如果开启了智控台，则从智控台获取模型配置
-            current_config = copy.deepcopy(self.config)
+            current_config = LayeredConfig(self.config)
             read_config_from_api = current_config.get("read_config_from_api", False)
             if read_config_from_api:
-                current_config = get_private_config_from_api(
+                current_config = await private_config_service.get(
                     current_config,
                     device_id,
                     client_id,
@@ -115,11 +119,13 @@ class VisionHandler:
             if not vllm_type:
                 raise ValueError(f"无法找到VLLM模块对应的供应器{vllm_type}")
 
-            vllm = create_instance(
+            vllm = acquire_instance(
                 vllm_type, current_config["VLLM"][select_vllm_module]
             )
-
-            result = vllm.response(question, image_base64)
+            try:
+                result = vllm.response(question, image_base64)
+            finally:
+                provider_registry.release(vllm)
 
             return_json = {
                 "success": True,
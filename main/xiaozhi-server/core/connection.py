@@ -1,6 +1,5 @@
 import os
 import sys
-import copy
 import json
 import uuid
 import time
@@ -17,7 +16,6 @@ from core.utils.util import (
     filter_sensitive_info,
 )
 from typing import Dict, Any
-from collections import deque
 from core.utils.modules_initialize import (
     initialize_modules,
     initialize_tts,
@@ -25,21 +23,26 @@ from core.utils.modules_initialize import (
 )
 from core.handle.reportHandle import report
 from core.providers.tts.default import DefaultTTS
-from concurrent.futures import ThreadPoolExecutor
-from core.utils.dialogue import Message, Dialogue
+from core.utils.dialogue import Message, Dialogue, summarize_dialogue
 from core.providers.asr.dto.dto import InterfaceType
 from core.handle.textHandle import handleTextMessage
 from core.providers.tools.unified_tool_handler import UnifiedToolHandler
 from plugins_func.loadplugins import auto_import_modules
 from plugins_func.register import Action, ActionResponse
 from core.auth import AuthMiddleware, AuthenticationError
-from config.config_loader import get_private_config_from_api
+from core.utils.private_config import private_config_service
 from core.providers.tts.dto.dto import ContentType, TTSMessageDTO, SentenceType
 from config.logger import setup_logging, build_module_string, create_connection_logger
+from config.layered_config import LayeredConfig
 from config.manage_api_client import DeviceNotFoundException, DeviceBindException
 from core.utils.prompt_manager import PromptManager
 from core.utils.voiceprint_provider import VoiceprintProvider
 from core.utils import textUtils
+from core.utils.worker_pool import worker_pool, in_loop_thread, LoopQueue
+from core.utils.provider_registry import provider_registry
+from core.utils import llm as llm_utils
+from core.utils.tool_calls import ToolCallAccumulator
+from core.worker_supervisor import is_worker_process, request_restart
 
 TAG = __name__
 
@@ -62,7 +65,8 @@ class ConnectionHandler:
         server=None,
     ):
         self.common_config = config
-        self.config = copy.deepcopy(config)
+        # 写时复制，只有本连接修改过的部分才会复制，其余与服务器配置共享
+        self.config = LayeredConfig(config)
         self.session_id = str(uuid.uuid4())
         self.logger = setup_logging()
         self.server = server  # 保存server实例的引用
@@ -84,17 +88,27 @@ class ConnectionHandler:
 
         # 客户端状态相关
         self.client_abort = False
+        # 本轮对话的开始时间，用于计算工具执行的截止时间
+        self.turn_started_at = None
         self.client_is_speaking = False
         self.client_listen_mode = "auto"
 
         # 线程任务相关
         self.loop = asyncio.get_event_loop()
         self.stop_event = threading.Event()
-        self.executor = ThreadPoolExecutor(max_workers=5)
-
-        # 添加上报线程池
-        self.report_queue = queue.Queue()
-        self.report_thread = None
+        # 阻塞的对话调用使用服务共享的线程池，线程数不随连接数增长
+        self.executor = worker_pool.executor("llm")
+        # 连接流水线上的asyncio任务，关闭连接时统一取消
+        self.pipeline_tasks = []
+        # 当前正在进行的对话任务，用户打断时取消，同时关闭上游的LLM流
+        self.chat_task = None
+        # 与意图识别并行推测的对话，意图判定前输出不送入TTS
+        self.chat_speculation = None
+        self.speculative_chat = False
+
+        # 上报队列，由事件循环上的上报任务消费
+        self.report_queue = LoopQueue(self.loop)
+        self.report_task_started = False
         # 未来可以通过修改此处，调节asr的上报和tts的上报，目前默认都开启
         self.report_asr_enable = self.read_config_from_api
         self.report_tts_enable = self.read_config_from_api
@@ -108,27 +122,35 @@ class ConnectionHandler:
         self.llm = _llm
         self.memory = _memory
         self.intent = _intent
+        # 从共享实例池获取的提供者，连接关闭时归还
+        self._provider_refs = []
 
         # 为每个连接单独管理声纹识别
         self.voiceprint_provider = None
 
         # vad相关变量
-        self.client_audio_buffer = bytearray()
+        # 解码器、音频缓冲区和双阈值状态由VAD按连接创建，见VADStream
+        self.vad_stream = None
         self.client_have_voice = False
         self.last_activity_time = 0.0  # 统一的活动时间戳（毫秒）
         self.client_voice_stop = False
-        self.client_voice_window = deque(maxlen=5)
-        self.last_is_voice = False
 
         # asr相关变量
         # 因为实际部署时可能会用到公共的本地ASR，不能把变量暴露给公共ASR
         # 所以涉及到ASR的变量，需要在这里定义，属于connection的私有变量
         self.asr_audio = []
-        self.asr_audio_queue = queue.Queue()
+        self.asr_audio_queue = asyncio.Queue()
+        # 本地增量识别的识别流，见IncrementalASRStream
+        self.asr_stream = None
 
         # llm相关变量
         self.llm_finish_task = True
-        self.dialogue = Dialogue()
+        dialogue_config = self.config.get("dialogue") or {}
+        stable_prefix = (self.config.get("prompt_cache") or {}).get("stable_prefix")
+        self.dialogue = Dialogue(
+            max_tokens=int(dialogue_config.get("max_prompt_tokens") or 0),
+            stable_prefix=str(stable_prefix).lower() in ("true", "1", "yes"),
+        )
 
         # tts相关变量
         self.sentence_id = None
@@ -208,9 +230,9 @@ class ConnectionHandler:
             self.welcome_msg["session_id"] = self.session_id
 
             # 获取差异化配置
-            self._initialize_private_config()
+            await self._initialize_private_config()
             # 异步初始化
-            self.executor.submit(self._initialize_components)
+            worker_pool.submit("connection", self._initialize_components)
 
             try:
                 async for message in self.websocket:
@@ -249,7 +271,9 @@ class ConnectionHandler:
                         loop = asyncio.new_event_loop()
                         asyncio.set_event_loop(loop)
                         loop.run_until_complete(
-                            self.memory.save_memory(self.dialogue.dialogue)
+                            self.memory.save_memory(
+                                self.dialogue.get_messages_for_memory()
+                            )
                         )
                     except Exception as e:
                         self.logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
@@ -259,8 +283,8 @@ class ConnectionHandler:
                         except Exception:
                             pass
 
-                # 启动线程保存记忆，不等待完成
-                threading.Thread(target=save_memory_task, daemon=True).start()
+                # 在共享线程池中保存记忆，不等待完成
+                worker_pool.submit("llm", save_memory_task)
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
         finally:
@@ -281,7 +305,7 @@ class ConnectionHandler:
                 return
             if self.asr is None:
                 return
-            self.asr_audio_queue.put(message)
+            self.asr_audio_queue.put_nowait(message)
 
     async def handle_restart(self, message):
         """处理服务器重启请求"""
@@ -315,8 +339,12 @@ class ConnectionHandler:
                 )
                 os._exit(0)
 
-            # 使用线程执行重启避免阻塞事件循环
-            threading.Thread(target=restart_server, daemon=True).start()
+            if is_worker_process():
+                # 多进程模式由主进程依次重启所有工作进程
+                request_restart()
+            else:
+                # 使用线程执行重启避免阻塞事件循环
+                threading.Thread(target=restart_server, daemon=True).start()
 
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"重启失败: {str(e)}")
@@ -370,6 +398,7 @@ class ConnectionHandler:
 
             """加载记忆"""
             self._initialize_memory()
+            self._initialize_dialogue_summary()
             """加载意图识别"""
             self._initialize_intent()
             """初始化上报线程"""
@@ -390,18 +419,36 @@ class ConnectionHandler:
             self.change_system_prompt(enhanced_prompt)
             self.logger.bind(tag=TAG).info("系统提示词已增强更新")
 
+    def create_pipeline_task(self, coro):
+        """在连接的事件循环上启动流水线任务，可以在任意线程调用"""
+
+        def start():
+            if self.stop_event.is_set():
+                coro.close()
+                return
+            task = self.loop.create_task(coro)
+            self.pipeline_tasks.append(task)
+            task.add_done_callback(self._discard_pipeline_task)
+
+        if in_loop_thread(self.loop):
+            start()
+        else:
+            self.loop.call_soon_threadsafe(start)
+
+    def _discard_pipeline_task(self, task):
+        if task in self.pipeline_tasks:
+            self.pipeline_tasks.remove(task)
+
     def _init_report_threads(self):
-        """初始化ASR和TTS上报线程"""
+        """初始化ASR和TTS上报任务"""
         if not self.read_config_from_api or self.need_bind:
             return
         if self.chat_history_conf == 0:
             return
-        if self.report_thread is None or not self.report_thread.is_alive():
-            self.report_thread = threading.Thread(
-                target=self._report_worker, daemon=True
-            )
-            self.report_thread.start()
-            self.logger.bind(tag=TAG).info("TTS上报线程已启动")
+        if not self.report_task_started:
+            self.report_task_started = True
+            self.create_pipeline_task(self._report_worker())
+            self.logger.bind(tag=TAG).info("TTS上报任务已启动")
 
     def _initialize_tts(self):
         """初始化TTS"""
@@ -439,21 +486,21 @@ class ConnectionHandler:
         except Exception as e:
             self.logger.bind(tag=TAG).warning(f"声纹识别初始化失败: {str(e)}")
 
-    def _initialize_private_config(self):
+    async def _initialize_private_config(self):
         """如果是从配置文件获取，则进行二次实例化"""
         if not self.read_config_from_api:
             return
         """从接口获取差异化的配置进行二次实例化，非全量重新实例化"""
         try:
             begin_time = time.time()
-            private_config = get_private_config_from_api(
+            private_config = await private_config_service.get(
                 self.config,
                 self.headers.get("device-id"),
                 self.headers.get("client-id", self.headers.get("device-id")),
             )
             private_config["delete_audio"] = bool(self.config.get("delete_audio", True))
             self.logger.bind(tag=TAG).info(
-                f"{time.time() - begin_time} 秒，获取差异化配置成功: {json.dumps(filter_sensitive_info(private_config), ensure_ascii=False)}"
+                f"{time.time() - begin_time} 秒，获取差异化配置成功: {filter_sensitive_info(private_config)}"
             )
         except DeviceNotFoundException as e:
             self.need_bind = True
@@ -538,16 +585,25 @@ class ConnectionHandler:
         if private_config.get("mcp_endpoint", None) is not None:
             self.config["mcp_endpoint"] = private_config["mcp_endpoint"]
         try:
-            modules = initialize_modules(
+            # LLM从共享实例池获取，配置相同的设备共用一个实例
+            modules = await worker_pool.run(
+                "connection",
+                initialize_modules,
                 self.logger,
                 private_config,
                 init_vad,
                 init_asr,
-                init_llm,
+                False,
                 init_tts,
                 init_memory,
                 init_intent,
             )
+            if init_llm:
+                modules["llm"] = await worker_pool.run(
+                    "connection",
+                    self._acquire_llm,
+                    self.config["selected_module"]["LLM"],
+                )
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"初始化组件失败: {e}")
             modules = {}
@@ -564,6 +620,14 @@ class ConnectionHandler:
         if modules.get("memory", None) is not None:
             self.memory = modules["memory"]
 
+    def _acquire_llm(self, llm_name):
+        """从共享实例池获取LLM实例，连接关闭时归还"""
+        llm_config = self.config["LLM"][llm_name]
+        llm_type = llm_config.get("type", llm_name)
+        llm = llm_utils.acquire_instance(llm_type, llm_config)
+        self._provider_refs.append(llm)
+        return llm
+
     def _initialize_memory(self):
         if self.memory is None:
             return
@@ -589,16 +653,10 @@ class ConnectionHandler:
                 "llm"
             ]
             if memory_llm_name and memory_llm_name in self.config["LLM"]:
-                # 如果配置了专用LLM，则创建独立的LLM实例
-                from core.utils import llm as llm_utils
-
-                memory_llm_config = self.config["LLM"][memory_llm_name]
-                memory_llm_type = memory_llm_config.get("type", memory_llm_name)
-                memory_llm = llm_utils.create_instance(
-                    memory_llm_type, memory_llm_config
-                )
+                # 如果配置了专用LLM，则使用该配置的共享LLM实例
+                memory_llm = self._acquire_llm(memory_llm_name)
                 self.logger.bind(tag=TAG).info(
-                    f"为记忆总结创建了专用LLM: {memory_llm_name}, 类型: {memory_llm_type}"
+                    f"为记忆总结使用专用LLM: {memory_llm_name}"
                 )
                 self.memory.set_llm(memory_llm)
             else:
@@ -606,6 +664,25 @@ class ConnectionHandler:
                 self.memory.set_llm(self.llm)
                 self.logger.bind(tag=TAG).info("使用主LLM作为意图识别模型")
 
+    def _initialize_dialogue_summary(self):
+        """上下文超出上限时，用记忆总结模型把移出的早期对话压缩为摘要"""
+        dialogue_config = self.config.get("dialogue") or {}
+        if str(dialogue_config.get("summarize_evicted", False)).lower() not in (
+            "true",
+            "1",
+            "yes",
+        ):
+            return
+
+        def summarizer(summary, messages):
+            # 记忆模块没有专用LLM时使用主LLM
+            llm = getattr(self.memory, "llm", None) or self.llm
+            if llm is None:
+                return None
+            return summarize_dialogue(llm, summary, messages)
+
+        self.dialogue.summarizer = summarizer
+
     def _initialize_intent(self):
         if self.intent is None:
             return
@@ -614,6 +691,15 @@ class ConnectionHandler:
         ]["type"]
         if self.intent_type == "function_call" or self.intent_type == "intent_llm":
             self.load_function_plugin = True
+        if self.intent_type == "intent_llm":
+            speculative_chat = self.config["Intent"][
+                self.config["selected_module"]["Intent"]
+            ].get("speculative_chat", False)
+            self.speculative_chat = str(speculative_chat).lower() in (
+                "true",
+                "1",
+                "yes",
+            )
         """初始化意图识别模块"""
         # 获取意图识别配置
         intent_config = self.config["Intent"]
@@ -631,16 +717,10 @@ class ConnectionHandler:
             ]
 
             if intent_llm_name and intent_llm_name in self.config["LLM"]:
-                # 如果配置了专用LLM，则创建独立的LLM实例
-                from core.utils import llm as llm_utils
-
-                intent_llm_config = self.config["LLM"][intent_llm_name]
-                intent_llm_type = intent_llm_config.get("type", intent_llm_name)
-                intent_llm = llm_utils.create_instance(
-                    intent_llm_type, intent_llm_config
-                )
+                # 如果配置了专用LLM，则使用该配置的共享LLM实例
+                intent_llm = self._acquire_llm(intent_llm_name)
                 self.logger.bind(tag=TAG).info(
-                    f"为意图识别创建了专用LLM: {intent_llm_name}, 类型: {intent_llm_type}"
+                    f"为意图识别使用专用LLM: {intent_llm_name}"
                 )
                 self.intent.set_llm(intent_llm)
             else:
@@ -660,20 +740,56 @@ class ConnectionHandler:
         # 更新系统prompt至上下文
         self.dialogue.update_system_message(self.prompt)
 
-    def chat(self, query, depth=0):
+    def start_chat(self, query, speculation=None):
+        """在事件循环上启动一轮对话，需要在事件循环线程中调用"""
+        pending, self.chat_speculation = self.chat_speculation, speculation
+        if pending is not None and not pending.done:
+            if speculation is None and pending.query == query:
+                # 意图识别期间已推测启动了同一句话的对话，直接放行
+                pending.commit()
+                return pending.task
+            pending.discard()
+        self.chat_task = self.loop.create_task(
+            self.chat(query, speculation=speculation)
+        )
+        return self.chat_task
+
+    def cancel_chat(self):
+        """取消正在进行的对话，LLM的上游流随之关闭"""
+        speculation, self.chat_speculation = self.chat_speculation, None
+        if speculation is not None:
+            # 任务可能还没开始运行，需要显式丢弃，避免之后被放行
+            speculation.discard()
+        if self.chat_task is not None and not self.chat_task.done():
+            self.chat_task.cancel()
+            # 被取消的对话不会再发送LAST，之后的唤醒词回复、工具回复需要据此发送tts stop
+            self.llm_finish_task = True
+        self.chat_task = None
+
+    async def chat(self, query, depth=0, speculation=None):
         self.logger.bind(tag=TAG).info(f"大模型收到用户消息: {query}")
         self.llm_finish_task = False
+        # 推测的对话在意图判定前不向外输出
+        emit = (
+            speculation.defer
+            if speculation is not None
+            else lambda fn, *args: fn(*args)
+        )
 
         # 为最顶层时新建会话ID和发送FIRST请求
         if depth == 0:
             self.sentence_id = str(uuid.uuid4().hex)
-            self.dialogue.put(Message(role="user", content=query))
-            self.tts.tts_text_queue.put(
+            user_message = Message(role="user", content=query)
+            self.dialogue.put(user_message)
+            if speculation is not None:
+                speculation.user_message = user_message
+            emit(
+                self.tts.tts_text_queue.put,
                 TTSMessageDTO(
                     sentence_id=self.sentence_id,
                     sentence_type=SentenceType.FIRST,
                     content_type=ContentType.ACTION,
-                )
+                ),
             )
 
         # Define intent functions
@@ -686,14 +802,11 @@ class ConnectionHandler:
             # 使用带记忆的对话
             memory_str = None
             if self.memory is not None:
-                future = asyncio.run_coroutine_threadsafe(
-                    self.memory.query_memory(query), self.loop
-                )
-                memory_str = future.result()
+                memory_str = await self.memory.query_memory(query)
 
             if self.intent_type == "function_call" and functions is not None:
                 # 使用支持functions的streaming接口
-                llm_responses = self.llm.response_with_functions(
+                llm_responses = self.llm.aresponse_with_functions(
                     self.session_id,
                     self.dialogue.get_llm_dialogue_with_memory(
                         memory_str, self.config.get("voiceprint", {})
@@ -701,7 +814,7 @@ class ConnectionHandler:
                     functions=functions,
                 )
             else:
-                llm_responses = self.llm.response(
+                llm_responses = self.llm.aresponse(
                     self.session_id,
                     self.dialogue.get_llm_dialogue_with_memory(
                         memory_str, self.config.get("voiceprint", {})
@@ -709,108 +822,122 @@ class ConnectionHandler:
                 )
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
+            if speculation is not None:
+                speculation.discard()
             return None
 
         # 处理流式响应
         tool_call_flag = False
-        function_name = None
-        function_id = None
-        function_arguments = ""
+        # 一次回复中可能有多个工具调用，按index累积
+        tool_calls = ToolCallAccumulator()
         content_arguments = ""
         self.client_abort = False
         emotion_flag = True
-        for response in llm_responses:
-            if self.client_abort:
-                break
-            if self.intent_type == "function_call" and functions is not None:
-                content, tools_call = response
-                if "content" in response:
-                    content = response["content"]
-                    tools_call = None
-                if content is not None and len(content) > 0:
-                    content_arguments += content
-
-                if not tool_call_flag and content_arguments.startswith("<tool_call>"):
-                    # print("content_arguments", content_arguments)
-                    tool_call_flag = True
-
-                if tools_call is not None and len(tools_call) > 0:
-                    tool_call_flag = True
-                    if tools_call[0].id is not None:
-                        function_id = tools_call[0].id
-                    if tools_call[0].function.name is not None:
-                        function_name = tools_call[0].function.name
-                    if tools_call[0].function.arguments is not None:
-                        function_arguments += tools_call[0].function.arguments
-            else:
-                content = response
+        try:
+            async for response in llm_responses:
+                if self.client_abort:
+                    break
+                if self.intent_type == "function_call" and functions is not None:
+                    content, tools_call = response
+                    if "content" in response:
+                        content = response["content"]
+                        tools_call = None
+                    if content is not None and len(content) > 0:
+                        content_arguments += content
+
+                    if not tool_call_flag and content_arguments.startswith("<tool_call>"):
+                        # print("content_arguments", content_arguments)
+                        tool_call_flag = True
+
+                    if tools_call is not None and len(tools_call) > 0:
+                        tool_call_flag = True
+                        tool_calls.feed(tools_call)
+                else:
+                    content = response
 
-            # 在llm回复中获取情绪表情，一轮对话只在开头获取一次
-            if emotion_flag and content is not None and content.strip():
-                asyncio.run_coroutine_threadsafe(
-                    textUtils.get_emotion(self, content),
-                    self.loop,
-                )
-                emotion_flag = False
-
-            if content is not None and len(content) > 0:
-                if not tool_call_flag:
-                    response_message.append(content)
-                    self.tts.tts_text_queue.put(
-                        TTSMessageDTO(
-                            sentence_id=self.sentence_id,
-                            sentence_type=SentenceType.MIDDLE,
-                            content_type=ContentType.TEXT,
-                            content_detail=content,
+                # 在llm回复中获取情绪表情，一轮对话只在开头获取一次
+                if emotion_flag and content is not None and content.strip():
+                    emit(self._send_emotion, content)
+                    emotion_flag = False
+
+                if content is not None and len(content) > 0:
+                    if speculation is not None:
+                        speculation.on_content(content)
+                    if not tool_call_flag:
+                        response_message.append(content)
+                        emit(
+                            self.tts.tts_text_queue.put,
+                            TTSMessageDTO(
+                                sentence_id=self.sentence_id,
+                                sentence_type=SentenceType.MIDDLE,
+                                content_type=ContentType.TEXT,
+                                content_detail=content,
+                            ),
                         )
-                    )
+        except asyncio.CancelledError:
+            # 被新的对话或打断消息取消，不再写入对话记录、发送结束标记或执行工具调用，
+            # 继续向上抛出，递归的工具调用轮次也随之结束
+            # llm_finish_task由cancel_chat恢复，这里不修改，新一轮对话可能已经开始
+            self.logger.bind(tag=TAG).info(f"对话被打断: {query}")
+            if speculation is not None:
+                # 意图判定前被打断的推测对话直接丢弃
+                speculation.discard()
+            raise
+        finally:
+            # 提前结束迭代时关闭LLM流，释放上游连接
+            await llm_responses.aclose()
+
+        if speculation is not None:
+            # 回复先于意图识别结束时，等待判定后再决定是否输出
+            try:
+                committed = await speculation.wait()
+            except asyncio.CancelledError:
+                speculation.discard()
+                raise
+            speculation.finish()
+            if not committed:
+                self.logger.bind(tag=TAG).info(f"丢弃推测的对话: {query}")
+                self.llm_finish_task = True
+                return None
+
         # 处理function call
         if tool_call_flag:
-            bHasError = False
-            if function_id is None:
+            function_calls = tool_calls.calls()
+            if not function_calls:
+                # 部分模型以<tool_call>文本的形式返回单个工具调用
                 a = extract_json_from_string(content_arguments)
-                if a is not None:
-                    try:
-                        content_arguments_json = json.loads(a)
-                        function_name = content_arguments_json["name"]
-                        function_arguments = json.dumps(
-                            content_arguments_json["arguments"], ensure_ascii=False
-                        )
-                        function_id = str(uuid.uuid4().hex)
-                    except Exception as e:
-                        bHasError = True
-                        response_message.append(a)
-                else:
-                    bHasError = True
-                    response_message.append(content_arguments)
-                if bHasError:
+                try:
+                    content_arguments_json = json.loads(a)
+                    function_calls = [
+                        {
+                            "name": content_arguments_json["name"],
+                            "id": str(uuid.uuid4().hex),
+                            "arguments": json.dumps(
+                                content_arguments_json["arguments"], ensure_ascii=False
+                            ),
+                        }
+                    ]
+                except Exception as e:
+                    response_message.append(a if a is not None else content_arguments)
                     self.logger.bind(tag=TAG).error(
                         f"function call error: {content_arguments}"
                     )
-            if not bHasError:
+            if function_calls:
                 # 如需要大模型先处理一轮，添加相关处理后的日志情况
                 if len(response_message) > 0:
                     text_buff = "".join(response_message)
                     self.tts_MessageText = text_buff
                     self.dialogue.put(Message(role="assistant", content=text_buff))
                 response_message.clear()
-                self.logger.bind(tag=TAG).debug(
-                    f"function_name={function_name}, function_id={function_id}, function_arguments={function_arguments}"
+                self.logger.bind(tag=TAG).debug(f"function_calls={function_calls}")
+
+                # 相互独立的工具并发执行，结果按调用顺序返回
+                results = await self.func_handler.handle_llm_function_calls(
+                    self, function_calls
+                )
+                await self._handle_function_results(
+                    function_calls, results, depth=depth
                 )
-                function_call_data = {
-                    "name": function_name,
-                    "id": function_id,
-                    "arguments": function_arguments,
-                }
-
-                # 使用统一工具处理器处理所有工具调用
-                result = asyncio.run_coroutine_threadsafe(
-                    self.func_handler.handle_llm_function_call(
-                        self, function_call_data
-                    ),
-                    self.loop,
-                ).result()
-                self._handle_function_result(result, function_call_data, depth=depth)
 
         # 存储对话内容
         if len(response_message) > 0:
@@ -835,73 +962,73 @@ class ConnectionHandler:
 
         return True
 
-    def _handle_function_result(self, result, function_call_data, depth):
-        if result.action == Action.RESPONSE:  # 直接回复前端
-            text = result.response
-            self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
-            self.dialogue.put(Message(role="assistant", content=text))
-        elif result.action == Action.REQLLM:  # 调用函数后再请求llm生成回复
-            text = result.result
-            if text is not None and len(text) > 0:
-                function_id = function_call_data["id"]
-                function_name = function_call_data["name"]
-                function_arguments = function_call_data["arguments"]
-                self.dialogue.put(
-                    Message(
-                        role="assistant",
-                        tool_calls=[
-                            {
-                                "id": function_id,
-                                "function": {
-                                    "arguments": "{}" if function_arguments == "" else function_arguments,
-                                    "name": function_name,
-                                },
-                                "type": "function",
-                                "index": 0,
-                            }
-                        ],
-                    )
-                )
+    def _send_emotion(self, content):
+        self.create_pipeline_task(textUtils.get_emotion(self, content))
 
-                self.dialogue.put(
-                    Message(
-                        role="tool",
-                        tool_call_id=(
-                            str(uuid.uuid4()) if function_id is None else function_id
-                        ),
-                        content=text,
-                    )
+    async def _handle_function_results(self, function_calls, results, depth):
+        """处理一次回复中所有工具调用的结果，需要大模型继续处理的结果合并为一次请求"""
+        llm_calls = []
+        for function_call_data, result in zip(function_calls, results):
+            if result is None:
+                continue
+            if result.action == Action.RESPONSE:  # 直接回复前端
+                text = result.response
+                self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
+                self.dialogue.put(Message(role="assistant", content=text))
+            elif result.action == Action.REQLLM:  # 调用函数后再请求llm生成回复
+                text = result.result
+                if text is not None and len(text) > 0:
+                    llm_calls.append((function_call_data, text))
+            elif result.action == Action.NOTFOUND or result.action == Action.ERROR:
+                text = result.response if result.response else result.result
+                self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
+                self.dialogue.put(Message(role="assistant", content=text))
+
+        if not llm_calls:
+            return
+
+        self.dialogue.put(
+            Message(
+                role="assistant",
+                tool_calls=[
+                    {
+                        "id": function_call_data["id"],
+                        "function": {
+                            "arguments": function_call_data["arguments"] or "{}",
+                            "name": function_call_data["name"],
+                        },
+                        "type": "function",
+                        "index": index,
+                    }
+                    for index, (function_call_data, _) in enumerate(llm_calls)
+                ],
+            )
+        )
+        for function_call_data, text in llm_calls:
+            self.dialogue.put(
+                Message(
+                    role="tool",
+                    tool_call_id=function_call_data["id"],
+                    content=text,
                 )
-                self.chat(text, depth=depth + 1)
-        elif result.action == Action.NOTFOUND or result.action == Action.ERROR:
-            text = result.response if result.response else result.result
-            self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
-            self.dialogue.put(Message(role="assistant", content=text))
-        else:
-            pass
+            )
+        # 所有工具结果一起交给大模型生成回复
+        await self.chat(
+            "\n".join(text for _, text in llm_calls), depth=depth + 1
+        )
 
-    def _report_worker(self):
-        """聊天记录上报工作线程"""
+    async def _report_worker(self):
+        """聊天记录上报任务，音频转码在共享线程池中执行，之后交给report_dispatcher批量上报"""
         while not self.stop_event.is_set():
+            item = await self.report_queue.get()
+            if item is None:  # 检测毒丸对象
+                break
             try:
-                # 从队列获取数据，设置超时以便定期检查停止事件
-                item = self.report_queue.get(timeout=1)
-                if item is None:  # 检测毒丸对象
-                    break
-                try:
-                    # 检查线程池状态
-                    if self.executor is None:
-                        continue
-                    # 提交任务到线程池
-                    self.executor.submit(self._process_report, *item)
-                except Exception as e:
-                    self.logger.bind(tag=TAG).error(f"聊天记录上报线程异常: {e}")
-            except queue.Empty:
-                continue
+                worker_pool.submit("report", self._process_report, *item)
             except Exception as e:
-                self.logger.bind(tag=TAG).error(f"聊天记录上报工作线程异常: {e}")
+                self.logger.bind(tag=TAG).error(f"聊天记录上报任务异常: {e}")
 
-        self.logger.bind(tag=TAG).info("聊天记录上报线程已退出")
+        self.logger.bind(tag=TAG).info("聊天记录上报任务已退出")
 
     def _process_report(self, type, text, audio_data, report_time):
         """处理上报任务"""
@@ -910,9 +1037,6 @@ class ConnectionHandler:
             report(self, type, text, audio_data, report_time)
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"上报处理异常: {e}")
-        finally:
-            # 标记任务完成
-            self.report_queue.task_done()
 
     def clearSpeakStatus(self):
         self.client_is_speaking = False
@@ -943,6 +1067,12 @@ class ConnectionHandler:
             if self.stop_event:
                 self.stop_event.set()
 
+            # 取消流水线任务
+            self.cancel_chat()
+            for task in self.pipeline_tasks:
+                task.cancel()
+            self.pipeline_tasks.clear()
+
             # 清空任务队列
             self.clear_queues()
 
@@ -985,15 +1115,13 @@ class ConnectionHandler:
             if self.tts:
                 await self.tts.close()
 
-            # 最后关闭线程池（避免阻塞）
-            if self.executor:
-                try:
-                    self.executor.shutdown(wait=False)
-                except Exception as executor_error:
-                    self.logger.bind(tag=TAG).error(
-                        f"关闭线程池时出错: {executor_error}"
-                    )
-                self.executor = None
+            # 线程池由所有连接共享，这里只释放引用
+            self.executor = None
+
+            # 归还共享的提供者实例
+            refs, self._provider_refs = self._provider_refs, []
+            for instance in refs:
+                provider_registry.release(instance)
 
             self.logger.bind(tag=TAG).info("连接资源已释放")
         except Exception as e:
@@ -1029,16 +1157,20 @@ class ConnectionHandler:
             )
 
     def reset_vad_states(self):
-        self.client_audio_buffer = bytearray()
+        if self.vad_stream is not None:
+            self.vad_stream.reset()
+        # 丢弃未完成的增量识别流
+        self.asr_stream = None
         self.client_have_voice = False
         self.client_voice_stop = False
         self.logger.bind(tag=TAG).debug("VAD states reset.")
 
-    def chat_and_close(self, text):
+    async def chat_and_close(self, text):
         """Chat with the user and then close the connection"""
         try:
+            self.turn_started_at = time.monotonic()
             # Use the existing chat method
-            self.chat(text)
+            await self.chat(text)
 
             # After chat is complete, close the connection
             self.close_after_chat = True
@@ -3,7 +3,7 @@ import json
 import random
 import asyncio
 from core.utils.dialogue import Message
-from core.utils.util import audio_to_data
+from core.utils.audio_cache import audio_asset_cache
 from core.handle.sendAudioHandle import sendAudioMessage, send_stt_message
 from core.utils.util import remove_punctuation_and_length, opus_datas_to_wav_bytes
 from core.providers.tts.dto.dto import ContentType, SentenceType
@@ -13,6 +13,7 @@ from core.providers.tools.device_mcp import (
     send_mcp_tools_list_request,
 )
 from core.utils.wakeup_word import WakeupWordsConfig
+from core.utils.worker_pool import worker_pool
 
 TAG = __name__
 
@@ -83,7 +84,7 @@ async def checkWakeupWords(conn, text):
 
     # 播放唤醒词回复
     conn.client_abort = False
-    opus_packets, _ = audio_to_data(response.get("file_path"))
+    opus_packets, _ = audio_asset_cache.get(response.get("file_path"))
 
     conn.logger.bind(tag=TAG).info(f"播放唤醒词回复: {response.get('text')}")
     await sendAudioMessage(conn, SentenceType.FIRST, opus_packets, response.get("text"))
@@ -122,7 +123,7 @@ async def wakeupWordsResponse(conn):
             return
 
         # 生成TTS音频
-        tts_result = await asyncio.to_thread(conn.tts.to_tts, result)
+        tts_result = await worker_pool.run("tts", conn.tts.to_tts, result)
         if not tts_result:
             return
 
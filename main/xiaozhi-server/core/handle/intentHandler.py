@@ -8,11 +8,14 @@ from core.providers.tts.dto.dto import ContentType
 from core.utils.dialogue import Message
 from plugins_func.register import Action, ActionResponse
 from core.providers.tts.dto.dto import TTSMessageDTO, SentenceType
+from core.utils.chat_speculation import ChatSpeculation
 
 TAG = __name__
 
 
 async def handle_user_intent(conn, text):
+    # 对话使用原始文本，可能包含说话人信息
+    query = text
     # 预处理输入文本，处理可能的JSON格式
     try:
         if text.strip().startswith('{') and text.strip().endswith('}'):
@@ -34,8 +37,15 @@ async def handle_user_intent(conn, text):
     if conn.intent_type == "function_call":
         # 使用支持function calling的聊天方法,不再进行意图分析
         return False
+    if conn.speculative_chat:
+        # 请求意图识别大模型的同时推测启动对话，意图判定为继续聊天后由start_chat放行
+        ChatSpeculation(conn, query).start()
     # 使用LLM进行意图分析
     intent_result = await analyze_intent_with_llm(conn, text)
+    speculation = conn.chat_speculation
+    if speculation is not None and _is_tool_intent(intent_result):
+        conn.chat_speculation = None
+        speculation.discard()
     if not intent_result:
         return False
     # 会话开始时生成sentence_id
@@ -63,10 +73,10 @@ async def analyze_intent_with_llm(conn, text):
         conn.logger.bind(tag=TAG).warning("意图识别服务未初始化")
         return None
 
-    # 对话历史记录
-    dialogue = conn.dialogue
+    # 对话历史记录，推测的对话会写入本轮的用户消息，这里使用写入前的快照
+    dialogue_history = list(conn.dialogue.dialogue)
     try:
-        intent_result = await conn.intent.detect_intent(conn, dialogue.dialogue, text)
+        intent_result = await conn.intent.detect_intent(conn, dialogue_history, text)
         return intent_result
     except Exception as e:
         conn.logger.bind(tag=TAG).error(f"意图识别失败: {str(e)}")
@@ -74,6 +84,20 @@ async def analyze_intent_with_llm(conn, text):
     return None
 
 
+def _is_tool_intent(intent_result):
+    """意图识别结果是否为工具调用"""
+    try:
+        intent_data = json.loads(intent_result)
+    except (TypeError, json.JSONDecodeError):
+        return False
+    if not isinstance(intent_data, dict):
+        return False
+    function_call = intent_data.get("function_call")
+    if not isinstance(function_call, dict):
+        return False
+    return function_call.get("name") not in (None, "continue_chat")
+
+
 async def process_intent_result(conn, intent_result, original_text):
     """处理意图识别结果"""
     try:
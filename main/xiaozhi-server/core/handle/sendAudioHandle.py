@@ -3,10 +3,39 @@ import asyncio
 import time
 from core.providers.tts.dto.dto import SentenceType
 from core.utils import textUtils
+from core.utils.audio_cache import audio_asset_cache
+from core.utils.worker_pool import LoopQueue
 
 TAG = __name__
 
 
+class AudioStream:
+    """边合成边播放的一句音频
+
+    合成线程分批put解码出的音频帧，结束时调用finish；播放任务把各批次
+    当作同一段音频连续发送，只发送一次sentence_start，节奏也不会重新计时。
+    """
+
+    def __init__(self, loop):
+        self.frames = []
+        self._queue = LoopQueue(loop)
+
+    def put(self, frames):
+        self._queue.put(frames)
+
+    def finish(self):
+        self._queue.put(None)
+
+    async def batches(self):
+        while True:
+            frames = await self._queue.get()
+            if frames is None:
+                return
+            # 取出播放的帧留给聊天记录上报
+            self.frames.extend(frames)
+            yield frames
+
+
 async def sendAudioMessage(conn, sentenceType, audios, text):
     # 发送句子开始消息
     conn.logger.bind(tag=TAG).info(f"发送音频消息: {sentenceType}, {text}")
@@ -29,9 +58,17 @@ async def sendAudioMessage(conn, sentenceType, audios, text):
             await conn.close()
 
 
+async def _frame_batches(audios):
+    if isinstance(audios, AudioStream):
+        async for frames in audios.batches():
+            yield frames
+    else:
+        yield audios
+
+
 # 播放音频
 async def sendAudio(conn, audios, pre_buffer=True):
-    if audios is None or len(audios) == 0:
+    if audios is None or (not isinstance(audios, AudioStream) and len(audios) == 0):
         return
     # 流控参数优化
     frame_duration = 60  # 帧时长（毫秒），匹配 Opus 编码
@@ -39,32 +76,36 @@ async def sendAudio(conn, audios, pre_buffer=True):
     play_position = 0
 
     # 仅当第一句话时执行预缓冲
-    if pre_buffer:
-        pre_buffer_frames = min(3, len(audios))
-        for i in range(pre_buffer_frames):
-            await conn.websocket.send(audios[i])
-        remaining_audios = audios[pre_buffer_frames:]
-    else:
-        remaining_audios = audios
+    pre_buffer_frames = 3 if pre_buffer else 0
+
+    async for frames in _frame_batches(audios):
+        # 等待下一批时合成跟不上播放，从当前时间继续计时，避免突发补发
+        behind = time.perf_counter() - (start_time + play_position / 1000)
+        if behind > 0:
+            start_time += behind
 
-    # 播放剩余音频帧
-    for opus_packet in remaining_audios:
-        if conn.client_abort:
-            break
+        for opus_packet in frames:
+            if pre_buffer_frames > 0:
+                pre_buffer_frames -= 1
+                await conn.websocket.send(opus_packet)
+                continue
 
-        # 重置没有声音的状态
-        conn.last_activity_time = time.time() * 1000
+            if conn.client_abort:
+                return
 
-        # 计算预期发送时间
-        expected_time = start_time + (play_position / 1000)
-        current_time = time.perf_counter()
-        delay = expected_time - current_time
-        if delay > 0:
-            await asyncio.sleep(delay)
+            # 重置没有声音的状态
+            conn.last_activity_time = time.time() * 1000
 
-        await conn.websocket.send(opus_packet)
+            # 计算预期发送时间
+            expected_time = start_time + (play_position / 1000)
+            current_time = time.perf_counter()
+            delay = expected_time - current_time
+            if delay > 0:
+                await asyncio.sleep(delay)
 
-        play_position += frame_duration
+            await conn.websocket.send(opus_packet)
+
+            play_position += frame_duration
 
 
 async def send_tts_message(conn, state, text=None):
@@ -81,7 +122,7 @@ async def send_tts_message(conn, state, text=None):
             stop_tts_notify_voice = conn.config.get(
                 "stop_tts_notify_voice", "config/assets/tts_notify.mp3"
             )
-            audios, _ = conn.tts.audio_to_opus_data(stop_tts_notify_voice)
+            audios, _ = audio_asset_cache.get(stop_tts_notify_voice)
             await sendAudio(conn, audios)
         # 清除服务端讲话状态
         conn.clearSpeakStatus()
@@ -119,3 +160,20 @@ async def send_stt_message(conn, text):
     )
     conn.client_is_speaking = True
     await send_tts_message(conn, "start")
+
+
+async def send_stt_partial_message(conn, text):
+    """发送增量识别的中间结果，不改变服务端讲话状态"""
+    stt_text = textUtils.get_string_no_punctuation_or_emoji(text)
+    if not stt_text:
+        return
+    await conn.websocket.send(
+        json.dumps(
+            {
+                "type": "stt",
+                "text": stt_text,
+                "is_final": False,
+                "session_id": conn.session_id,
+            }
+        )
+    )
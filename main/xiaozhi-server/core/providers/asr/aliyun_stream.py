@@ -13,10 +13,13 @@ from typing import Optional, Tuple, List
 from urllib import parse
 from datetime import datetime
 from config.logger import setup_logging
+from core.utils.provider_registry import provider_registry
 from core.providers.asr.base import ASRProviderBase
 from core.providers.asr.dto.dto import InterfaceType
 
 TAG = __name__
+# 阿里云NLS的Token有效期远长于1小时，同一账号的实例共享1小时内申请的Token
+NLS_TOKEN_SHARE_SECONDS = 3600
 logger = setup_logging()
 
 
@@ -102,9 +105,16 @@ class ASRProvider(ASRProviderBase):
         elif not self.token:
             raise ValueError("必须提供access_key_id+access_key_secret或者直接提供token")
 
-    def _refresh_token(self):
+    def _refresh_token(self, force=False):
         """刷新Token"""
-        self.token, expire_time_str = AccessToken.create_token(self.access_key_id, self.access_key_secret)
+        self.token, expire_time_str = provider_registry.shared_credential(
+            ("aliyun_nls", self.access_key_id, self.access_key_secret),
+            lambda: AccessToken.create_token(
+                self.access_key_id, self.access_key_secret
+            ),
+            NLS_TOKEN_SHARE_SECONDS,
+            force=force,
+        )
         if not self.token:
             raise ValueError("无法获取有效的访问Token")
         
@@ -1,15 +1,13 @@
 import os
 import wave
 import uuid
-import queue
 import asyncio
 import traceback
-import threading
 import opuslib_next
 import json
 import io
 import time
-import concurrent.futures
+import numpy as np
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 from typing import Optional, Tuple, List, Dict, Any
@@ -17,39 +15,46 @@ from core.handle.receiveAudioHandle import startToChat
 from core.handle.reportHandle import enqueue_asr_report
 from core.utils.util import remove_punctuation_and_length
 from core.handle.receiveAudioHandle import handleAudioMessage
+from core.handle.sendAudioHandle import send_stt_partial_message
+from core.utils.worker_pool import worker_pool
 
 TAG = __name__
 logger = setup_logging()
 
 
+class IncrementalASRStream:
+    """单个连接的增量识别状态
+
+    本地ASR实例被多个连接共享，所以解码器和识别流需要按连接保存。
+    """
+
+    def __init__(self, recognizer_stream):
+        self.decoder = opuslib_next.Decoder(16000, 1)
+        self.recognizer_stream = recognizer_stream
+        self.partial_text = ""
+
+
 class ASRProviderBase(ABC):
     def __init__(self):
-        pass
+        # 是否在用户说话过程中增量识别，需要子类实现create_recognizer_stream等方法
+        self.incremental = False
+        # 增量识别时是否通过stt消息推送中间结果
+        self.send_partial_result = True
 
     # 打开音频通道
     async def open_audio_channels(self, conn):
-        conn.asr_priority_thread = threading.Thread(
-            target=self.asr_text_priority_thread, args=(conn,), daemon=True
-        )
-        conn.asr_priority_thread.start()
+        conn.create_pipeline_task(self.asr_text_priority_task(conn))
 
     # 有序处理ASR音频
-    def asr_text_priority_thread(self, conn):
+    async def asr_text_priority_task(self, conn):
         while not conn.stop_event.is_set():
+            message = await conn.asr_audio_queue.get()
             try:
-                message = conn.asr_audio_queue.get(timeout=1)
-                future = asyncio.run_coroutine_threadsafe(
-                    handleAudioMessage(conn, message),
-                    conn.loop,
-                )
-                future.result()
-            except queue.Empty:
-                continue
+                await handleAudioMessage(conn, message)
             except Exception as e:
                 logger.bind(tag=TAG).error(
                     f"处理ASR文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
                 )
-                continue
 
     # 接收音频
     async def receive_audio(self, conn, audio, audio_have_voice):
@@ -63,39 +68,105 @@ class ASRProviderBase(ABC):
             conn.asr_audio = conn.asr_audio[-10:]
             return
 
+        if getattr(self, "incremental", False):
+            await self._feed_incremental(conn, audio)
+
         if conn.client_voice_stop:
             asr_audio_task = conn.asr_audio.copy()
             conn.asr_audio.clear()
+            # reset_vad_states会丢弃识别流，需要先取出交给handle_voice_stop结束
+            incremental_stream = conn.asr_stream
             conn.reset_vad_states()
 
+            # 语音太短不识别，识别流随之丢弃
             if len(asr_audio_task) > 15:
-                await self.handle_voice_stop(conn, asr_audio_task)
+                await self.handle_voice_stop(
+                    conn, asr_audio_task, incremental_stream=incremental_stream
+                )
+
+    async def _feed_incremental(self, conn, audio):
+        """把新收到的音频送入连接的识别流，并推送变化的中间结果"""
+        if conn.asr_stream is None:
+            conn.asr_stream = IncrementalASRStream(self.create_recognizer_stream())
+            # 首次有声音时，把之前缓存的音频一起送入，避免丢掉开头
+            packets = conn.asr_audio.copy()
+        else:
+            packets = [audio]
+        packets = [packet for packet in packets if packet]
+        if not packets:
+            return
+
+        stream = conn.asr_stream
+        try:
+            text = await worker_pool.run(
+                "asr", self._decode_incremental, stream, packets, conn.audio_format
+            )
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"增量识别失败: {e}")
+            return
+
+        if text and text != stream.partial_text:
+            stream.partial_text = text
+            if getattr(self, "send_partial_result", True):
+                await send_stt_partial_message(conn, text)
+
+    def _decode_incremental(self, stream, packets, audio_format):
+        if audio_format == "pcm":
+            pcm_frames = packets
+        else:
+            pcm_frames = [stream.decoder.decode(packet, 960) for packet in packets]
+        samples = self.pcm_to_float32(pcm_frames)
+        return self.accept_incremental_audio(stream.recognizer_stream, samples)
+
+    def create_recognizer_stream(self):
+        """创建一个增量识别流，支持增量识别的子类需要重写"""
+        raise NotImplementedError
+
+    def accept_incremental_audio(self, recognizer_stream, samples: np.ndarray) -> str:
+        """送入float32采样点并返回当前的中间识别结果，支持增量识别的子类需要重写"""
+        raise NotImplementedError
+
+    def finish_incremental(self, recognizer_stream) -> str:
+        """结束识别流并返回最终结果，支持增量识别的子类需要重写"""
+        raise NotImplementedError
 
     # 处理语音停止
-    async def handle_voice_stop(self, conn, asr_audio_task: List[bytes]):
-        """并行处理ASR和声纹识别"""
+    async def handle_voice_stop(
+        self, conn, asr_audio_task: List[bytes], incremental_stream=None
+    ):
+        """并行处理ASR和声纹识别
+
+        incremental_stream为说话过程中已送入音频的增量识别流，传入时只需要结束识别流。
+        """
         try:
             total_start_time = time.monotonic()
             
-            # 准备音频数据
-            if conn.audio_format == "pcm":
-                pcm_data = asr_audio_task
-            else:
-                pcm_data = self.decode_opus(asr_audio_task)
-            
-            combined_pcm_data = b"".join(pcm_data)
-            
-            # 预先准备WAV数据
+            # 预先准备WAV数据，只有声纹识别需要，避免无谓的解码
             wav_data = None
             # 使用连接的声纹识别提供者
-            if conn.voiceprint_provider and combined_pcm_data:
-                wav_data = self._pcm_to_wav(combined_pcm_data)
+            if conn.voiceprint_provider:
+                if conn.audio_format == "pcm":
+                    pcm_data = asr_audio_task
+                else:
+                    pcm_data = self.decode_opus(asr_audio_task)
+                combined_pcm_data = b"".join(pcm_data)
+                if combined_pcm_data:
+                    wav_data = self._pcm_to_wav(combined_pcm_data)
             
             
             # 定义ASR任务
             def run_asr():
                 start_time = time.monotonic()
                 try:
+                    if incremental_stream is not None:
+                        text = self.finish_incremental(
+                            incremental_stream.recognizer_stream
+                        )
+                        end_time = time.monotonic()
+                        logger.bind(tag=TAG).info(
+                            f"增量ASR收尾耗时: {end_time - start_time:.3f}s"
+                        )
+                        return text, None
                     loop = asyncio.new_event_loop()
                     asyncio.set_event_loop(loop)
                     try:
@@ -131,25 +202,21 @@ class ASRProviderBase(ABC):
                     logger.bind(tag=TAG).error(f"声纹识别失败: {e}")
                     return None
             
-            # 使用线程池执行器并行运行
+            # 在共享线程池中并行运行，不阻塞事件循环
             parallel_start_time = time.monotonic()
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as thread_executor:
-                asr_future = thread_executor.submit(run_asr)
-                
-                if conn.voiceprint_provider and wav_data:
-                    voiceprint_future = thread_executor.submit(run_voiceprint)
-                    
-                    # 等待两个线程都完成
-                    asr_result = asr_future.result(timeout=15)
-                    voiceprint_result = voiceprint_future.result(timeout=15)
-                    
-                    results = {"asr": asr_result, "voiceprint": voiceprint_result}
-                else:
-                    asr_result = asr_future.result(timeout=15)
-                    results = {"asr": asr_result, "voiceprint": None}
-            
-            
+            asr_future = worker_pool.run("asr", run_asr)
+            if conn.voiceprint_provider and wav_data:
+                # 等待两个任务都完成
+                asr_result, voiceprint_result = await asyncio.wait_for(
+                    asyncio.gather(asr_future, worker_pool.run("asr", run_voiceprint)),
+                    timeout=15,
+                )
+                results = {"asr": asr_result, "voiceprint": voiceprint_result}
+            else:
+                asr_result = await asyncio.wait_for(asr_future, timeout=15)
+                results = {"asr": asr_result, "voiceprint": None}
+
+
             # 处理结果
             raw_text, file_path = results.get("asr", ("", None))
             speaker_name = results.get("voiceprint", None)
@@ -235,6 +302,33 @@ class ASRProviderBase(ABC):
 
         return file_path
 
+    def save_audio_to_file_async(self, pcm_data: List[bytes], session_id: str) -> str:
+        """在后台线程把PCM数据保存为WAV文件，立即返回文件路径"""
+        module_name = __name__.split(".")[-1]
+        file_name = f"asr_{module_name}_{session_id}_{uuid.uuid4()}.wav"
+        file_path = os.path.join(self.output_dir, file_name)
+        pcm_bytes = b"".join(pcm_data)
+
+        def write():
+            try:
+                with wave.open(file_path, "wb") as wf:
+                    wf.setnchannels(1)
+                    wf.setsampwidth(2)  # 2 bytes = 16-bit
+                    wf.setframerate(16000)
+                    wf.writeframes(pcm_bytes)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"音频文件保存失败: {file_path} | 错误: {e}")
+
+        # 识别用的音频文件在后台写入，不占用识别耗时
+        worker_pool.submit("io", write)
+        return file_path
+
+    @staticmethod
+    def pcm_to_float32(pcm_data: List[bytes]) -> np.ndarray:
+        """把16位PCM数据转换为[-1, 1]的float32采样点"""
+        samples = np.frombuffer(b"".join(pcm_data), dtype=np.int16)
+        return np.multiply(samples, np.float32(1.0 / 32768.0), dtype=np.float32)
+
     @abstractmethod
     async def speech_to_text(
         self, opus_data: List[bytes], session_id: str, audio_format="opus"
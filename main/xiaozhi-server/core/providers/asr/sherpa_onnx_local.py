@@ -16,6 +16,9 @@ from modelscope.hub.file_download import model_file_download
 TAG = __name__
 logger = setup_logging()
 
+# 支持在说话过程中增量识别的流式模型
+STREAMING_MODEL_TYPES = ("zipformer_stream", "paraformer_stream")
+
 
 # 捕获标准输出
 class CaptureOutput:
@@ -46,6 +49,12 @@ class ASRProvider(ASRProviderBase):
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
 
+        if self.model_type in STREAMING_MODEL_TYPES:
+            self._init_streaming_model(config)
+        else:
+            self._init_offline_model()
+
+    def _init_offline_model(self):
         # 初始化模型文件路径
         model_files = {
             "model.int8.onnx": os.path.join(self.model_dir, "model.int8.onnx"),
@@ -96,6 +105,73 @@ class ASRProvider(ASRProviderBase):
                     use_itn=True,
                 )
 
+    def _init_streaming_model(self, config: dict):
+        """初始化流式模型，说话过程中增量识别，说完后只需要很短的收尾时间"""
+        model_files = {
+            "tokens": os.path.join(self.model_dir, config.get("tokens", "tokens.txt")),
+            "encoder": os.path.join(
+                self.model_dir,
+                config.get("encoder", "encoder-epoch-99-avg-1.int8.onnx"),
+            ),
+            "decoder": os.path.join(
+                self.model_dir, config.get("decoder", "decoder-epoch-99-avg-1.onnx")
+            ),
+        }
+        if self.model_type == "zipformer_stream":
+            model_files["joiner"] = os.path.join(
+                self.model_dir,
+                config.get("joiner", "joiner-epoch-99-avg-1.int8.onnx"),
+            )
+        for file_path in model_files.values():
+            if not os.path.isfile(file_path):
+                raise FileNotFoundError(f"流式模型文件不存在，请手动下载: {file_path}")
+
+        self.incremental = True
+        self.send_partial_result = str(
+            config.get("send_partial_result", True)
+        ).lower() in ("true", "1", "yes")
+        with CaptureOutput():
+            if self.model_type == "paraformer_stream":
+                self.model = sherpa_onnx.OnlineRecognizer.from_paraformer(
+                    tokens=model_files["tokens"],
+                    encoder=model_files["encoder"],
+                    decoder=model_files["decoder"],
+                    num_threads=2,
+                    sample_rate=16000,
+                    feature_dim=80,
+                    decoding_method="greedy_search",
+                )
+            else:  # zipformer_stream
+                self.model = sherpa_onnx.OnlineRecognizer.from_transducer(
+                    tokens=model_files["tokens"],
+                    encoder=model_files["encoder"],
+                    decoder=model_files["decoder"],
+                    joiner=model_files["joiner"],
+                    num_threads=2,
+                    sample_rate=16000,
+                    feature_dim=80,
+                    decoding_method="greedy_search",
+                )
+
+    def create_recognizer_stream(self):
+        return self.model.create_stream()
+
+    def accept_incremental_audio(self, recognizer_stream, samples: np.ndarray) -> str:
+        recognizer_stream.accept_waveform(16000, samples)
+        while self.model.is_ready(recognizer_stream):
+            self.model.decode_stream(recognizer_stream)
+        return self.model.get_result(recognizer_stream)
+
+    def finish_incremental(self, recognizer_stream) -> str:
+        # 补一小段静音，让模型输出最后几帧的结果
+        recognizer_stream.accept_waveform(
+            16000, np.zeros(int(0.3 * 16000), dtype=np.float32)
+        )
+        recognizer_stream.input_finished()
+        while self.model.is_ready(recognizer_stream):
+            self.model.decode_stream(recognizer_stream)
+        return self.model.get_result(recognizer_stream)
+
     def read_wave(self, wave_filename: str) -> Tuple[np.ndarray, int]:
         """
         Args:
@@ -126,24 +202,30 @@ class ASRProvider(ASRProviderBase):
         """语音转文本主处理逻辑"""
         file_path = None
         try:
-            # 保存音频文件
             start_time = time.time()
             if audio_format == "pcm":
                 pcm_data = opus_data
             else:
                 pcm_data = self.decode_opus(opus_data)
-            file_path = self.save_audio_to_file(pcm_data, session_id)
+            # 直接在内存中转换为float32采样点，不再经过WAV文件中转
+            samples = self.pcm_to_float32(pcm_data)
+            if not self.delete_audio_file:
+                # 需要保留音频时由后台线程写入，不计入识别耗时
+                file_path = self.save_audio_to_file_async(pcm_data, session_id)
             logger.bind(tag=TAG).debug(
-                f"音频文件保存耗时: {time.time() - start_time:.3f}s | 路径: {file_path}"
+                f"音频解码耗时: {time.time() - start_time:.3f}s"
             )
 
             # 语音识别
             start_time = time.time()
             s = self.model.create_stream()
-            samples, sample_rate = self.read_wave(file_path)
-            s.accept_waveform(sample_rate, samples)
-            self.model.decode_stream(s)
-            text = s.result.text
+            s.accept_waveform(16000, samples)
+            if self.incremental:
+                # 流式模型一次性送入整段音频
+                text = self.finish_incremental(s)
+            else:
+                self.model.decode_stream(s)
+                text = s.result.text
             logger.bind(tag=TAG).debug(
                 f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
             )
@@ -153,11 +235,3 @@ class ASRProvider(ASRProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"语音识别失败: {e}", exc_info=True)
             return "", file_path
-        finally:
-            # 文件清理逻辑
-            if self.delete_audio_file and file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                    logger.bind(tag=TAG).debug(f"已删除临时音频文件: {file_path}")
-                except Exception as e:
-                    logger.bind(tag=TAG).error(f"文件删除失败: {file_path} | 错误: {e}")
@@ -2,6 +2,13 @@ from typing import List, Dict
 from ..base import IntentProviderBase
 from plugins_func.functions.play_music import initialize_music_handler
 from config.logger import setup_logging
+from core.utils.intent_matcher import (
+    CONTINUE_CHAT,
+    IntentCatalogue,
+    LocalIntentMatcher,
+    intent_metrics,
+)
+from core.utils.worker_pool import worker_pool
 import re
 import json
 import hashlib
@@ -15,13 +22,14 @@ class IntentProvider(IntentProviderBase):
     def __init__(self, config):
         super().__init__(config)
         self.llm = None
-        self.promot = ""
         # 导入全局缓存管理器
         from core.utils.cache.manager import cache_manager, CacheType
 
         self.cache_manager = cache_manager
         self.CacheType = CacheType
         self.history_count = 4  # 默认使用最近4条对话记录
+        # 大模型之前的本地快速匹配
+        self.local_matcher = LocalIntentMatcher(config.get("local_match"))
 
     def get_intent_system_prompt(self, functions_list: str) -> str:
         """
@@ -111,6 +119,39 @@ class IntentProvider(IntentProviderBase):
         )
         return llm_result
 
+    def _get_prompt_key(self, conn, music_config, devices) -> str:
+        """工具列表、歌名列表和设备列表的摘要，相同工具集的设备共用同一份提示词"""
+        parts = [conn.func_handler.get_functions_fingerprint()]
+        if hasattr(conn, "mcp_client"):
+            parts.append(conn.mcp_client.get_tools_fingerprint())
+        parts.append(music_config.get("fingerprint", ""))
+        parts.extend(str(device) for device in devices)
+        return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+    def _get_system_prompt(self, prompt_key, functions, music_file_names, devices):
+        """获取意图识别系统提示词，按工具集摘要在所有连接间缓存"""
+        prompt = self.cache_manager.get(self.CacheType.INTENT_PROMPT, prompt_key)
+        if prompt is not None:
+            return prompt
+
+        prompt = self.get_intent_system_prompt(functions)
+        prompt += f"\n<musicNames>{music_file_names}\n</musicNames>"
+        if len(devices) > 0:
+            prompt += "\n下面是我家智能设备列表（位置，设备名，entity_id），可以通过homeassistant控制\n"
+            for device in devices:
+                prompt += device + "\n"
+        self.cache_manager.set(self.CacheType.INTENT_PROMPT, prompt_key, prompt)
+        return prompt
+
+    def _clean_tool_history(self, conn):
+        """继续聊天时清理工具调用相关的历史消息"""
+        # 保留非工具相关的消息，工具调用和工具结果成对移除
+        conn.dialogue.dialogue = [
+            msg
+            for msg in conn.dialogue.dialogue
+            if msg.role not in ["tool", "function"] and msg.tool_calls is None
+        ]
+
     async def detect_intent(self, conn, dialogue_history: List[Dict], text: str) -> str:
         if not self.llm:
             raise ValueError("LLM provider not set")
@@ -124,11 +165,52 @@ class IntentProvider(IntentProviderBase):
         model_info = getattr(self.llm, "model_name", str(self.llm.__class__.__name__))
         logger.bind(tag=TAG).debug(f"使用意图识别模型: {model_info}")
 
-        # 计算缓存键
-        cache_key = hashlib.md5((conn.device_id + text).encode()).hexdigest()
+        functions = list(conn.func_handler.get_functions() or [])
+        if hasattr(conn, "mcp_client"):
+            mcp_tools = conn.mcp_client.get_available_tools()
+            if mcp_tools is not None and len(mcp_tools) > 0:
+                functions.extend(mcp_tools)
+
+        music_config = initialize_music_handler(conn)
+        music_file_names = music_config["music_file_names"]
+
+        home_assistant_cfg = conn.config["plugins"].get("home_assistant")
+        if home_assistant_cfg:
+            devices = home_assistant_cfg.get("devices", [])
+        else:
+            devices = []
+        prompt_key = self._get_prompt_key(conn, music_config, devices)
+
+        # 本地匹配命中时不再请求大模型
+        catalogue = IntentCatalogue.from_functions(
+            functions,
+            music_names=music_file_names,
+            hass_devices=devices,
+            exit_commands=conn.cmd_exit,
+            wakeup_words=conn.config.get("wakeup_words"),
+            key=prompt_key,
+        )
+        local_match = self.local_matcher.match(catalogue, text)
+        if local_match is not None:
+            logger.bind(tag=TAG).info(
+                f"本地意图匹配({local_match.tier}): {local_match.name}, "
+                f"参数: {local_match.arguments}, 置信度: {local_match.confidence:.2f}"
+            )
+            if local_match.name == CONTINUE_CHAT:
+                self._clean_tool_history(conn)
+            return local_match.to_json()
+
+        # 计算缓存键，工具集变化后不再使用之前的识别结果
+        cache_key = hashlib.md5(
+            (prompt_key + conn.device_id + text).encode()
+        ).hexdigest()
 
         # 检查缓存
+        cache_start_time = time.perf_counter()
         cached_intent = self.cache_manager.get(self.CacheType.INTENT, cache_key)
+        intent_metrics.record(
+            "cache", cached_intent is not None, time.perf_counter() - cache_start_time
+        )
         if cached_intent is not None:
             cache_time = time.time() - total_start_time
             logger.bind(tag=TAG).debug(
@@ -136,31 +218,9 @@ class IntentProvider(IntentProviderBase):
             )
             return cached_intent
 
-        if self.promot == "":
-            functions = conn.func_handler.get_functions()
-            if hasattr(conn, "mcp_client"):
-                mcp_tools = conn.mcp_client.get_available_tools()
-                if mcp_tools is not None and len(mcp_tools) > 0:
-                    if functions is None:
-                        functions = []
-                    functions.extend(mcp_tools)
-
-            self.promot = self.get_intent_system_prompt(functions)
-
-        music_config = initialize_music_handler(conn)
-        music_file_names = music_config["music_file_names"]
-        prompt_music = f"{self.promot}\n<musicNames>{music_file_names}\n</musicNames>"
-
-        home_assistant_cfg = conn.config["plugins"].get("home_assistant")
-        if home_assistant_cfg:
-            devices = home_assistant_cfg.get("devices", [])
-        else:
-            devices = []
-        if len(devices) > 0:
-            hass_prompt = "\n下面是我家智能设备列表（位置，设备名，entity_id），可以通过homeassistant控制\n"
-            for device in devices:
-                hass_prompt += device + "\n"
-            prompt_music += hass_prompt
+        prompt_music = self._get_system_prompt(
+            prompt_key, functions, music_file_names, devices
+        )
 
         logger.bind(tag=TAG).debug(f"User prompt: {prompt_music}")
 
@@ -183,12 +243,14 @@ class IntentProvider(IntentProviderBase):
         llm_start_time = time.time()
         logger.bind(tag=TAG).debug(f"开始LLM意图识别调用, 模型: {model_info}")
 
-        intent = self.llm.response_no_stream(
-            system_prompt=prompt_music, user_prompt=user_prompt
+        # 在llm线程池中调用，避免阻塞事件循环
+        intent = await worker_pool.run(
+            "llm", self.llm.response_no_stream, prompt_music, user_prompt
         )
 
         # 记录LLM调用完成时间
         llm_time = time.time() - llm_start_time
+        intent_metrics.record("llm", True, llm_time)
         logger.bind(tag=TAG).debug(
             f"LLM意图识别完成, 模型: {model_info}, 调用耗时: {llm_time:.4f}秒"
         )
@@ -224,14 +286,8 @@ class IntentProvider(IntentProviderBase):
                 )
 
                 # 如果是继续聊天，清理工具调用相关的历史消息
-                if function_name == "continue_chat":
-                    # 保留非工具相关的消息
-                    clean_history = [
-                        msg
-                        for msg in conn.dialogue.dialogue
-                        if msg.role not in ["tool", "function"]
-                    ]
-                    conn.dialogue.dialogue = clean_history
+                if function_name == CONTINUE_CHAT:
+                    self._clean_tool_history(conn)
 
                 # 添加到缓存
                 self.cache_manager.set(self.CacheType.INTENT, cache_key, intent)
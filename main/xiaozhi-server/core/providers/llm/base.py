@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
+from core.utils.worker_pool import worker_pool
 
 TAG = __name__
 logger = setup_logging()
@@ -37,3 +38,15 @@ class LLMProviderBase(ABC):
         for token in self.response(session_id, dialogue):
             yield token, None
 
+    def aresponse(self, session_id, dialogue, **kwargs):
+        """异步流式接口，连接的对话流程通过它获取回复
+
+        默认在共享线程池中迭代同步的response，原生支持异步的提供者应重写为异步生成器。
+        """
+        return worker_pool.iterate("llm", self.response(session_id, dialogue, **kwargs))
+
+    def aresponse_with_functions(self, session_id, dialogue, functions=None):
+        """response_with_functions的异步版本，默认实现同aresponse"""
+        return worker_pool.iterate(
+            "llm", self.response_with_functions(session_id, dialogue, functions)
+        )
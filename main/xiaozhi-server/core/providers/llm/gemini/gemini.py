@@ -133,7 +133,7 @@ class LLMProvider(LLMProviderBase):
             r = m["role"]
 
             if r == "assistant" and "tool_calls" in m:
-                tc = m["tool_calls"][0]
+                # 一次回复可能包含多个工具调用
                 contents.append(
                     {
                         "role": "model",
@@ -144,6 +144,7 @@ class LLMProvider(LLMProviderBase):
                                     "args": json.loads(tc["function"]["arguments"]),
                                 }
                             }
+                            for tc in m["tool_calls"]
                         ],
                     }
                 )
@@ -176,10 +177,12 @@ class LLMProvider(LLMProviderBase):
         try:
             for chunk in stream:
                 cand = chunk.candidates[0]
+                has_function_call = False
                 for part in cand.content.parts:
-                    # a) 函数调用-通常是最后一段话才是函数调用
+                    # a) 函数调用-通常是最后一段话才是函数调用，可能同时有多个
                     if getattr(part, "function_call", None):
                         fc = part.function_call
+                        has_function_call = True
                         yield None, [
                             SimpleNamespace(
                                 id=uuid.uuid4().hex,
@@ -192,10 +195,12 @@ class LLMProvider(LLMProviderBase):
                                 ),
                             )
                         ]
-                        return
+                        continue
                     # b) 普通文本
                     if getattr(part, "text", None):
                         yield part.text if tools is None else (part.text, None)
+                if has_function_call:
+                    return
 
         finally:
             if tools is not None:
@@ -1,7 +1,11 @@
 from config.logger import setup_logging
-from openai import OpenAI
+import asyncio
+import weakref
+from openai import OpenAI, AsyncOpenAI
 import json
 from core.providers.llm.base import LLMProviderBase
+from core.utils.http_client import http_client_pool
+from core.utils.llm_usage import llm_usage
 
 TAG = __name__
 logger = setup_logging()
@@ -23,35 +27,78 @@ class LLMProvider(LLMProviderBase):
 
         # 检查是否是qwen3模型
         self.is_qwen3 = self.model_name and self.model_name.lower().startswith("qwen3")
+        # 事件循环 -> AsyncOpenAI，底层连接由http_client_pool按服务地址共享
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _get_async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(
+                base_url=self.base_url,
+                api_key="ollama",
+                http_client=http_client_pool.get_async_client(self.base_url),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    def _prepare_dialogue(self, dialogue):
+        # 如果是qwen3模型，在用户最后一条消息中添加/no_think指令
+        if self.is_qwen3:
+            # 复制对话列表，避免修改原始对话
+            dialogue_copy = dialogue.copy()
+
+            # 找到最后一条用户消息
+            for i in range(len(dialogue_copy) - 1, -1, -1):
+                if dialogue_copy[i]["role"] == "user":
+                    # 在用户消息前添加/no_think指令
+                    dialogue_copy[i]["content"] = (
+                        "/no_think " + dialogue_copy[i]["content"]
+                    )
+                    logger.bind(tag=TAG).debug(f"为qwen3模型添加/no_think指令")
+                    break
+
+            # 使用修改后的对话
+            dialogue = dialogue_copy
+        return dialogue
+
+    @staticmethod
+    def _strip_think(buffer, is_active):
+        """移除缓冲区中的<think>标签内容，处理跨chunk的标签"""
+        # 处理缓冲区中的标签
+        while "<think>" in buffer and "</think>" in buffer:
+            # 找到完整的<think></think>标签并移除
+            pre = buffer.split("<think>", 1)[0]
+            post = buffer.split("</think>", 1)[1]
+            buffer = pre + post
+
+        # 处理只有开始标签的情况
+        if "<think>" in buffer:
+            is_active = False
+            buffer = buffer.split("<think>", 1)[0]
+
+        # 处理只有结束标签的情况
+        if "</think>" in buffer:
+            is_active = True
+            buffer = buffer.split("</think>", 1)[1]
+        return buffer, is_active
 
     def response(self, session_id, dialogue, **kwargs):
         try:
-            # 如果是qwen3模型，在用户最后一条消息中添加/no_think指令
-            if self.is_qwen3:
-                # 复制对话列表，避免修改原始对话
-                dialogue_copy = dialogue.copy()
-
-                # 找到最后一条用户消息
-                for i in range(len(dialogue_copy) - 1, -1, -1):
-                    if dialogue_copy[i]["role"] == "user":
-                        # 在用户消息前添加/no_think指令
-                        dialogue_copy[i]["content"] = (
-                            "/no_think " + dialogue_copy[i]["content"]
-                        )
-                        logger.bind(tag=TAG).debug(f"为qwen3模型添加/no_think指令")
-                        break
-
-                # 使用修改后的对话
-                dialogue = dialogue_copy
+            dialogue = self._prepare_dialogue(dialogue)
 
             responses = self.client.chat.completions.create(
-                model=self.model_name, messages=dialogue, stream=True
+                model=self.model_name,
+                messages=dialogue,
+                stream=True,
+                **llm_usage.request_options(dialogue),
             )
             is_active = True
             # 用于处理跨chunk的标签
             buffer = ""
 
             for chunk in responses:
+                llm_usage.record(getattr(chunk, "usage", None), TAG)
                 try:
                     delta = (
                         chunk.choices[0].delta
@@ -61,25 +108,7 @@ class LLMProvider(LLMProviderBase):
                     content = delta.content if hasattr(delta, "content") else ""
 
                     if content:
-                        # 将内容添加到缓冲区
-                        buffer += content
-
-                        # 处理缓冲区中的标签
-                        while "<think>" in buffer and "</think>" in buffer:
-                            # 找到完整的<think></think>标签并移除
-                            pre = buffer.split("<think>", 1)[0]
-                            post = buffer.split("</think>", 1)[1]
-                            buffer = pre + post
-
-                        # 处理只有开始标签的情况
-                        if "<think>" in buffer:
-                            is_active = False
-                            buffer = buffer.split("<think>", 1)[0]
-
-                        # 处理只有结束标签的情况
-                        if "</think>" in buffer:
-                            is_active = True
-                            buffer = buffer.split("</think>", 1)[1]
+                        buffer, is_active = self._strip_think(buffer + content, is_active)
 
                         # 如果当前处于活动状态且缓冲区有内容，则输出
                         if is_active and buffer:
@@ -95,35 +124,21 @@ class LLMProvider(LLMProviderBase):
 
     def response_with_functions(self, session_id, dialogue, functions=None):
         try:
-            # 如果是qwen3模型，在用户最后一条消息中添加/no_think指令
-            if self.is_qwen3:
-                # 复制对话列表，避免修改原始对话
-                dialogue_copy = dialogue.copy()
-
-                # 找到最后一条用户消息
-                for i in range(len(dialogue_copy) - 1, -1, -1):
-                    if dialogue_copy[i]["role"] == "user":
-                        # 在用户消息前添加/no_think指令
-                        dialogue_copy[i]["content"] = (
-                            "/no_think " + dialogue_copy[i]["content"]
-                        )
-                        logger.bind(tag=TAG).debug(f"为qwen3模型添加/no_think指令")
-                        break
-
-                # 使用修改后的对话
-                dialogue = dialogue_copy
+            dialogue = self._prepare_dialogue(dialogue)
 
             stream = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=dialogue,
                 stream=True,
                 tools=functions,
+                **llm_usage.request_options(dialogue),
             )
 
             is_active = True
             buffer = ""
 
             for chunk in stream:
+                llm_usage.record(getattr(chunk, "usage", None), TAG)
                 try:
                     delta = (
                         chunk.choices[0].delta
@@ -142,25 +157,7 @@ class LLMProvider(LLMProviderBase):
 
                     # 处理文本内容
                     if content:
-                        # 将内容添加到缓冲区
-                        buffer += content
-
-                        # 处理缓冲区中的标签
-                        while "<think>" in buffer and "</think>" in buffer:
-                            # 找到完整的<think></think>标签并移除
-                            pre = buffer.split("<think>", 1)[0]
-                            post = buffer.split("</think>", 1)[1]
-                            buffer = pre + post
-
-                        # 处理只有开始标签的情况
-                        if "<think>" in buffer:
-                            is_active = False
-                            buffer = buffer.split("<think>", 1)[0]
-
-                        # 处理只有结束标签的情况
-                        if "</think>" in buffer:
-                            is_active = True
-                            buffer = buffer.split("</think>", 1)[1]
+                        buffer, is_active = self._strip_think(buffer + content, is_active)
 
                         # 如果当前处于活动状态且缓冲区有内容，则输出
                         if is_active and buffer:
@@ -173,3 +170,85 @@ class LLMProvider(LLMProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Ollama function call: {e}")
             yield f"【Ollama服务响应异常: {str(e)}】", None
+
+    async def aresponse(self, session_id, dialogue, **kwargs):
+        """基于AsyncOpenAI的流式回复，调用方停止迭代或任务被取消时关闭上游连接"""
+        responses = None
+        try:
+            responses = await self._get_async_client().chat.completions.create(
+                model=self.model_name,
+                messages=self._prepare_dialogue(dialogue),
+                stream=True,
+                **llm_usage.request_options(dialogue),
+            )
+            is_active = True
+            buffer = ""
+            async for chunk in responses:
+                llm_usage.record(getattr(chunk, "usage", None), TAG)
+                try:
+                    delta = (
+                        chunk.choices[0].delta
+                        if getattr(chunk, "choices", None)
+                        else None
+                    )
+                    content = delta.content if hasattr(delta, "content") else ""
+                    if content:
+                        buffer, is_active = self._strip_think(buffer + content, is_active)
+                        if is_active and buffer:
+                            yield buffer
+                            buffer = ""
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"Error processing chunk: {e}")
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
+            yield "【Ollama服务响应异常】"
+        finally:
+            if responses is not None:
+                await responses.close()
+
+    async def aresponse_with_functions(self, session_id, dialogue, functions=None):
+        stream = None
+        try:
+            stream = await self._get_async_client().chat.completions.create(
+                model=self.model_name,
+                messages=self._prepare_dialogue(dialogue),
+                stream=True,
+                tools=functions,
+                **llm_usage.request_options(dialogue),
+            )
+            is_active = True
+            buffer = ""
+            async for chunk in stream:
+                llm_usage.record(getattr(chunk, "usage", None), TAG)
+                try:
+                    delta = (
+                        chunk.choices[0].delta
+                        if getattr(chunk, "choices", None)
+                        else None
+                    )
+                    content = delta.content if hasattr(delta, "content") else None
+                    tool_calls = (
+                        delta.tool_calls if hasattr(delta, "tool_calls") else None
+                    )
+
+                    # 如果是工具调用，直接传递
+                    if tool_calls:
+                        yield None, tool_calls
+                        continue
+
+                    if content:
+                        buffer, is_active = self._strip_think(buffer + content, is_active)
+                        if is_active and buffer:
+                            yield buffer, None
+                            buffer = ""
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"Error processing function chunk: {e}")
+                    continue
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in Ollama function call: {e}")
+            yield f"【Ollama服务响应异常: {str(e)}】", None
+        finally:
+            if stream is not None:
+                await stream.close()
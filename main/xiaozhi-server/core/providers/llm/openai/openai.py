@@ -1,8 +1,12 @@
 import httpx
 import openai
+import asyncio
+import weakref
 from openai.types import CompletionUsage
 from config.logger import setup_logging
 from core.utils.util import check_model_key
+from core.utils.http_client import http_client_pool
+from core.utils.llm_usage import llm_usage
 from core.providers.llm.base import LLMProviderBase
 
 TAG = __name__
@@ -47,51 +51,115 @@ class LLMProvider(LLMProviderBase):
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
         self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=httpx.Timeout(self.timeout))
+        # 事件循环 -> AsyncOpenAI，底层连接由http_client_pool按服务地址共享
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _get_async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout),
+                http_client=http_client_pool.get_async_client(self.base_url),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    def _completion_params(self, dialogue, **kwargs):
+        return dict(
+            model=self.model_name,
+            messages=dialogue,
+            stream=True,
+            max_tokens=kwargs.get("max_tokens", self.max_tokens),
+            temperature=kwargs.get("temperature", self.temperature),
+            top_p=kwargs.get("top_p", self.top_p),
+            frequency_penalty=kwargs.get("frequency_penalty", self.frequency_penalty),
+            **llm_usage.request_options(dialogue),
+        )
+
+    def _function_params(self, dialogue, functions):
+        return dict(
+            model=self.model_name,
+            messages=dialogue,
+            stream=True,
+            tools=functions,
+            **llm_usage.request_options(dialogue),
+        )
+
+    @staticmethod
+    def _chunk_content(chunk):
+        try:
+            # 检查是否存在有效的choice且content不为空
+            delta = chunk.choices[0].delta if getattr(chunk, "choices", None) else None
+            return delta.content if hasattr(delta, "content") else ""
+        except IndexError:
+            return ""
+
+    @staticmethod
+    def _filter_think(content, is_active):
+        """去掉<think>标签内的内容，处理标签跨多个chunk的情况"""
+        if "<think>" in content:
+            is_active = False
+            content = content.split("<think>")[0]
+        if "</think>" in content:
+            is_active = True
+            content = content.split("</think>")[-1]
+        return content, is_active
+
+    @staticmethod
+    def _log_usage(chunk):
+        # 存在 CompletionUsage 消息时，记录 Token 消耗和命中缓存的 Token 数
+        usage_info = getattr(chunk, "usage", None)
+        if isinstance(usage_info, CompletionUsage):
+            llm_usage.record(usage_info, TAG)
 
     def response(self, session_id, dialogue, **kwargs):
         try:
             responses = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=dialogue,
-                stream=True,
-                max_tokens=kwargs.get("max_tokens", self.max_tokens),
-                temperature=kwargs.get("temperature", self.temperature),
-                top_p=kwargs.get("top_p", self.top_p),
-                frequency_penalty=kwargs.get(
-                    "frequency_penalty", self.frequency_penalty
-                ),
+                **self._completion_params(dialogue, **kwargs)
             )
 
             is_active = True
             for chunk in responses:
-                try:
-                    # 检查是否存在有效的choice且content不为空
-                    delta = (
-                        chunk.choices[0].delta
-                        if getattr(chunk, "choices", None)
-                        else None
-                    )
-                    content = delta.content if hasattr(delta, "content") else ""
-                except IndexError:
-                    content = ""
+                self._log_usage(chunk)
+                content = self._chunk_content(chunk)
                 if content:
-                    # 处理标签跨多个chunk的情况
-                    if "<think>" in content:
-                        is_active = False
-                        content = content.split("<think>")[0]
-                    if "</think>" in content:
-                        is_active = True
-                        content = content.split("</think>")[-1]
+                    content, is_active = self._filter_think(content, is_active)
                     if is_active:
                         yield content
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
 
+    async def aresponse(self, session_id, dialogue, **kwargs):
+        """基于AsyncOpenAI的流式回复，调用方停止迭代或任务被取消时关闭上游连接"""
+        responses = None
+        try:
+            responses = await self._get_async_client().chat.completions.create(
+                **self._completion_params(dialogue, **kwargs)
+            )
+
+            is_active = True
+            async for chunk in responses:
+                self._log_usage(chunk)
+                content = self._chunk_content(chunk)
+                if content:
+                    content, is_active = self._filter_think(content, is_active)
+                    if is_active:
+                        yield content
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+        finally:
+            if responses is not None:
+                await responses.close()
+
     def response_with_functions(self, session_id, dialogue, functions=None):
         try:
             stream = self.client.chat.completions.create(
-                model=self.model_name, messages=dialogue, stream=True, tools=functions
+                **self._function_params(dialogue, functions)
             )
 
             for chunk in stream:
@@ -100,15 +168,32 @@ class LLMProvider(LLMProviderBase):
                     yield chunk.choices[0].delta.content, chunk.choices[
                         0
                     ].delta.tool_calls
-                # 存在 CompletionUsage 消息时，生成 Token 消耗 log
-                elif isinstance(getattr(chunk, "usage", None), CompletionUsage):
-                    usage_info = getattr(chunk, "usage", None)
-                    logger.bind(tag=TAG).info(
-                        f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
-                        f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
-                        f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
-                    )
+                else:
+                    self._log_usage(chunk)
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
+            yield f"【OpenAI服务响应异常: {e}】", None
+
+    async def aresponse_with_functions(self, session_id, dialogue, functions=None):
+        stream = None
+        try:
+            stream = await self._get_async_client().chat.completions.create(
+                **self._function_params(dialogue, functions)
+            )
+
+            async for chunk in stream:
+                # 检查是否存在有效的choice且content不为空
+                if getattr(chunk, "choices", None):
+                    yield chunk.choices[0].delta.content, chunk.choices[
+                        0
+                    ].delta.tool_calls
+                else:
+                    self._log_usage(chunk)
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
             yield f"【OpenAI服务响应异常: {e}】", None
+        finally:
+            if stream is not None:
+                await stream.close()
@@ -1,6 +1,8 @@
 """设备端MCP客户端定义"""
 
+import json
 import asyncio
+import hashlib
 from concurrent.futures import Future
 from core.utils.util import sanitize_tool_name
 from config.logger import setup_logging
@@ -20,6 +22,7 @@ class MCPClient:
         self.next_id = 1
         self.lock = asyncio.Lock()
         self._cached_available_tools = None  # Cache for get_available_tools
+        self._cached_fingerprint = None  # Cache for get_tools_fingerprint
 
     def has_tool(self, name: str) -> bool:
         return name in self.tools
@@ -46,6 +49,16 @@ class MCPClient:
         self._cached_available_tools = result  # Store the generated list in cache
         return result
 
+    def get_tools_fingerprint(self) -> str:
+        """设备端工具描述的摘要，添加工具时失效"""
+        if self._cached_fingerprint is None:
+            self._cached_fingerprint = hashlib.sha1(
+                json.dumps(
+                    self.get_available_tools(), sort_keys=True, ensure_ascii=False
+                ).encode()
+            ).hexdigest()
+        return self._cached_fingerprint
+
     async def is_ready(self) -> bool:
         async with self.lock:
             return self.ready
@@ -62,6 +75,7 @@ class MCPClient:
             self._cached_available_tools = (
                 None  # Invalidate the cache when a tool is added
             )
+            self._cached_fingerprint = None
 
     async def get_next_id(self) -> int:
         async with self.lock:
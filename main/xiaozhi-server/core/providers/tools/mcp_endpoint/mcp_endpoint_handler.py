@@ -385,6 +385,10 @@ async def call_mcp_endpoint_tool(
     except asyncio.TimeoutError:
         await mcp_client.cleanup_call_result(tool_call_id)
         raise TimeoutError("工具调用请求超时")
+    except asyncio.CancelledError:
+        # 超过截止时间或用户打断时被取消，同样需要清理等待中的调用
+        await mcp_client.cleanup_call_result(tool_call_id)
+        raise
     except Exception as e:
         await mcp_client.cleanup_call_result(tool_call_id)
         raise e
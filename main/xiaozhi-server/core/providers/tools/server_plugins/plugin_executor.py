@@ -1,8 +1,10 @@
 """服务端插件工具执行器"""
 
+import asyncio
 from typing import Dict, Any
 from ..base import ToolType, ToolDefinition, ToolExecutor
 from plugins_func.register import all_function_registry, Action, ActionResponse
+from core.utils.worker_pool import worker_pool
 
 
 class ServerPluginExecutor(ToolExecutor):
@@ -23,29 +25,36 @@ class ServerPluginExecutor(ToolExecutor):
             )
 
         try:
-            # 根据工具类型决定如何调用
-            if hasattr(func_item, "type"):
-                func_type = func_item.type
-                if func_type.code in [4, 5]:  # SYSTEM_CTL, IOT_CTL (需要conn参数)
-                    result = func_item.func(conn, **arguments)
-                elif func_type.code == 2:  # WAIT
-                    result = func_item.func(**arguments)
-                elif func_type.code == 3:  # CHANGE_SYS_PROMPT
-                    result = func_item.func(conn, **arguments)
-                else:
-                    result = func_item.func(**arguments)
-            else:
-                # 默认不传conn参数
-                result = func_item.func(**arguments)
-
-            return result
-
+            if asyncio.iscoroutinefunction(func_item.func):
+                # 异步插件直接在事件循环中执行，网络请求使用共享的HTTP连接池
+                return await self._call(func_item, conn, arguments)
+            # 同步插件多为阻塞的网络请求，在单独的tools线程池中执行，
+            # 慢请求不会占用音频写入等io线程，多个工具调用可以并发
+            return await worker_pool.run(
+                "tools", self._call, func_item, conn, arguments
+            )
         except Exception as e:
             return ActionResponse(
                 action=Action.ERROR,
                 response=str(e),
             )
 
+    @staticmethod
+    def _call(func_item, conn, arguments):
+        # 根据工具类型决定如何调用
+        if hasattr(func_item, "type"):
+            func_type = func_item.type
+            if func_type.code in [4, 5]:  # SYSTEM_CTL, IOT_CTL (需要conn参数)
+                return func_item.func(conn, **arguments)
+            elif func_type.code == 2:  # WAIT
+                return func_item.func(**arguments)
+            elif func_type.code == 3:  # CHANGE_SYS_PROMPT
+                return func_item.func(conn, **arguments)
+            else:
+                return func_item.func(**arguments)
+        # 默认不传conn参数
+        return func_item.func(**arguments)
+
     def get_tools(self) -> Dict[str, ToolDefinition]:
         """获取所有注册的服务端插件工具"""
         tools = {}
@@ -0,0 +1,217 @@
+"""
+工具执行的截止时间、结果缓存与耗时统计
+
+每次工具调用的截止时间取 单个工具的超时 与 本轮对话剩余时间预算 中较早的一个，
+用户打断（client_abort）时立即取消。幂等的工具可在配置中声明结果缓存，
+按工具名和规范化后的参数作为键，执行成功的结果在TTL内直接复用。
+"""
+
+import json
+import time
+import asyncio
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from core.utils.cache.manager import cache_manager, CacheType
+from plugins_func.register import Action, ActionResponse
+
+# 检查打断状态的间隔（秒）
+ABORT_POLL_INTERVAL = 0.1
+
+# 耗时直方图的桶上界（毫秒）
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# 只缓存成功的结果
+CACHEABLE_ACTIONS = (Action.REQLLM, Action.RESPONSE)
+
+
+class ToolAborted(Exception):
+    """工具执行期间用户打断"""
+
+
+@dataclass
+class ToolCachePolicy:
+    """单个工具的结果缓存声明"""
+
+    ttl: float
+    # device：按设备区分（结果依赖设备位置、配置等），global：所有设备共享
+    scope: str = "device"
+    # 执行这些工具后清空本工具的缓存，如设置设备状态后清空状态查询的缓存
+    invalidated_by: List[str] = field(default_factory=list)
+
+
+def normalize_arguments(value: Any) -> Any:
+    """规范化参数，使语义相同的参数得到相同的缓存键"""
+    if isinstance(value, dict):
+        return {
+            str(k): normalize_arguments(v)
+            for k, v in value.items()
+            if v is not None and v != ""
+        }
+    if isinstance(value, (list, tuple)):
+        return [normalize_arguments(v) for v in value]
+    if isinstance(value, str):
+        return value.strip().lower()
+    return value
+
+
+class ToolResultCache:
+    """按配置声明缓存工具结果，底层使用全局cache_manager"""
+
+    def __init__(self, cache_config: Optional[Dict[str, Any]] = None):
+        self.policies: Dict[str, ToolCachePolicy] = {}
+        # 工具名 -> 执行后需要失效的工具
+        self._invalidations: Dict[str, List[str]] = {}
+        for name, item in (cache_config or {}).items():
+            if not isinstance(item, dict):
+                item = {"ttl": item}
+            ttl = float(item.get("ttl", 0) or 0)
+            if ttl <= 0:
+                continue
+            policy = ToolCachePolicy(
+                ttl=ttl,
+                scope=str(item.get("scope", "device")),
+                invalidated_by=list(item.get("invalidated_by") or []),
+            )
+            self.policies[name] = policy
+            for trigger in policy.invalidated_by:
+                self._invalidations.setdefault(trigger, []).append(name)
+
+    def _scope_id(self, conn, policy: ToolCachePolicy) -> str:
+        if policy.scope == "global":
+            return "*"
+        return str(getattr(conn, "device_id", None) or "")
+
+    def make_key(self, conn, tool_name: str, arguments: Dict[str, Any]) -> Optional[str]:
+        """返回缓存键，工具未声明缓存时返回None"""
+        policy = self.policies.get(tool_name)
+        if policy is None:
+            return None
+        try:
+            args = json.dumps(
+                normalize_arguments(arguments or {}),
+                sort_keys=True,
+                ensure_ascii=False,
+            )
+        except (TypeError, ValueError):
+            return None
+        return f"{self._scope_id(conn, policy)}|{tool_name}|{args}"
+
+    def get(self, key: Optional[str]) -> Optional[ActionResponse]:
+        if key is None:
+            return None
+        return cache_manager.get(CacheType.TOOL_RESULT, key)
+
+    def put(self, key: Optional[str], tool_name: str, result: ActionResponse):
+        if key is None or result is None or result.action not in CACHEABLE_ACTIONS:
+            return
+        cache_manager.set(
+            CacheType.TOOL_RESULT, key, result, ttl=self.policies[tool_name].ttl
+        )
+
+    def invalidate_after(self, conn, tool_name: str):
+        """执行有副作用的工具后，清空依赖它的工具缓存"""
+        for name in self._invalidations.get(tool_name, ()):
+            policy = self.policies[name]
+            cache_manager.invalidate_pattern(
+                CacheType.TOOL_RESULT, f"{self._scope_id(conn, policy)}|{name}|"
+            )
+
+
+class ToolMetrics:
+    """按工具统计调用次数、缓存命中、超时、打断与耗时直方图"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, tool_name: str, outcome: str, elapsed: float):
+        """outcome: ok / error / timeout / aborted / cache_hit"""
+        with self._lock:
+            item = self._tools.setdefault(
+                tool_name,
+                {
+                    "calls": 0,
+                    "ok": 0,
+                    "error": 0,
+                    "timeout": 0,
+                    "aborted": 0,
+                    "cache_hit": 0,
+                    "total_seconds": 0.0,
+                    "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                },
+            )
+            item["calls"] += 1
+            item[outcome] += 1
+            if outcome == "cache_hit":
+                return
+            item["total_seconds"] += elapsed
+            item["buckets"][bisect_left(LATENCY_BUCKETS_MS, elapsed * 1000)] += 1
+
+    @staticmethod
+    def _percentile(buckets: List[int], ratio: float) -> Optional[int]:
+        """由直方图估算分位数，返回所在桶的上界（毫秒），超出最大桶时返回None"""
+        total = sum(buckets)
+        if total == 0:
+            return 0
+        target = total * ratio
+        count = 0
+        for i, n in enumerate(buckets):
+            count += n
+            if count >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            tools = {
+                name: dict(item, buckets=list(item["buckets"]))
+                for name, item in self._tools.items()
+            }
+        result = {}
+        for name, item in tools.items():
+            executed = item["calls"] - item["cache_hit"]
+            buckets = item.pop("buckets")
+            total_seconds = item.pop("total_seconds")
+            item["avg_ms"] = round(total_seconds * 1000 / executed, 1) if executed else 0.0
+            item["p50_ms"] = self._percentile(buckets, 0.5)
+            item["p95_ms"] = self._percentile(buckets, 0.95)
+            labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS]
+            labels.append(f">{LATENCY_BUCKETS_MS[-1]}ms")
+            item["histogram"] = {
+                label: n for label, n in zip(labels, buckets) if n
+            }
+            result[name] = item
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._tools.clear()
+
+
+async def run_with_deadline(coro, deadline: Optional[float], conn=None):
+    """在截止时间（time.monotonic）前执行协程，超时抛出asyncio.TimeoutError，
+    期间conn.client_abort被置位则取消执行并抛出ToolAborted"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            wait = ABORT_POLL_INTERVAL if conn is not None else None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                wait = remaining if wait is None else min(wait, remaining)
+            done, _ = await asyncio.wait({task}, timeout=wait)
+            if done:
+                return task.result()
+            if conn is not None and getattr(conn, "client_abort", False):
+                raise ToolAborted()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+# 创建全局工具执行统计实例
+tool_metrics = ToolMetrics()
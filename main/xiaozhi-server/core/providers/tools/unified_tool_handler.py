@@ -1,6 +1,7 @@
 """统一工具处理器"""
 
 import json
+import asyncio
 from typing import Dict, List, Any, Optional
 from config.logger import setup_logging
 from plugins_func.loadplugins import auto_import_modules
@@ -120,6 +121,10 @@ class UnifiedToolHandler:
         """获取所有工具的函数描述"""
         return self.tool_manager.get_function_descriptions()
 
+    def get_functions_fingerprint(self) -> str:
+        """获取函数描述的摘要，用于缓存由工具列表生成的内容"""
+        return self.tool_manager.get_functions_fingerprint()
+
     def current_support_functions(self) -> List[str]:
         """获取当前支持的函数名称列表"""
         func_names = self.tool_manager.get_supported_tool_names()
@@ -142,39 +147,55 @@ class UnifiedToolHandler:
         try:
             # 处理多函数调用
             if "function_calls" in function_call_data:
-                responses = []
-                for call in function_call_data["function_calls"]:
-                    result = await self.tool_manager.execute_tool(
-                        call["name"], call.get("arguments", {})
-                    )
-                    responses.append(result)
+                responses = await self.handle_llm_function_calls(
+                    conn, function_call_data["function_calls"]
+                )
                 return self._combine_responses(responses)
 
             # 处理单函数调用
-            function_name = function_call_data["name"]
-            arguments = function_call_data.get("arguments", {})
-
-            # 如果arguments是字符串，尝试解析为JSON
-            if isinstance(arguments, str):
-                try:
-                    arguments = json.loads(arguments) if arguments else {}
-                except json.JSONDecodeError:
-                    self.logger.error(f"无法解析函数参数: {arguments}")
-                    return ActionResponse(
-                        action=Action.ERROR,
-                        response="无法解析函数参数",
-                    )
-
-            self.logger.debug(f"调用函数: {function_name}, 参数: {arguments}")
-
-            # 执行工具调用
-            result = await self.tool_manager.execute_tool(function_name, arguments)
-            return result
+            return await self._execute_call(function_call_data)
 
         except Exception as e:
             self.logger.error(f"处理function call错误: {e}")
             return ActionResponse(action=Action.ERROR, response=str(e))
 
+    async def handle_llm_function_calls(
+        self, conn, function_calls: List[Dict[str, Any]]
+    ) -> List[ActionResponse]:
+        """并发执行一次回复中的多个工具调用，结果按调用顺序返回"""
+        if len(function_calls) == 1:
+            return [await self._execute_call(function_calls[0])]
+        self.logger.debug(
+            f"并发调用{len(function_calls)}个函数: {[call['name'] for call in function_calls]}"
+        )
+        return list(
+            await asyncio.gather(*(self._execute_call(call) for call in function_calls))
+        )
+
+    async def _execute_call(self, call: Dict[str, Any]) -> ActionResponse:
+        """执行单个工具调用，截止时间和缓存由工具管理器处理"""
+        function_name = call["name"]
+        arguments = call.get("arguments", {})
+
+        # 如果arguments是字符串，尝试解析为JSON
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments) if arguments else {}
+            except json.JSONDecodeError:
+                self.logger.error(f"无法解析函数参数: {arguments}")
+                return ActionResponse(
+                    action=Action.ERROR,
+                    response="无法解析函数参数",
+                )
+
+        self.logger.debug(f"调用函数: {function_name}, 参数: {arguments}")
+
+        try:
+            return await self.tool_manager.execute_tool(function_name, arguments)
+        except Exception as e:
+            self.logger.error(f"处理function call错误: {e}")
+            return ActionResponse(action=Action.ERROR, response=str(e))
+
     def _combine_responses(self, responses: List[ActionResponse]) -> ActionResponse:
         """合并多个函数调用的响应"""
         if not responses:
@@ -1,9 +1,14 @@
 """统一工具管理器"""
 
+import json
+import time
+import asyncio
+import hashlib
 from typing import Dict, List, Optional, Any
 from config.logger import setup_logging
 from plugins_func.register import Action, ActionResponse
 from .base import ToolType, ToolDefinition, ToolExecutor
+from .tool_runtime import ToolResultCache, ToolAborted, run_with_deadline, tool_metrics
 
 
 class ToolManager:
@@ -15,6 +20,17 @@ class ToolManager:
         self.executors: Dict[ToolType, ToolExecutor] = {}
         self._cached_tools: Optional[Dict[str, ToolDefinition]] = None
         self._cached_function_descriptions: Optional[List[Dict[str, Any]]] = None
+        self._cached_fingerprint: Optional[str] = None
+
+        # 工具执行超时，可按工具名单独设置；budget为一轮对话中工具执行的截止时间
+        tool_call_config = conn.config.get("tool_call") or {}
+        self.tool_timeout = float(tool_call_config.get("timeout", 30))
+        self.tool_timeouts = {
+            name: float(timeout)
+            for name, timeout in (tool_call_config.get("timeouts") or {}).items()
+        }
+        self.turn_budget = float(tool_call_config.get("budget", 0) or 0)
+        self.result_cache = ToolResultCache(tool_call_config.get("cache"))
 
     def register_executor(self, tool_type: ToolType, executor: ToolExecutor):
         """注册工具执行器"""
@@ -26,6 +42,7 @@ class ToolManager:
         """使缓存失效"""
         self._cached_tools = None
         self._cached_function_descriptions = None
+        self._cached_fingerprint = None
 
     def get_all_tools(self) -> Dict[str, ToolDefinition]:
         """获取所有工具定义"""
@@ -51,14 +68,23 @@ class ToolManager:
         if self._cached_function_descriptions is not None:
             return self._cached_function_descriptions
 
-        descriptions = []
+        # 按工具名排序，工具注册顺序不同时请求中的工具列表也保持一致，便于大模型服务复用前缀缓存
         tools = self.get_all_tools()
-        for tool_definition in tools.values():
-            descriptions.append(tool_definition.description)
+        descriptions = [tools[name].description for name in sorted(tools)]
 
         self._cached_function_descriptions = descriptions
         return descriptions
 
+    def get_functions_fingerprint(self) -> str:
+        """函数描述的摘要，工具变化时随缓存一起失效"""
+        if self._cached_fingerprint is None:
+            self._cached_fingerprint = hashlib.sha1(
+                json.dumps(
+                    self.get_function_descriptions(), sort_keys=True, ensure_ascii=False
+                ).encode()
+            ).hexdigest()
+        return self._cached_fingerprint
+
     def has_tool(self, tool_name: str) -> bool:
         """检查是否存在指定工具"""
         tools = self.get_all_tools()
@@ -70,10 +96,22 @@ class ToolManager:
         tool_def = tools.get(tool_name)
         return tool_def.tool_type if tool_def else None
 
+    def get_deadline(self, tool_name: str) -> Optional[float]:
+        """工具的截止时间：单个工具超时与本轮对话剩余预算中较早的一个"""
+        deadlines = []
+        timeout = self.tool_timeouts.get(tool_name, self.tool_timeout)
+        if timeout > 0:
+            deadlines.append(time.monotonic() + timeout)
+        turn_started_at = getattr(self.conn, "turn_started_at", None)
+        if self.turn_budget > 0 and turn_started_at is not None:
+            deadlines.append(turn_started_at + self.turn_budget)
+        return min(deadlines) if deadlines else None
+
     async def execute_tool(
         self, tool_name: str, arguments: Dict[str, Any]
     ) -> ActionResponse:
-        """执行工具调用"""
+        """执行工具调用，超过截止时间或用户打断时取消执行"""
+        start_time = time.monotonic()
         try:
             # 查找工具类型
             tool_type = self.get_tool_type(tool_name)
@@ -91,13 +129,45 @@ class ToolManager:
                     response=f"工具类型 {tool_type.value} 的执行器未注册",
                 )
 
+            # 幂等工具优先使用缓存的结果
+            cache_key = self.result_cache.make_key(self.conn, tool_name, arguments)
+            result = self.result_cache.get(cache_key)
+            if result is not None:
+                self.logger.info(f"工具结果缓存命中: {tool_name}，参数: {arguments}")
+                tool_metrics.record(tool_name, "cache_hit", 0.0)
+                return result
+
             # 执行工具
             self.logger.info(f"执行工具: {tool_name}，参数: {arguments}")
-            result = await executor.execute(self.conn, tool_name, arguments)
+            deadline = self.get_deadline(tool_name)
+            if deadline is not None and deadline <= time.monotonic():
+                raise asyncio.TimeoutError()
+            result = await run_with_deadline(
+                executor.execute(self.conn, tool_name, arguments), deadline, self.conn
+            )
             self.logger.debug(f"工具执行结果: {result}")
+            tool_metrics.record(
+                tool_name,
+                "error" if result is None or result.action == Action.ERROR else "ok",
+                time.monotonic() - start_time,
+            )
+            self.result_cache.put(cache_key, tool_name, result)
+            self.result_cache.invalidate_after(self.conn, tool_name)
             return result
 
+        except asyncio.TimeoutError:
+            elapsed = time.monotonic() - start_time
+            tool_metrics.record(tool_name, "timeout", elapsed)
+            self.logger.error(f"工具执行超时: {tool_name}，已等待{elapsed:.2f}秒")
+            return ActionResponse(
+                action=Action.ERROR, response=f"{tool_name}执行超时，请稍后再试"
+            )
+        except ToolAborted:
+            tool_metrics.record(tool_name, "aborted", time.monotonic() - start_time)
+            self.logger.info(f"用户打断，取消执行工具: {tool_name}")
+            return ActionResponse(action=Action.NONE)
         except Exception as e:
+            tool_metrics.record(tool_name, "error", time.monotonic() - start_time)
             self.logger.error(f"执行工具 {tool_name} 时出错: {e}")
             return ActionResponse(action=Action.ERROR, response=str(e))
 
@@ -7,11 +7,14 @@ import requests
 from datetime import datetime
 from core.providers.tts.base import TTSProviderBase
 from config.logger import setup_logging
+from core.utils.provider_registry import provider_registry
 import time
 import uuid
 from urllib import parse
 
 TAG = __name__
+# 阿里云NLS的Token有效期远长于1小时，同一账号的实例共享1小时内申请的Token
+NLS_TOKEN_SHARE_SECONDS = 3600
 logger = setup_logging()
 
 
@@ -124,11 +127,16 @@ class TTSProvider(TTSProviderBase):
             self.token = config.get("token")
             self.expire_time = None
 
-    def _refresh_token(self):
+    def _refresh_token(self, force=False):
         """刷新Token并记录过期时间"""
         if self.access_key_id and self.access_key_secret:
-            self.token, expire_time_str = AccessToken.create_token(
-                self.access_key_id, self.access_key_secret
+            self.token, expire_time_str = provider_registry.shared_credential(
+                ("aliyun_nls", self.access_key_id, self.access_key_secret),
+                lambda: AccessToken.create_token(
+                    self.access_key_id, self.access_key_secret
+                ),
+                NLS_TOKEN_SHARE_SECONDS,
+                force=force,
             )
             if not expire_time_str:
                 raise ValueError("无法获取有效的Token过期时间")
@@ -185,7 +193,7 @@ class TTSProvider(TTSProviderBase):
                 self.api_url, json.dumps(request_json), headers=self.header
             )
             if resp.status_code == 401:  # Token过期特殊处理
-                self._refresh_token()
+                self._refresh_token(force=True)
                 resp = requests.post(
                     self.api_url, json.dumps(request_json), headers=self.header
                 )
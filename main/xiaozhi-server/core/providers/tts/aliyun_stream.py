@@ -4,7 +4,6 @@ import hmac
 import hashlib
 import base64
 import time
-import queue
 import asyncio
 import traceback
 from asyncio import Task
@@ -13,12 +12,22 @@ import os
 from datetime import datetime
 from urllib import parse
 from core.providers.tts.base import TTSProviderBase
-from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
+from core.utils.tts_cache import tts_cache
+from core.providers.tts.dto.dto import (
+    SentenceType,
+    ContentType,
+    InterfaceType,
+    TTSMessageDTO,
+)
 from core.utils.tts import MarkdownCleaner
+from core.utils.text_segmenter import MarkdownStreamFilter
 from core.utils import opus_encoder_utils, textUtils
 from config.logger import setup_logging
+from core.utils.provider_registry import provider_registry
 
 TAG = __name__
+# 阿里云NLS的Token有效期远长于1小时，同一账号的实例共享1小时内申请的Token
+NLS_TOKEN_SHARE_SECONDS = 3600
 logger = setup_logging()
 
 
@@ -87,6 +96,8 @@ class AccessToken:
 class TTSProvider(TTSProviderBase):
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
+        # 转发LLM输出前过滤代码块和Markdown标记，不做分句
+        self.text_filter = MarkdownStreamFilter()
 
         # 设置为流式接口类型
         self.interface_type = InterfaceType.DUAL_STREAM
@@ -145,11 +156,16 @@ class TTSProvider(TTSProviderBase):
             self.token = config.get("token")
             self.expire_time = None
 
-    def _refresh_token(self):
+    def _refresh_token(self, force=False):
         """刷新Token并记录过期时间"""
         if self.access_key_id and self.access_key_secret:
-            self.token, expire_time_str = AccessToken.create_token(
-                self.access_key_id, self.access_key_secret
+            self.token, expire_time_str = provider_registry.shared_credential(
+                ("aliyun_nls", self.access_key_id, self.access_key_secret),
+                lambda: AccessToken.create_token(
+                    self.access_key_id, self.access_key_secret
+                ),
+                NLS_TOKEN_SHARE_SECONDS,
+                force=force,
             )
             if not expire_time_str:
                 raise ValueError("无法获取有效的Token过期时间")
@@ -205,92 +221,90 @@ class TTSProvider(TTSProviderBase):
             self.last_active_time = None
             raise
 
-    def tts_text_priority_thread(self):
-        """流式文本处理线程"""
-        while not self.conn.stop_event.is_set():
-            try:
-                message = self.tts_text_queue.get(timeout=1)
-                logger.bind(tag=TAG).debug(
-                    f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
-                )
+    def handle_tts_text(self, message: TTSMessageDTO):
+        """处理一条流式TTS文本消息"""
+        logger.bind(tag=TAG).debug(
+            f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
+        )
 
-                if message.sentence_type == SentenceType.FIRST:
-                    self.conn.client_abort = False
+        if message.sentence_type == SentenceType.FIRST:
+            self.conn.client_abort = False
 
-                if self.conn.client_abort:
-                    logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
-                    continue
+        if self.conn.client_abort:
+            logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
+            return
 
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化参数
-                    try:
-                        if not getattr(self.conn, "sentence_id", None):
-                            self.conn.sentence_id = uuid.uuid4().hex
-                            logger.bind(tag=TAG).info(
-                                f"自动生成新的 会话ID: {self.conn.sentence_id}"
-                            )
+        if message.sentence_type == SentenceType.FIRST:
+            # 初始化参数
+            try:
+                if not getattr(self.conn, "sentence_id", None):
+                    self.conn.sentence_id = uuid.uuid4().hex
+                    logger.bind(tag=TAG).info(
+                        f"自动生成新的 会话ID: {self.conn.sentence_id}"
+                    )
 
-                        # aliyunStream独有的参数生成
-                        self.message_id = str(uuid.uuid4().hex)
+                # aliyunStream独有的参数生成
+                self.message_id = str(uuid.uuid4().hex)
 
-                        logger.bind(tag=TAG).info("开始启动TTS会话...")
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.start_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        future.result()
-                        self.before_stop_play_files.clear()
-                        logger.bind(tag=TAG).info("TTS会话启动成功")
-
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
-                        continue
+                logger.bind(tag=TAG).info("开始启动TTS会话...")
+                future = asyncio.run_coroutine_threadsafe(
+                    self.start_session(self.conn.sentence_id),
+                    loop=self.conn.loop,
+                )
+                future.result()
+                self.text_filter.reset()
+                self.before_stop_play_files.clear()
+                logger.bind(tag=TAG).info("TTS会话启动成功")
 
-                elif ContentType.TEXT == message.content_type:
-                    if message.content_detail:
-                        try:
-                            logger.bind(tag=TAG).debug(
-                                f"开始发送TTS文本: {message.content_detail}"
-                            )
-                            future = asyncio.run_coroutine_threadsafe(
-                                self.text_to_speak(message.content_detail, None),
-                                loop=self.conn.loop,
-                            )
-                            future.result()
-                            logger.bind(tag=TAG).debug("TTS文本发送成功")
-                        except Exception as e:
-                            logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
-                            continue
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
+                return
 
-                elif ContentType.FILE == message.content_type:
-                    logger.bind(tag=TAG).info(
-                        f"添加音频文件到待播放列表: {message.content_file}"
-                    )
-                    if message.content_file and os.path.exists(message.content_file):
-                        # 先处理文件音频数据
-                        file_audio = self._process_audio_file(message.content_file)
-                        self.before_stop_play_files.append(
-                            (file_audio, message.content_detail)
-                        )
+        elif ContentType.TEXT == message.content_type:
+            # 服务端按token流式合成，收到就转发，不等待整句；
+            # 代码块和被拆到多个token中的Markdown标记在转发前过滤
+            text = self.text_filter.feed(message.content_detail)
+            if text and not self._send_segment(text):
+                return
 
-                if message.sentence_type == SentenceType.LAST:
-                    try:
-                        logger.bind(tag=TAG).info("开始结束TTS会话...")
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.finish_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        future.result()
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
-                        continue
+        elif ContentType.FILE == message.content_type:
+            logger.bind(tag=TAG).info(
+                f"添加音频文件到待播放列表: {message.content_file}"
+            )
+            if message.content_file and os.path.exists(message.content_file):
+                # 先处理文件音频数据
+                file_audio = self._process_audio_file(message.content_file)
+                self.before_stop_play_files.append(
+                    (file_audio, message.content_detail)
+                )
 
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.bind(tag=TAG).error(
-                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+        if message.sentence_type == SentenceType.LAST:
+            self.text_filter.reset()
+            try:
+                logger.bind(tag=TAG).info("开始结束TTS会话...")
+                future = asyncio.run_coroutine_threadsafe(
+                    self.finish_session(self.conn.sentence_id),
+                    loop=self.conn.loop,
                 )
+                future.result()
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
+                return
+
+    def _send_segment(self, text):
+        """发送一段文本到TTS服务，返回是否成功"""
+        try:
+            logger.bind(tag=TAG).debug(f"开始发送TTS文本: {text}")
+            future = asyncio.run_coroutine_threadsafe(
+                self.text_to_speak(text, None),
+                loop=self.conn.loop,
+            )
+            future.result()
+            logger.bind(tag=TAG).debug("TTS文本发送成功")
+            return True
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
+            return False
 
     async def text_to_speak(self, text, _):
         try:
@@ -514,6 +528,10 @@ class TTSProvider(TTSProviderBase):
 
     def to_tts(self, text: str) -> list:
         """非流式TTS处理，用于测试及保存音频文件的场景"""
+        cache_key = self.tts_cache_key(text)
+        cached_datas = tts_cache.get(cache_key)
+        if cached_datas is not None:
+            return cached_datas
         try:
             # 创建新的事件循环
             loop = asyncio.new_event_loop()
@@ -647,6 +665,7 @@ class TTSProvider(TTSProviderBase):
             loop.run_until_complete(_generate_audio())
             loop.close()
 
+            tts_cache.put(cache_key, audio_data)
             return audio_data
         except Exception as e:
             logger.bind(tag=TAG).error(f"生成音频数据失败: {str(e)}")
@@ -1,19 +1,22 @@
 import os
 import re
-import queue
+import time
 import uuid
 import asyncio
-import threading
 from core.utils import p3
 from datetime import datetime
-from core.utils import textUtils
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 from core.utils.util import audio_to_data, audio_bytes_to_data
 from core.utils.tts import MarkdownCleaner
+from core.utils.text_segmenter import TextSegmenter, DEFAULT_MAX_LENGTH
 from core.utils.output_counter import add_device_output
+from core.utils.audio_cache import audio_asset_cache
+from core.utils.tts_cache import tts_cache
+from core.utils.audio_stream import StreamingTranscoder, STREAM_TRANSCODE_TYPES
+from core.utils.worker_pool import worker_pool, LoopQueue
 from core.handle.reportHandle import enqueue_tts_report
-from core.handle.sendAudioHandle import sendAudioMessage
+from core.handle.sendAudioHandle import AudioStream, sendAudioMessage
 from core.providers.tts.dto.dto import (
     TTSMessageDTO,
     SentenceType,
@@ -34,13 +37,16 @@ class TTSProviderBase(ABC):
         self.tts_timeout = 10
         self.delete_audio_file = delete_audio_file
         self.audio_file_type = "wav"
+        # 子类实现了stream_audio_chunks时设为True，压缩音频边下载边转码播放
+        self.support_audio_stream = False
         self.output_file = config.get("output_dir", "tmp/")
-        self.tts_text_queue = queue.Queue()
-        self.tts_audio_queue = queue.Queue()
+        # 音色、语速等配置的指纹，作为整句合成结果缓存键的一部分
+        self.tts_cache_fingerprint = tts_cache.fingerprint(type(self).__module__, config)
+        self.tts_text_queue = LoopQueue()
+        self.tts_audio_queue = LoopQueue()
         self.tts_audio_first_sentence = True
         self.before_stop_play_files = []
 
-        self.tts_text_buff = []
         self.punctuations = (
             "。",
             "？",
@@ -51,6 +57,7 @@ class TTSProviderBase(ABC):
             ";",
             "：",
             "~",
+            ".",
         )
         self.first_sentence_punctuations = (
             "，",
@@ -66,10 +73,15 @@ class TTSProviderBase(ABC):
             "；",
             ";",
             "：",
+            ".",
+        )
+        # 大模型流式输出的增量分句
+        self.segmenter = TextSegmenter(
+            self.punctuations,
+            self.first_sentence_punctuations,
+            min_length=int(config.get("segment_min_length", 0)),
+            max_length=int(config.get("segment_max_length", DEFAULT_MAX_LENGTH)),
         )
-        self.tts_stop_request = False
-        self.processed_chars = 0
-        self.is_first_sentence = True
 
     def generate_filename(self, extension=".wav"):
         return os.path.join(
@@ -77,11 +89,22 @@ class TTSProviderBase(ABC):
             f"tts-{datetime.now().date()}@{uuid.uuid4().hex}{extension}",
         )
 
+    def tts_cache_key(self, text, is_opus=True):
+        """整句合成结果的缓存键，不需要缓存时返回None"""
+        return tts_cache.make_key(
+            self.tts_cache_fingerprint, MarkdownCleaner.clean_markdown(text), is_opus
+        )
+
     def to_tts(self, text):
         text = MarkdownCleaner.clean_markdown(text)
         max_repeat_time = 5
         if self.delete_audio_file:
             # 需要删除文件的直接转为音频数据
+            cache_key = self.tts_cache_key(text)
+            audio_datas = tts_cache.get(cache_key)
+            if audio_datas is not None:
+                return audio_datas
+            start_time = time.perf_counter()
             while max_repeat_time > 0:
                 try:
                     audio_bytes = asyncio.run(self.text_to_speak(text, None))
@@ -89,6 +112,10 @@ class TTSProviderBase(ABC):
                         audio_datas, _ = audio_bytes_to_data(
                             audio_bytes, file_type=self.audio_file_type, is_opus=True
                         )
+                        logger.bind(tag=TAG).info(
+                            f"首帧音频耗时: {(time.perf_counter() - start_time) * 1000:.0f}ms, {text}"
+                        )
+                        tts_cache.put(cache_key, audio_datas)
                         return audio_datas
                     else:
                         max_repeat_time -= 1
@@ -139,6 +166,91 @@ class TTSProviderBase(ABC):
     async def text_to_speak(self, text, output_file):
         pass
 
+    async def stream_audio_chunks(self, text):
+        """按到达顺序逐块返回压缩音频数据，默认整句合成后一次返回"""
+        audio_bytes = await self.text_to_speak(text, None)
+        if audio_bytes:
+            yield audio_bytes
+
+    def use_audio_stream(self):
+        """是否边下载边转码，只对需要ffmpeg解码的压缩格式生效"""
+        return (
+            self.delete_audio_file
+            and self.support_audio_stream
+            and self.audio_file_type in STREAM_TRANSCODE_TYPES
+        )
+
+    def to_tts_stream(self, text, sentence_type):
+        """边合成边转码，解码出的音频帧分批送入同一个AudioStream播放
+
+        解码出第一批音频时把整句的AudioStream放入播放队列，后续批次在同一段
+        音频里连续播放。已经开始播放后合成失败不再重试，避免同一句话重复播放。
+
+        Returns:
+            bool: 是否成功生成了语音
+        """
+        text = MarkdownCleaner.clean_markdown(text)
+        is_opus = self.conn.audio_format != "pcm"
+        cache_key = self.tts_cache_key(text, is_opus)
+        audio_datas = tts_cache.get(cache_key)
+        if audio_datas is not None:
+            self.tts_audio_queue.put((sentence_type, audio_datas, text))
+            return True
+
+        stream = None
+        all_frames = []
+
+        def on_frames(frames):
+            nonlocal stream
+            all_frames.extend(frames)
+            if stream is None:
+                stream = AudioStream(self.conn.loop)
+                self.tts_audio_queue.put((sentence_type, stream, text))
+            stream.put(frames)
+
+        try:
+            max_repeat_time = 5
+            while max_repeat_time > 0:
+                transcoder = StreamingTranscoder(
+                    self.audio_file_type, on_frames, is_opus
+                )
+                try:
+                    asyncio.run(self._feed_audio_stream(text, transcoder))
+                    transcoder.finish()
+                except Exception as e:
+                    transcoder.abort()
+                    if stream is not None:
+                        logger.bind(tag=TAG).error(f"语音生成中断: {text}，错误: {e}")
+                        return False
+                    logger.bind(tag=TAG).warning(
+                        f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
+                    )
+                    max_repeat_time -= 1
+                    continue
+                if self.conn.client_abort:
+                    return False
+                if transcoder.frame_count:
+                    logger.bind(tag=TAG).info(
+                        f"首帧音频耗时: {transcoder.first_frame_latency * 1000:.0f}ms, "
+                        f"音频时长: {transcoder.duration:.2f}s, {text}"
+                    )
+                    tts_cache.put(cache_key, all_frames)
+                    return True
+                max_repeat_time -= 1
+            logger.bind(tag=TAG).error(f"语音生成失败: {text}，请检查网络或服务是否正常")
+            return False
+        finally:
+            # 无论成功与否都要结束，否则播放任务会一直等待下一批音频
+            if stream is not None:
+                stream.finish()
+
+    async def _feed_audio_stream(self, text, transcoder):
+        async for chunk in self.stream_audio_chunks(text):
+            if self.conn.client_abort:
+                transcoder.abort()
+                return
+            transcoder.feed(chunk)
+
     def audio_to_pcm_data(self, audio_file_path):
         """音频文件转换为PCM编码"""
         return audio_to_data(audio_file_path, is_opus=False)
@@ -178,93 +290,64 @@ class TTSProviderBase(ABC):
     async def open_audio_channels(self, conn):
         self.conn = conn
         self.tts_timeout = conn.config.get("tts_timeout", 10)
-        # tts 消化线程
-        self.tts_priority_thread = threading.Thread(
-            target=self.tts_text_priority_thread, daemon=True
-        )
-        self.tts_priority_thread.start()
-
-        # 音频播放 消化线程
-        self.audio_play_priority_thread = threading.Thread(
-            target=self._audio_play_priority_thread, daemon=True
-        )
-        self.audio_play_priority_thread.start()
-
-    # 这里默认是非流式的处理方式
-    # 流式处理方式请在子类中重写
-    def tts_text_priority_thread(self):
+        self.tts_text_queue.bind(conn.loop)
+        self.tts_audio_queue.bind(conn.loop)
+        # tts 消化任务
+        conn.create_pipeline_task(self._tts_text_priority_task())
+        # 音频播放 消化任务
+        conn.create_pipeline_task(self._audio_play_priority_task())
+
+    async def _tts_text_priority_task(self):
+        """按顺序消化TTS文本，阻塞的合成调用放到共享线程池中执行"""
         while not self.conn.stop_event.is_set():
+            message = await self.tts_text_queue.get()
             try:
-                message = self.tts_text_queue.get(timeout=1)
-                if message.sentence_type == SentenceType.FIRST:
-                    self.conn.client_abort = False
-                if self.conn.client_abort:
-                    logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
-                    continue
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化参数
-                    self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.is_first_sentence = True
-                    self.tts_audio_first_sentence = True
-                elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-                    if segment_text:
-                        if self.delete_audio_file:
-                            audio_datas = self.to_tts(segment_text)
-                            if audio_datas:
-                                self.tts_audio_queue.put(
-                                    (message.sentence_type, audio_datas, segment_text)
-                                )
-                        else:
-                            tts_file = self.to_tts(segment_text)
-                            if tts_file:
-                                audio_datas = self._process_audio_file(tts_file)
-                                self.tts_audio_queue.put(
-                                    (message.sentence_type, audio_datas, segment_text)
-                                )
-                elif ContentType.FILE == message.content_type:
-                    self._process_remaining_text()
-                    tts_file = message.content_file
-                    if tts_file and os.path.exists(tts_file):
-                        audio_datas = self._process_audio_file(tts_file)
-                        self.tts_audio_queue.put(
-                            (message.sentence_type, audio_datas, message.content_detail)
-                        )
-
-                if message.sentence_type == SentenceType.LAST:
-                    self._process_remaining_text()
-                    self.tts_audio_queue.put(
-                        (message.sentence_type, [], message.content_detail)
-                    )
-
-            except queue.Empty:
-                continue
+                await worker_pool.run("tts", self.handle_tts_text, message)
             except Exception as e:
                 logger.bind(tag=TAG).error(
                     f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
                 )
-                continue
 
-    def _audio_play_priority_thread(self):
+    # 这里默认是非流式的处理方式
+    # 流式处理方式请在子类中重写
+    def handle_tts_text(self, message: TTSMessageDTO):
+        """处理一条TTS文本消息，在共享线程池中执行"""
+        if message.sentence_type == SentenceType.FIRST:
+            self.conn.client_abort = False
+        if self.conn.client_abort:
+            logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
+            return
+        if message.sentence_type == SentenceType.FIRST:
+            # 初始化参数
+            self.segmenter.reset()
+            self.tts_audio_first_sentence = True
+        elif ContentType.TEXT == message.content_type:
+            for segment_text in self.segmenter.feed(message.content_detail):
+                self._synthesize_segment(segment_text, message.sentence_type)
+        elif ContentType.FILE == message.content_type:
+            self._process_remaining_text()
+            tts_file = message.content_file
+            if tts_file and os.path.exists(tts_file):
+                audio_datas = self._process_audio_file(tts_file)
+                self.tts_audio_queue.put(
+                    (message.sentence_type, audio_datas, message.content_detail)
+                )
+
+        if message.sentence_type == SentenceType.LAST:
+            self._process_remaining_text()
+            self.tts_audio_queue.put(
+                (message.sentence_type, [], message.content_detail)
+            )
+
+    async def _audio_play_priority_task(self):
         while not self.conn.stop_event.is_set():
             text = None
             try:
-                try:
-                    sentence_type, audio_datas, text = self.tts_audio_queue.get(
-                        timeout=1
-                    )
-                except queue.Empty:
-                    if self.conn.stop_event.is_set():
-                        break
-                    continue
-                future = asyncio.run_coroutine_threadsafe(
-                    sendAudioMessage(self.conn, sentence_type, audio_datas, text),
-                    self.conn.loop,
-                )
-                future.result()
+                sentence_type, audio_datas, text = await self.tts_audio_queue.get()
+                await sendAudioMessage(self.conn, sentence_type, audio_datas, text)
+                if isinstance(audio_datas, AudioStream):
+                    # 整句播放结束后用实际发送的全部音频上报一次
+                    audio_datas = audio_datas.frames
                 if self.conn.max_output_size > 0 and text:
                     add_device_output(self.conn.headers.get("device-id"), len(text))
                 enqueue_tts_report(self.conn, text, audio_datas)
@@ -284,45 +367,6 @@ class TTSProviderBase(ABC):
         if hasattr(self, "ws") and self.ws:
             await self.ws.close()
 
-    def _get_segment_text(self):
-        # 合并当前全部文本并处理未分割部分
-        full_text = "".join(self.tts_text_buff)
-        current_text = full_text[self.processed_chars :]  # 从未处理的位置开始
-        last_punct_pos = -1
-
-        # 根据是否是第一句话选择不同的标点符号集合
-        punctuations_to_use = (
-            self.first_sentence_punctuations
-            if self.is_first_sentence
-            else self.punctuations
-        )
-
-        for punct in punctuations_to_use:
-            pos = current_text.rfind(punct)
-            if (pos != -1 and last_punct_pos == -1) or (
-                pos != -1 and pos < last_punct_pos
-            ):
-                last_punct_pos = pos
-
-        if last_punct_pos != -1:
-            segment_text_raw = current_text[: last_punct_pos + 1]
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(
-                segment_text_raw
-            )
-            self.processed_chars += len(segment_text_raw)  # 更新已处理字符位置
-
-            # 如果是第一句话，在找到第一个逗号后，将标志设置为False
-            if self.is_first_sentence:
-                self.is_first_sentence = False
-
-            return segment_text
-        elif self.tts_stop_request and current_text:
-            segment_text = current_text
-            self.is_first_sentence = True  # 重置标志
-            return segment_text
-        else:
-            return None
-
     def _process_audio_file(self, tts_file):
         """处理音频文件并转换为指定格式
 
@@ -333,7 +377,12 @@ class TTSProviderBase(ABC):
         Returns:
             tuple: (sentence_type, audio_datas, content_detail)
         """
-        if tts_file.endswith(".p3"):
+        if not tts_file.startswith(self.output_file):
+            # 音乐、提示音等静态文件使用转码缓存
+            audio_datas, _ = audio_asset_cache.get(
+                tts_file, is_opus=self.conn.audio_format != "pcm"
+            )
+        elif tts_file.endswith(".p3"):
             audio_datas, _ = p3.decode_opus_from_file(tts_file)
         elif self.conn.audio_format == "pcm":
             audio_datas, _ = self.audio_to_pcm_data(tts_file)
@@ -355,29 +404,28 @@ class TTSProviderBase(ABC):
         self.before_stop_play_files.clear()
         self.tts_audio_queue.put((SentenceType.LAST, [], None))
 
+    def _synthesize_segment(self, segment_text, sentence_type):
+        """合成切分出的一句文本，音频放入播放队列"""
+        if self.use_audio_stream():
+            self.to_tts_stream(segment_text, sentence_type)
+        elif self.delete_audio_file:
+            audio_datas = self.to_tts(segment_text)
+            if audio_datas:
+                self.tts_audio_queue.put((sentence_type, audio_datas, segment_text))
+        else:
+            tts_file = self.to_tts(segment_text)
+            if tts_file:
+                audio_datas = self._process_audio_file(tts_file)
+                self.tts_audio_queue.put((sentence_type, audio_datas, segment_text))
+
     def _process_remaining_text(self):
         """处理剩余的文本并生成语音
 
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
-        if remaining_text:
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
-            if segment_text:
-                if self.delete_audio_file:
-                    audio_datas = self.to_tts(segment_text)
-                    if audio_datas:
-                        self.tts_audio_queue.put(
-                            (SentenceType.MIDDLE, audio_datas, segment_text)
-                        )
-                else:
-                    tts_file = self.to_tts(segment_text)
-                    audio_datas = self._process_audio_file(tts_file)
-                    self.tts_audio_queue.put(
-                        (SentenceType.MIDDLE, audio_datas, segment_text)
-                    )
-                self.processed_chars += len(full_text)
-                return True
+        segment_text = self.segmenter.flush()
+        if segment_text:
+            self._synthesize_segment(segment_text, SentenceType.MIDDLE)
+            return True
         return False
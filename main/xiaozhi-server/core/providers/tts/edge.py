@@ -13,6 +13,7 @@ class TTSProvider(TTSProviderBase):
         else:
             self.voice = config.get("voice")
         self.audio_file_type = config.get("format", "mp3")
+        self.support_audio_stream = True
 
     def generate_filename(self, extension=".mp3"):
         return os.path.join(
@@ -36,11 +37,20 @@ class TTSProvider(TTSProviderBase):
                             f.write(chunk["data"])
             else:
                 # 返回音频二进制数据
-                audio_bytes = b""
+                audio_chunks = []
                 async for chunk in communicate.stream():
                     if chunk["type"] == "audio":
-                        audio_bytes += chunk["data"]
-                return audio_bytes
+                        audio_chunks.append(chunk["data"])
+                return b"".join(audio_chunks)
         except Exception as e:
             error_msg = f"Edge TTS请求失败: {e}"
-            raise Exception(error_msg)  # 抛出异常，让调用方捕获
\ No newline at end of file
+            raise Exception(error_msg)  # 抛出异常，让调用方捕获
+
+    async def stream_audio_chunks(self, text):
+        try:
+            communicate = edge_tts.Communicate(text, voice=self.voice)
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    yield chunk["data"]
+        except Exception as e:
+            raise Exception(f"Edge TTS请求失败: {e}")
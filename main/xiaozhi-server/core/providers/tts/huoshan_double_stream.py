@@ -1,16 +1,22 @@
 import os
 import uuid
 import json
-import queue
 import asyncio
 import traceback
 import websockets
 from core.utils.tts import MarkdownCleaner
+from core.utils.text_segmenter import MarkdownStreamFilter
 from config.logger import setup_logging
 from core.utils import opus_encoder_utils
 from core.utils.util import check_model_key
 from core.providers.tts.base import TTSProviderBase
-from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
+from core.utils.tts_cache import tts_cache
+from core.providers.tts.dto.dto import (
+    SentenceType,
+    ContentType,
+    InterfaceType,
+    TTSMessageDTO,
+)
 from asyncio import Task
 
 
@@ -141,6 +147,8 @@ class Response:
 class TTSProvider(TTSProviderBase):
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
+        # 转发LLM输出前过滤代码块和Markdown标记，不做分句
+        self.text_filter = MarkdownStreamFilter()
         self.ws = None
         self.interface_type = InterfaceType.DUAL_STREAM
         self._monitor_task = None  # 监听任务引用
@@ -201,95 +209,92 @@ class TTSProvider(TTSProviderBase):
             self.ws = None
             raise
 
-    def tts_text_priority_thread(self):
-        """火山引擎双流式TTS的文本处理线程"""
-        while not self.conn.stop_event.is_set():
+    def handle_tts_text(self, message: TTSMessageDTO):
+        """处理一条火山引擎双流式TTS文本消息"""
+        logger.bind(tag=TAG).debug(
+            f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
+        )
+
+        if message.sentence_type == SentenceType.FIRST:
+            self.conn.client_abort = False
+
+        if self.conn.client_abort:
             try:
-                message = self.tts_text_queue.get(timeout=1)
-                logger.bind(tag=TAG).debug(
-                    f"收到TTS任务｜{message.sentence_type.name} ｜ {message.content_type.name} | 会话ID: {self.conn.sentence_id}"
+                logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
+                asyncio.run_coroutine_threadsafe(
+                    self.cancel_session(self.conn.sentence_id),
+                    loop=self.conn.loop,
                 )
+                return
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"取消TTS会话失败: {str(e)}")
+                return
 
-                if message.sentence_type == SentenceType.FIRST:
-                    self.conn.client_abort = False
-
-                if self.conn.client_abort:
-                    try:
-                        logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
-                        asyncio.run_coroutine_threadsafe(
-                            self.cancel_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        continue
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"取消TTS会话失败: {str(e)}")
-                        continue
+        if message.sentence_type == SentenceType.FIRST:
+            # 初始化参数
+            try:
+                if not getattr(self.conn, "sentence_id", None): 
+                    self.conn.sentence_id = uuid.uuid4().hex
+                    logger.bind(tag=TAG).info(f"自动生成新的 会话ID: {self.conn.sentence_id}")
+
+                logger.bind(tag=TAG).info("开始启动TTS会话...")
+                future = asyncio.run_coroutine_threadsafe(
+                    self.start_session(self.conn.sentence_id),
+                    loop=self.conn.loop,
+                )
+                future.result()
+                self.text_filter.reset()
+                self.before_stop_play_files.clear()
+                logger.bind(tag=TAG).info("TTS会话启动成功")
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
+                return
 
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化参数
-                    try:
-                        if not getattr(self.conn, "sentence_id", None): 
-                            self.conn.sentence_id = uuid.uuid4().hex
-                            logger.bind(tag=TAG).info(f"自动生成新的 会话ID: {self.conn.sentence_id}")
-
-                        logger.bind(tag=TAG).info("开始启动TTS会话...")
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.start_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        future.result()
-                        self.before_stop_play_files.clear()
-                        logger.bind(tag=TAG).info("TTS会话启动成功")
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"启动TTS会话失败: {str(e)}")
-                        continue
-
-                elif ContentType.TEXT == message.content_type:
-                    if message.content_detail:
-                        try:
-                            logger.bind(tag=TAG).debug(
-                                f"开始发送TTS文本: {message.content_detail}"
-                            )
-                            future = asyncio.run_coroutine_threadsafe(
-                                self.text_to_speak(message.content_detail, None),
-                                loop=self.conn.loop,
-                            )
-                            future.result()
-                            logger.bind(tag=TAG).debug("TTS文本发送成功")
-                        except Exception as e:
-                            logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
-                            continue
-
-                elif ContentType.FILE == message.content_type:
-                    logger.bind(tag=TAG).info(
-                        f"添加音频文件到待播放列表: {message.content_file}"
-                    )
-                    if message.content_file and os.path.exists(message.content_file):
-                        # 先处理文件音频数据
-                        file_audio = self._process_audio_file(message.content_file)
-                        self.before_stop_play_files.append(
-                            (file_audio, message.content_detail)
-                        )
+        elif ContentType.TEXT == message.content_type:
+            # 服务端按token流式合成，收到就转发，不等待整句；
+            # 代码块和被拆到多个token中的Markdown标记在转发前过滤
+            text = self.text_filter.feed(message.content_detail)
+            if text and not self._send_segment(text):
+                return
 
-                if message.sentence_type == SentenceType.LAST:
-                    try:
-                        logger.bind(tag=TAG).info("开始结束TTS会话...")
-                        future = asyncio.run_coroutine_threadsafe(
-                            self.finish_session(self.conn.sentence_id),
-                            loop=self.conn.loop,
-                        )
-                        future.result()
-                    except Exception as e:
-                        logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
-                        continue
+        elif ContentType.FILE == message.content_type:
+            logger.bind(tag=TAG).info(
+                f"添加音频文件到待播放列表: {message.content_file}"
+            )
+            if message.content_file and os.path.exists(message.content_file):
+                # 先处理文件音频数据
+                file_audio = self._process_audio_file(message.content_file)
+                self.before_stop_play_files.append(
+                    (file_audio, message.content_detail)
+                )
 
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.bind(tag=TAG).error(
-                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+        if message.sentence_type == SentenceType.LAST:
+            self.text_filter.reset()
+            try:
+                logger.bind(tag=TAG).info("开始结束TTS会话...")
+                future = asyncio.run_coroutine_threadsafe(
+                    self.finish_session(self.conn.sentence_id),
+                    loop=self.conn.loop,
                 )
-                continue
+                future.result()
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"结束TTS会话失败: {str(e)}")
+                return
+
+    def _send_segment(self, text):
+        """发送一段文本到TTS服务，返回是否成功"""
+        try:
+            logger.bind(tag=TAG).debug(f"开始发送TTS文本: {text}")
+            future = asyncio.run_coroutine_threadsafe(
+                self.text_to_speak(text, None),
+                loop=self.conn.loop,
+            )
+            future.result()
+            logger.bind(tag=TAG).debug("TTS文本发送成功")
+            return True
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
+            return False
 
     async def text_to_speak(self, text, _):
         """发送文本到TTS服务"""
@@ -668,6 +673,10 @@ class TTSProvider(TTSProviderBase):
         Returns:
             list: 音频数据列表
         """
+        cache_key = self.tts_cache_key(text)
+        cached_datas = tts_cache.get(cache_key)
+        if cached_datas is not None:
+            return cached_datas
         try:
             # 创建事件循环
             loop = asyncio.new_event_loop()
@@ -757,6 +766,7 @@ class TTSProvider(TTSProviderBase):
             loop.run_until_complete(_generate_audio())
             loop.close()
 
+            tts_cache.put(cache_key, audio_data)
             return audio_data
 
         except Exception as e:
@@ -1,15 +1,19 @@
 import os
-import queue
 import asyncio
-import traceback
 import aiohttp
 import requests
 import time
 from config.logger import setup_logging
 from core.utils.tts import MarkdownCleaner
 from core.providers.tts.base import TTSProviderBase
-from core.utils import opus_encoder_utils, textUtils
-from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
+from core.utils.tts_cache import tts_cache
+from core.utils import opus_encoder_utils
+from core.providers.tts.dto.dto import (
+    SentenceType,
+    ContentType,
+    InterfaceType,
+    TTSMessageDTO,
+)
 
 TAG = __name__
 logger = setup_logging()
@@ -38,60 +42,40 @@ class TTSProvider(TTSProviderBase):
         self.text_buffer = ""
         self.pcm_buffer = bytearray()
 
-    def tts_text_priority_thread(self):
-        """流式文本处理线程"""
-        while not self.conn.stop_event.is_set():
-            try:
-                message = self.tts_text_queue.get(timeout=1)
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化参数
-                    self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.segment_count = 0
-                    self.before_stop_play_files.clear()
-                elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-                    if segment_text:
-                        self.to_tts_single_stream(segment_text)
-
-                elif ContentType.FILE == message.content_type:
-                    logger.bind(tag=TAG).info(
-                        f"添加音频文件到待播放列表: {message.content_file}"
-                    )
-                    if message.content_file and os.path.exists(message.content_file):
-                        # 先处理文件音频数据
-                        file_audio = self._process_audio_file(message.content_file)
-                        self.before_stop_play_files.append(
-                            (file_audio, message.content_detail)
-                        )
-
-                if message.sentence_type == SentenceType.LAST:
-                    # 处理剩余的文本
-                    self._process_remaining_text(True)
-
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.bind(tag=TAG).error(
-                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+    def handle_tts_text(self, message: TTSMessageDTO):
+        """处理一条流式TTS文本消息"""
+        if message.sentence_type == SentenceType.FIRST:
+            # 初始化参数
+            self.segmenter.reset()
+            self.segment_count = 0
+            self.before_stop_play_files.clear()
+        elif ContentType.TEXT == message.content_type:
+            for segment_text in self.segmenter.feed(message.content_detail):
+                self.to_tts_single_stream(segment_text)
+
+        elif ContentType.FILE == message.content_type:
+            logger.bind(tag=TAG).info(
+                f"添加音频文件到待播放列表: {message.content_file}"
+            )
+            if message.content_file and os.path.exists(message.content_file):
+                # 先处理文件音频数据
+                file_audio = self._process_audio_file(message.content_file)
+                self.before_stop_play_files.append(
+                    (file_audio, message.content_detail)
                 )
 
+        if message.sentence_type == SentenceType.LAST:
+            # 处理剩余的文本
+            self._process_remaining_text(True)
+
     def _process_remaining_text(self, is_last=False):
         """处理剩余的文本并生成语音
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
-        if remaining_text:
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
-            if segment_text:
-                self.to_tts_single_stream(segment_text, is_last)
-                self.processed_chars += len(full_text)
-            else:
-                self._process_before_stop_play_files()
+        segment_text = self.segmenter.flush()
+        if segment_text:
+            self.to_tts_single_stream(segment_text, is_last)
         else:
             self._process_before_stop_play_files()
 
@@ -216,6 +200,10 @@ class TTSProvider(TTSProviderBase):
         Returns:
             list: 返回opus编码后的音频数据列表
         """
+        cache_key = self.tts_cache_key(text)
+        cached_datas = tts_cache.get(cache_key)
+        if cached_datas is not None:
+            return cached_datas
         start_time = time.time()
         text = MarkdownCleaner.clean_markdown(text)
 
@@ -257,6 +245,7 @@ class TTSProvider(TTSProviderBase):
                     if opus:
                         opus_datas.extend(opus)
 
+                tts_cache.put(cache_key, opus_datas)
                 return opus_datas
 
         except Exception as e:
@@ -1,5 +1,85 @@
 from abc import ABC, abstractmethod
+from collections import deque
 from typing import Optional
+import numpy as np
+import opuslib_next
+
+
+class VADStream:
+    """单个连接的VAD状态
+
+    每个连接持有独立的opus解码器、预分配的int16环形缓冲区、模型循环状态
+    以及双阈值/滑动窗口状态。窗口直接以缓冲区视图的方式读取，稳定运行时
+    每个音频包不再分配新的缓冲区。
+    """
+
+    def __init__(
+        self, window_size=512, capacity=4096, sample_rate=16000, voice_window_size=5
+    ):
+        self.decoder = opuslib_next.Decoder(sample_rate, 1)
+        self.window_size = window_size
+        self._buffer = np.zeros(max(capacity, window_size * 2), dtype=np.int16)
+        self._read_pos = 0
+        self._write_pos = 0
+        # 转换后的float32窗口，复用同一块内存
+        self._window = np.zeros(window_size, dtype=np.float32)
+        self._scale = np.float32(1.0 / 32768.0)
+
+        # 模型的循环状态，由具体的VAD实现创建和维护
+        self.model_state = None
+
+        # 双阈值/滑动窗口状态
+        self.last_is_voice = False
+        self.voice_window = deque(maxlen=voice_window_size)
+
+    @property
+    def available(self) -> int:
+        """缓冲区中尚未处理的采样点数"""
+        return self._write_pos - self._read_pos
+
+    def feed_opus(self, opus_packet, frame_size=960):
+        """解码一个opus包并写入缓冲区"""
+        pcm_frame = self.decoder.decode(opus_packet, frame_size)
+        self.write(np.frombuffer(pcm_frame, dtype=np.int16))
+
+    def write(self, samples: np.ndarray):
+        """写入int16采样点，空间不足时把未处理的数据移到缓冲区开头"""
+        capacity = len(self._buffer)
+        count = len(samples)
+        if count >= capacity:
+            # 单次写入超过容量时只保留最新的数据
+            samples = samples[-capacity:]
+            count = capacity
+            self._read_pos = self._write_pos = 0
+        elif self._write_pos + count > capacity:
+            remaining = self.available
+            if remaining + count > capacity:
+                # 丢弃最旧的数据
+                self._read_pos = self._write_pos - (capacity - count)
+                remaining = capacity - count
+            self._buffer[:remaining] = self._buffer[self._read_pos : self._write_pos]
+            self._read_pos = 0
+            self._write_pos = remaining
+        self._buffer[self._write_pos : self._write_pos + count] = samples
+        self._write_pos += count
+
+    def next_window(self) -> Optional[np.ndarray]:
+        """读取下一个完整窗口并转换为[-1, 1]的float32，不足一个窗口时返回None
+
+        返回的数组在下一次调用前有效。
+        """
+        if self.available < self.window_size:
+            return None
+        view = self._buffer[self._read_pos : self._read_pos + self.window_size]
+        self._read_pos += self.window_size
+        if self._read_pos == self._write_pos:
+            self._read_pos = self._write_pos = 0
+        np.multiply(view, self._scale, out=self._window, dtype=np.float32)
+        return self._window
+
+    def reset(self):
+        """清空缓冲区中尚未处理的音频"""
+        self._read_pos = self._write_pos = 0
 
 
 class VADProviderBase(ABC):
@@ -7,3 +87,13 @@ class VADProviderBase(ABC):
     def is_vad(self, conn, data) -> bool:
         """检测音频数据中的语音活动"""
         pass
+
+    async def is_vad_async(self, conn, data) -> bool:
+        """异步检测语音活动，支持批量推理的实现可以重写此方法"""
+        return self.is_vad(conn, data)
+
+    def get_stream(self, conn) -> VADStream:
+        """获取连接的VAD状态，不存在时创建"""
+        if conn.vad_stream is None:
+            conn.vad_stream = VADStream()
+        return conn.vad_stream
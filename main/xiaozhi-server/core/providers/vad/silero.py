@@ -1,13 +1,91 @@
 import time
+import asyncio
 import numpy as np
 import torch
 import opuslib_next
+from concurrent.futures import ThreadPoolExecutor
 from config.logger import setup_logging
 from core.providers.vad.base import VADProviderBase
 
 TAG = __name__
 logger = setup_logging()
 
+# silero模型每次推理的采样点数（16kHz下32ms）
+WINDOW_SIZE = 512
+# 模型在每个窗口前拼接的上下文采样点数
+CONTEXT_SIZE = 64
+
+
+class SileroStreamState:
+    """单个连接的silero循环状态，批量推理时按连接拼接/拆分"""
+
+    def __init__(self):
+        self.state = torch.zeros((2, 1, 128), dtype=torch.float32)
+        self.context = torch.zeros((1, CONTEXT_SIZE), dtype=torch.float32)
+
+
+class SileroBatchScheduler:
+    """跨连接的VAD批量推理调度器
+
+    在batch_window_ms时间窗口内收集所有连接待推理的512采样点窗口，
+    合并成一个batch做一次前向推理，再把每个连接的概率和循环状态拆分回去。
+    推理在独立的单线程执行器中进行，不阻塞事件循环。
+    """
+
+    def __init__(self, provider, batch_window_ms=5, max_batch_size=64):
+        self.provider = provider
+        self.batch_window = max(batch_window_ms, 0) / 1000.0
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self._pending = []
+        self._flush_handle = None
+        # 模型不是线程安全的，所有批量推理串行在同一个线程中执行
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="silero-vad-batch"
+        )
+        self.stats = {"batches": 0, "windows": 0, "max_batch": 0}
+
+    async def infer(self, stream_state, audio_float32):
+        """提交一个窗口，等待其所在batch推理完成后返回语音概率"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((stream_state, audio_float32, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush, loop)
+        return await future
+
+    def _flush(self, loop):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch = self._pending
+        self._pending = []
+        loop.create_task(self._run_batch(loop, batch))
+
+    async def _run_batch(self, loop, batch):
+        states = [item[0] for item in batch]
+        chunks = [item[1] for item in batch]
+        try:
+            probs = await loop.run_in_executor(
+                self._executor, self.provider.infer_batch, states, chunks
+            )
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats["batches"] += 1
+        self.stats["windows"] += len(batch)
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+        for (_, _, future), prob in zip(batch, probs):
+            if not future.done():
+                future.set_result(prob)
+
 
 class VADProvider(VADProviderBase):
     def __init__(self, config):
@@ -19,8 +97,6 @@ class VADProvider(VADProviderBase):
             force_reload=False,
         )
 
-        self.decoder = opuslib_next.Decoder(16000, 1)
-
         # 处理空字符串的情况
         threshold = config.get("threshold", "0.5")
         threshold_low = config.get("threshold_low", "0.2")
@@ -36,52 +112,156 @@ class VADProvider(VADProviderBase):
         # 至少要多少帧才算有语音
         self.frame_window_threshold = 1
 
+        # 模型的循环状态需要能按连接切换，才能把多个连接合并成一个batch
+        self.supports_batch = all(
+            hasattr(self.model, attr)
+            for attr in ("_state", "_context", "_last_sr", "_last_batch_size")
+        )
+        if self.supports_batch:
+            try:
+                self.infer_batch(
+                    [SileroStreamState()], [np.zeros(WINDOW_SIZE, dtype=np.float32)]
+                )
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"silero模型状态切换失败: {e}")
+                self.supports_batch = False
+
+        # 跨连接批量推理
+        self.scheduler = None
+        batch_enabled = str(config.get("batch_enabled", False)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        if batch_enabled and not self.supports_batch:
+            logger.bind(tag=TAG).warning("当前silero模型不支持状态切换，已关闭批量推理")
+        elif batch_enabled:
+            batch_window_ms = config.get("batch_window_ms", 5)
+            max_batch_size = config.get("max_batch_size", 64)
+            self.scheduler = SileroBatchScheduler(
+                self,
+                batch_window_ms=float(batch_window_ms) if batch_window_ms else 5,
+                max_batch_size=int(max_batch_size) if max_batch_size else 64,
+            )
+            logger.bind(tag=TAG).info(
+                f"SileroVAD批量推理已开启，窗口{self.scheduler.batch_window * 1000:.0f}ms，"
+                f"最大batch {self.scheduler.max_batch_size}"
+            )
+
+    def infer_batch(self, states, chunks):
+        """对多个连接的窗口做一次批量推理
+
+        Args:
+            states: 每个窗口所属连接的SileroStreamState
+            chunks: 每个窗口512个float32采样点
+
+        Returns:
+            list[float]: 每个窗口的语音概率
+        """
+        if len(chunks) == 1:
+            audio_tensor = torch.from_numpy(chunks[0]).unsqueeze(0)
+        else:
+            audio_tensor = torch.from_numpy(np.stack(chunks))
+
+        with torch.no_grad():
+            if not self.supports_batch:
+                return self.model(audio_tensor, 16000).flatten().tolist()
+
+            batch_size = len(states)
+            # 把各连接的循环状态拼成batch写回模型，避免模型因batch大小变化重置状态
+            if batch_size == 1:
+                self.model._state = states[0].state
+                self.model._context = states[0].context
+            else:
+                self.model._state = torch.cat([s.state for s in states], dim=1)
+                self.model._context = torch.cat([s.context for s in states], dim=0)
+            self.model._last_sr = 16000
+            self.model._last_batch_size = batch_size
+
+            speech_probs = self.model(audio_tensor, 16000).flatten().tolist()
+
+            # 原地写回各连接的状态，不再为每个连接分配新张量
+            new_state = self.model._state
+            new_context = self.model._context
+            for i, s in enumerate(states):
+                s.state.copy_(new_state[:, i : i + 1])
+                s.context.copy_(new_context[i : i + 1])
+
+        return speech_probs
+
+    def get_stream(self, conn):
+        stream = super().get_stream(conn)
+        if stream.model_state is None:
+            stream.model_state = SileroStreamState()
+        return stream
+
+    def _update_voice_state(self, conn, stream, speech_prob):
+        """根据语音概率更新连接的双阈值/滑动窗口状态，返回当前窗口是否有语音"""
+        # 双阈值判断
+        if speech_prob >= self.vad_threshold:
+            is_voice = True
+        elif speech_prob <= self.vad_threshold_low:
+            is_voice = False
+        else:
+            is_voice = stream.last_is_voice
+
+        # 声音没低于最低值则延续前一个状态，判断为有声音
+        stream.last_is_voice = is_voice
+
+        # 更新滑动窗口
+        stream.voice_window.append(is_voice)
+        client_have_voice = (
+            stream.voice_window.count(True) >= self.frame_window_threshold
+        )
+
+        # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
+        if conn.client_have_voice and not client_have_voice:
+            stop_duration = time.time() * 1000 - conn.last_activity_time
+            if stop_duration >= self.silence_threshold_ms:
+                conn.client_voice_stop = True
+        if client_have_voice:
+            conn.client_have_voice = True
+            conn.last_activity_time = time.time() * 1000
+        return client_have_voice
+
     def is_vad(self, conn, opus_packet):
         try:
-            pcm_frame = self.decoder.decode(opus_packet, 960)
-            conn.client_audio_buffer.extend(pcm_frame)  # 将新数据加入缓冲区
+            stream = self.get_stream(conn)
+            stream.feed_opus(opus_packet)  # 将新数据加入缓冲区
 
             # 处理缓冲区中的完整帧（每次处理512采样点）
             client_have_voice = False
-            while len(conn.client_audio_buffer) >= 512 * 2:
-                # 提取前512个采样点（1024字节）
-                chunk = conn.client_audio_buffer[: 512 * 2]
-                conn.client_audio_buffer = conn.client_audio_buffer[512 * 2 :]
+            while True:
+                audio_float32 = stream.next_window()
+                if audio_float32 is None:
+                    break
+                # 检测语音活动
+                speech_prob = self.infer_batch([stream.model_state], [audio_float32])[0]
+                client_have_voice = self._update_voice_state(conn, stream, speech_prob)
 
-                # 转换为模型需要的张量格式
-                audio_int16 = np.frombuffer(chunk, dtype=np.int16)
-                audio_float32 = audio_int16.astype(np.float32) / 32768.0
-                audio_tensor = torch.from_numpy(audio_float32)
+            return client_have_voice
+        except opuslib_next.OpusError as e:
+            logger.bind(tag=TAG).info(f"解码错误: {e}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
 
-                # 检测语音活动
-                with torch.no_grad():
-                    speech_prob = self.model(audio_tensor, 16000).item()
-
-                # 双阈值判断
-                if speech_prob >= self.vad_threshold:
-                    is_voice = True
-                elif speech_prob <= self.vad_threshold_low:
-                    is_voice = False
-                else:
-                    is_voice = conn.last_is_voice
-
-                # 声音没低于最低值则延续前一个状态，判断为有声音
-                conn.last_is_voice = is_voice
-
-                # 更新滑动窗口
-                conn.client_voice_window.append(is_voice)
-                client_have_voice = (
-                    conn.client_voice_window.count(True) >= self.frame_window_threshold
-                )
+    async def is_vad_async(self, conn, opus_packet):
+        if self.scheduler is None:
+            return self.is_vad(conn, opus_packet)
+        try:
+            stream = self.get_stream(conn)
+            stream.feed_opus(opus_packet)  # 将新数据加入缓冲区
 
-                # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
-                if conn.client_have_voice and not client_have_voice:
-                    stop_duration = time.time() * 1000 - conn.last_activity_time
-                    if stop_duration >= self.silence_threshold_ms:
-                        conn.client_voice_stop = True
-                if client_have_voice:
-                    conn.client_have_voice = True
-                    conn.last_activity_time = time.time() * 1000
+            client_have_voice = False
+            while True:
+                audio_float32 = stream.next_window()
+                if audio_float32 is None:
+                    break
+                # 同一连接的窗口依赖上一个窗口的循环状态，必须等结果返回后再提交下一个
+                speech_prob = await self.scheduler.infer(
+                    stream.model_state, audio_float32
+                )
+                client_have_voice = self._update_voice_state(conn, stream, speech_prob)
 
             return client_have_voice
         except opuslib_next.OpusError as e:
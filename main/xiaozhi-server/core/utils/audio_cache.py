@@ -0,0 +1,161 @@
+"""
+静态音频文件的转码缓存
+
+提示音、绑定码数字、唤醒词回复等固定音频每次播放都要经过ffmpeg解码和opus编码。
+这里按 路径+修改时间+格式 缓存转码后的帧列表：内存中按字节数做LRU淘汰，
+同时以p3格式持久化到磁盘，服务重启后不需要重新转码。
+"""
+
+import os
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from core.utils import p3
+from core.utils.util import audio_to_data
+
+# p3格式每帧时长（秒）
+FRAME_DURATION = 0.06
+
+
+class AudioAssetCache:
+    """静态音频文件的转码缓存"""
+
+    def __init__(self, max_memory_mb=64, cache_dir="data/.audio_cache"):
+        self._logger = None
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()  # key -> (datas, duration, size)
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def logger(self):
+        """延迟初始化 logger 以避免循环导入"""
+        if self._logger is None:
+            from config.logger import setup_logging
+
+            self._logger = setup_logging()
+        return self._logger
+
+    def configure(self, config: dict):
+        """根据配置文件设置内存上限和持久化目录"""
+        cache_config = (config or {}).get("audio_asset_cache") or {}
+        max_memory_mb = cache_config.get("max_memory_mb")
+        cache_dir = cache_config.get("cache_dir")
+        with self._lock:
+            if max_memory_mb:
+                self.max_memory_bytes = int(float(max_memory_mb) * 1024 * 1024)
+                self._evict()
+            if cache_dir:
+                self.cache_dir = cache_dir
+
+    @staticmethod
+    def _file_key(file_path: str, is_opus: bool):
+        abs_path = os.path.abspath(file_path)
+        stat = os.stat(abs_path)
+        fmt = "opus" if is_opus else "pcm"
+        return abs_path, stat.st_mtime_ns, stat.st_size, fmt
+
+    def _sidecar_prefix(self, abs_path: str, fmt: str) -> str:
+        path_hash = hashlib.md5(abs_path.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{path_hash}_{fmt}_")
+
+    def _sidecar_path(self, key) -> str:
+        abs_path, mtime_ns, size, fmt = key
+        return f"{self._sidecar_prefix(abs_path, fmt)}{mtime_ns}_{size}.p3"
+
+    def get(self, file_path: str, is_opus=True):
+        """获取音频文件转码后的帧列表和时长，与audio_to_data的返回值一致
+
+        返回的帧列表被缓存共享，调用方不要修改。
+        """
+        key = self._file_key(file_path, is_opus)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0], entry[1]
+
+        datas = self._load_sidecar(key)
+        if datas is not None:
+            duration = len(datas) * FRAME_DURATION
+            self._stats["disk_hits"] += 1
+        else:
+            self._stats["misses"] += 1
+            if is_opus and key[0].endswith(".p3"):
+                datas, duration = p3.decode_opus_from_file(key[0])
+            else:
+                datas, duration = audio_to_data(key[0], is_opus=is_opus)
+                self._save_sidecar(key, datas)
+
+        self._put(key, datas, duration)
+        return datas, duration
+
+    def _put(self, key, datas, duration):
+        size = sum(len(frame) for frame in datas)
+        with self._lock:
+            if key in self._entries:
+                return
+            # 文件更新后旧版本的缓存不再需要
+            for old_key in [k for k in self._entries if k[0] == key[0] and k[3] == key[3]]:
+                self._memory_bytes -= self._entries.pop(old_key)[2]
+            if size > self.max_memory_bytes:
+                return
+            self._entries[key] = (datas, duration, size)
+            self._memory_bytes += size
+            self._evict()
+
+    def _evict(self):
+        while self._memory_bytes > self.max_memory_bytes and self._entries:
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._memory_bytes -= size
+            self._stats["evictions"] += 1
+
+    def _load_sidecar(self, key):
+        sidecar_path = self._sidecar_path(key)
+        if not os.path.exists(sidecar_path):
+            return None
+        try:
+            datas, _ = p3.decode_opus_from_file(sidecar_path)
+            return datas
+        except Exception as e:
+            self.logger.warning(f"读取音频缓存文件失败: {sidecar_path}, {e}")
+            return None
+
+    def _save_sidecar(self, key, datas):
+        """以p3格式写入磁盘，写入临时文件后再替换，避免其他进程读到不完整的文件"""
+        sidecar_path = self._sidecar_path(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            prefix = os.path.basename(self._sidecar_prefix(key[0], key[3]))
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(prefix) and name.endswith(".p3"):
+                    os.remove(os.path.join(self.cache_dir, name))
+            tmp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                for frame in datas:
+                    f.write(struct.pack(">BBH", 0, 0, len(frame)))
+                    f.write(frame)
+            os.replace(tmp_path, sidecar_path)
+        except Exception as e:
+            self.logger.warning(f"写入音频缓存文件失败: {sidecar_path}, {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                memory_bytes=self._memory_bytes,
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+
+
+# 创建全局音频缓存实例
+audio_asset_cache = AudioAssetCache()
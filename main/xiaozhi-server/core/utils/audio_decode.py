@@ -0,0 +1,172 @@
+"""
+不依赖ffmpeg的音频解码
+
+WAV和裸PCM在进程内直接解析，采样率不同时用numpy多相滤波重采样，多声道用numpy混合为单声道。
+只有mp3/ogg等压缩格式才需要交给ffmpeg处理。
+"""
+
+import struct
+from math import gcd
+from typing import Optional
+import numpy as np
+
+TARGET_SAMPLE_RATE = 16000
+# 每次计算的输出采样点数，限制重采样时的内存占用
+RESAMPLE_CHUNK = 16384
+# 低通滤波器每侧的过零点数，与scipy.signal.resample_poly一致
+RESAMPLE_HALF_ZEROS = 10
+# WAV格式标识
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+_filter_cache = {}
+
+
+def is_wav(audio_bytes: bytes) -> bool:
+    return len(audio_bytes) >= 12 and audio_bytes[:4] == b"RIFF" and audio_bytes[8:12] == b"WAVE"
+
+
+def _polyphase_filter(up: int, down: int):
+    """设计抗混叠低通滤波器并按相位拆分，结果按(up, down)缓存"""
+    key = (up, down)
+    if key not in _filter_cache:
+        max_rate = max(up, down)
+        half_len = RESAMPLE_HALF_ZEROS * max_rate
+        n = np.arange(-half_len, half_len + 1, dtype=np.float64)
+        cutoff = 1.0 / max_rate
+        h = cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), 5.0)
+        h *= up / h.sum()
+        # 补齐到up的整数倍后拆成up个相位，phases[p, i] = h[p + up * i]
+        taps = -(-len(h) // up)
+        padded = np.zeros(taps * up, dtype=np.float64)
+        padded[: len(h)] = h
+        phases = padded.reshape(taps, up).T.astype(np.float32)
+        _filter_cache[key] = (phases, half_len)
+    return _filter_cache[key]
+
+
+def resample_poly(samples: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """多相滤波重采样，输入输出均为float32单声道"""
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    g = gcd(src_rate, dst_rate)
+    up, down = dst_rate // g, src_rate // g
+    phases, half_len = _polyphase_filter(up, down)
+    taps = phases.shape[1]
+
+    # 两侧补零，保证所有下标都落在数组内
+    padded = np.concatenate(
+        (
+            np.zeros(taps, dtype=np.float32),
+            samples.astype(np.float32, copy=False),
+            np.zeros(taps + 1, dtype=np.float32),
+        )
+    )
+    out_len = -(-len(samples) * up // down)
+    out = np.empty(out_len, dtype=np.float32)
+    tap_offsets = np.arange(taps)
+    for start in range(0, out_len, RESAMPLE_CHUNK):
+        k = np.arange(start, min(start + RESAMPLE_CHUNK, out_len), dtype=np.int64)
+        pos = k * down + half_len
+        phase = pos % up
+        base = pos // up + taps
+        window = padded[base[:, None] - tap_offsets[None, :]]
+        out[start : start + len(k)] = np.einsum("ij,ij->i", phases[phase], window)
+    return out
+
+
+def _pcm_to_float(raw: bytes, sample_width: int, fmt: int) -> Optional[np.ndarray]:
+    """把各种位宽的PCM数据转为[-1, 1]的float32"""
+    if fmt == WAVE_FORMAT_IEEE_FLOAT:
+        if sample_width == 4:
+            return np.frombuffer(raw, dtype="<f4").astype(np.float32)
+        if sample_width == 8:
+            return np.frombuffer(raw, dtype="<f8").astype(np.float32)
+        return None
+    if sample_width == 1:
+        return (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    if sample_width == 2:
+        return np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    if sample_width == 3:
+        b = np.frombuffer(raw[: len(raw) // 3 * 3], dtype=np.uint8).reshape(-1, 3)
+        ints = (
+            b[:, 0].astype(np.int32)
+            | (b[:, 1].astype(np.int32) << 8)
+            | (b[:, 2].astype(np.int32) << 16)
+        )
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        return ints.astype(np.float32) / 8388608
+    if sample_width == 4:
+        return np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    return None
+
+
+def _parse_wav(audio_bytes: bytes):
+    """解析WAV头部，返回(数据, 采样率, 声道数, 位宽, 格式)，不支持的格式返回None"""
+    if not is_wav(audio_bytes):
+        return None
+    fmt_info = None
+    data = None
+    offset = 12
+    while offset + 8 <= len(audio_bytes):
+        chunk_id = audio_bytes[offset : offset + 4]
+        (chunk_size,) = struct.unpack("<I", audio_bytes[offset + 4 : offset + 8])
+        body = audio_bytes[offset + 8 : offset + 8 + chunk_size]
+        if chunk_id == b"fmt " and len(body) >= 16:
+            fmt, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+            if fmt == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                # 子格式GUID的前两个字节就是实际的格式
+                (fmt,) = struct.unpack("<H", body[24:26])
+            fmt_info = (fmt, channels, sample_rate, bits)
+        elif chunk_id == b"data":
+            data = body
+            break
+        # chunk按2字节对齐
+        offset += 8 + chunk_size + (chunk_size & 1)
+
+    if fmt_info is None or data is None:
+        return None
+    fmt, channels, sample_rate, bits = fmt_info
+    if fmt not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT) or not channels:
+        return None
+    return data, sample_rate, channels, (bits + 7) // 8, fmt
+
+
+def to_pcm16k(
+    samples: np.ndarray, sample_rate: int, channels: int = 1
+) -> bytes:
+    """float32采样点混合为单声道、重采样到16kHz并转为16位小端PCM"""
+    if channels > 1:
+        samples = samples[: len(samples) // channels * channels]
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    samples = resample_poly(samples, sample_rate, TARGET_SAMPLE_RATE)
+    return (np.clip(samples, -1.0, 32767 / 32768) * 32768).astype("<i2").tobytes()
+
+
+def decode_native(audio_bytes: bytes, file_type: str = None) -> Optional[bytes]:
+    """在进程内把WAV或裸PCM解码为16kHz单声道16位PCM
+
+    裸PCM（file_type为pcm）按16kHz单声道16位处理。不支持的格式返回None，
+    由调用方交给ffmpeg处理。
+    """
+    if is_wav(audio_bytes):
+        parsed = _parse_wav(audio_bytes)
+        if parsed is None:
+            return None
+        data, sample_rate, channels, sample_width, fmt = parsed
+        # 已经是目标格式时直接返回原始数据
+        if (
+            fmt == WAVE_FORMAT_PCM
+            and sample_rate == TARGET_SAMPLE_RATE
+            and channels == 1
+            and sample_width == 2
+        ):
+            return data[: len(data) // 2 * 2]
+        samples = _pcm_to_float(data, sample_width, fmt)
+        if samples is None:
+            return None
+        return to_pcm16k(samples, sample_rate, channels)
+    if file_type == "pcm":
+        return audio_bytes[: len(audio_bytes) // 2 * 2]
+    return None
@@ -0,0 +1,140 @@
+"""
+压缩音频的流式转码
+
+非流式TTS接口返回的mp3/ogg等压缩音频边下载边送入一个常驻的ffmpeg管道，
+解码出的PCM按60ms切帧、编码为opus后立即回调，不需要等整句音频下载完成。
+"""
+
+import time
+import threading
+import subprocess
+import opuslib_next
+
+# 需要经过ffmpeg流式解码的压缩格式
+STREAM_TRANSCODE_TYPES = ("mp3", "ogg", "opus", "aac", "flac")
+SAMPLE_RATE = 16000
+FRAME_SIZE = 960  # 60ms
+FRAME_BYTES = FRAME_SIZE * 2
+# 首帧之后每次回调累积的帧数，避免每一帧都触发一次发送
+BATCH_FRAMES = 5
+READ_SIZE = 4096
+
+
+class StreamingTranscoder:
+    """把逐块到达的压缩音频转码为16kHz单声道的opus/pcm帧
+
+    feed在生产音频的线程中调用，解码结果由内部读取线程通过on_frames回调输出。
+    第一帧解码出来后立即回调，之后每BATCH_FRAMES帧回调一次，finish时输出剩余帧。
+    """
+
+    def __init__(self, file_type: str, on_frames, is_opus=True):
+        self.on_frames = on_frames
+        self.is_opus = is_opus
+        self.encoder = (
+            opuslib_next.Encoder(SAMPLE_RATE, 1, opuslib_next.APPLICATION_AUDIO)
+            if is_opus
+            else None
+        )
+        self.start_time = time.perf_counter()
+        # 从开始合成到输出第一帧的耗时（秒），尚未输出时为None
+        self.first_frame_latency = None
+        self.frame_count = 0
+        self._pending = []
+        self._pcm_buffer = bytearray()
+        self._aborted = False
+        # -nostdin 只关闭交互命令，音频仍从pipe:0输入，解码结果以裸PCM持续输出到pipe:1
+        self.process = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-nostdin",
+                "-loglevel",
+                "error",
+                "-f",
+                file_type,
+                "-i",
+                "pipe:0",
+                "-f",
+                "s16le",
+                "-ac",
+                "1",
+                "-ar",
+                str(SAMPLE_RATE),
+                "pipe:1",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    @property
+    def duration(self) -> float:
+        return self.frame_count * FRAME_SIZE / SAMPLE_RATE
+
+    def feed(self, chunk: bytes):
+        """写入一块压缩音频数据"""
+        if chunk and not self._aborted:
+            self.process.stdin.write(chunk)
+            self.process.stdin.flush()
+
+    def finish(self):
+        """输入结束，等待解码完成并输出剩余的帧"""
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        self._reader.join()
+        self.process.wait()
+        if self._aborted:
+            return
+        if self._pcm_buffer:
+            # 最后一帧不足时补零，与pcm_to_data一致
+            tail = bytes(self._pcm_buffer).ljust(FRAME_BYTES, b"\x00")
+            self._pcm_buffer.clear()
+            self._add_frame(tail)
+        self._flush()
+
+    def abort(self):
+        """放弃本次转码，不再回调"""
+        self._aborted = True
+        if self.process.poll() is None:
+            self.process.kill()
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        self._reader.join()
+        self.process.wait()
+
+    def _read_loop(self):
+        stdout = self.process.stdout
+        while True:
+            data = stdout.read1(READ_SIZE)
+            if not data or self._aborted:
+                break
+            self._pcm_buffer.extend(data)
+            while len(self._pcm_buffer) >= FRAME_BYTES:
+                frame = bytes(self._pcm_buffer[:FRAME_BYTES])
+                del self._pcm_buffer[:FRAME_BYTES]
+                self._add_frame(frame)
+            if self.first_frame_latency is None and self._pending:
+                self._flush()
+            elif len(self._pending) >= BATCH_FRAMES:
+                self._flush()
+        stdout.close()
+
+    def _add_frame(self, pcm_frame: bytes):
+        if self.is_opus:
+            self._pending.append(self.encoder.encode(pcm_frame, FRAME_SIZE))
+        else:
+            self._pending.append(pcm_frame)
+        self.frame_count += 1
+
+    def _flush(self):
+        if not self._pending or self._aborted:
+            return
+        if self.first_frame_latency is None:
+            self.first_frame_latency = time.perf_counter() - self.start_time
+        frames, self._pending = self._pending, []
+        self.on_frames(frames)
@@ -15,6 +15,8 @@ class CacheType(Enum):
     WEATHER = "weather"
     LUNAR = "lunar"
     INTENT = "intent"
+    INTENT_PROMPT = "intent_prompt"
+    TOOL_RESULT = "tool_result"
     IP_INFO = "ip_info"
     CONFIG = "config"
     DEVICE_PROMPT = "device_prompt"
@@ -49,6 +51,12 @@ class CacheConfig:
             CacheType.INTENT: cls(
                 strategy=CacheStrategy.TTL_LRU, ttl=600, max_size=1000  # 10分钟
             ),
+            CacheType.INTENT_PROMPT: cls(
+                strategy=CacheStrategy.LRU, ttl=None, max_size=64  # 键随工具和歌名变化
+            ),
+            CacheType.TOOL_RESULT: cls(
+                strategy=CacheStrategy.TTL_LRU, ttl=60, max_size=1000  # 按工具配置TTL
+            ),
             CacheType.CONFIG: cls(
                 strategy=CacheStrategy.FIXED_SIZE, ttl=None, max_size=20  # 手动失效
             ),
@@ -0,0 +1,159 @@
+"""
+意图识别与对话的推测并行
+
+intent_llm模式下原先要等意图识别大模型返回continue_chat后才开始请求对话大模型，
+两次首token延迟串行相加。开启推测后，在请求意图识别大模型的同时启动对话：
+对话输出先缓存、不送入TTS，意图判定为继续聊天时一次性放行；判定为工具调用时取消对话流并回滚对话记录。
+本地匹配或缓存命中时意图在对话任务运行之前就已确定，推测的对话不会发出请求。
+"""
+
+import time
+import asyncio
+import threading
+
+from core.utils.dialogue import estimate_tokens
+
+
+class SpeculationMetrics:
+    """推测对话的浪费token比例与节省的延迟统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "speculations": 0,
+            "committed": 0,
+            "discarded": 0,
+            "tokens": 0,
+            "wasted_tokens": 0,
+            "saved_seconds": 0.0,
+        }
+
+    def record(self, committed: bool, tokens: int, saved_seconds: float):
+        with self._lock:
+            self._stats["speculations"] += 1
+            self._stats["committed" if committed else "discarded"] += 1
+            self._stats["tokens"] += tokens
+            if not committed:
+                self._stats["wasted_tokens"] += tokens
+            self._stats["saved_seconds"] += saved_seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        saved_seconds = stats.pop("saved_seconds")
+        stats["wasted_token_rate"] = (
+            stats["wasted_tokens"] / stats["tokens"] if stats["tokens"] else 0.0
+        )
+        stats["avg_saved_ms"] = (
+            saved_seconds * 1000 / stats["committed"] if stats["committed"] else 0.0
+        )
+        return stats
+
+
+class ChatSpeculation:
+    """一轮推测的对话，需要在事件循环线程中使用
+
+    对话中需要对外输出的操作通过defer提交，判定前缓存，commit后按顺序执行，discard后丢弃。
+    """
+
+    def __init__(self, conn, query):
+        self.conn = conn
+        self.query = query
+        self.decision = conn.loop.create_future()
+        self.task = None
+        # 对话开始时写入的用户消息，丢弃时从对话记录中移除
+        self.user_message = None
+        self._pending = []
+        self._started_at = time.monotonic()
+        self._decided_at = None
+        self._first_token_at = None
+        self._tokens = 0
+        self._recorded = False
+
+    def start(self):
+        self.task = self.conn.start_chat(self.query, speculation=self)
+        return self
+
+    @property
+    def done(self) -> bool:
+        return self.decision.done()
+
+    @property
+    def committed(self) -> bool:
+        return self.decision.done() and self.decision.result()
+
+    def defer(self, fn, *args):
+        """判定前缓存输出操作，放行后直接执行"""
+        if not self.decision.done():
+            self._pending.append((fn, args))
+        elif self.decision.result():
+            fn(*args)
+
+    def on_content(self, content: str):
+        """统计对话流输出的内容"""
+        if self._first_token_at is None:
+            self._first_token_at = time.monotonic()
+        self._tokens += estimate_tokens(content)
+
+    def commit(self):
+        """意图为继续聊天，放行缓存的输出"""
+        if self.decision.done():
+            return
+        self._decided_at = time.monotonic()
+        self.decision.set_result(True)
+        pending, self._pending = self._pending, []
+        for fn, args in pending:
+            fn(*args)
+
+    def discard(self):
+        """意图为工具调用或对话被打断，丢弃推测的对话"""
+        if self.decision.done():
+            return
+        self._decided_at = time.monotonic()
+        self.decision.set_result(False)
+        self._pending = []
+        # 推测的对话开始时已把llm_finish_task置为False，被取消后不会再走到对话结束，
+        # 不恢复的话工具调用的回复播放完后不会发送tts stop，设备一直处于讲话状态
+        self.conn.llm_finish_task = True
+        if self.user_message is not None:
+            try:
+                self.conn.dialogue.dialogue.remove(self.user_message)
+            except ValueError:
+                pass
+        # 在对话任务自身中丢弃时不能再取消自己
+        if self.task is not None and self.task is not asyncio.current_task():
+            if self.conn.chat_task is self.task:
+                self.conn.cancel_chat()
+            else:
+                self.task.cancel()
+        self._record()
+
+    def finish(self):
+        """对话流结束时调用，记录放行的推测对话"""
+        if self.committed:
+            self._record()
+
+    async def wait(self) -> bool:
+        """等待意图判定，返回是否放行"""
+        return await asyncio.shield(self.decision)
+
+    def _record(self):
+        if self._recorded:
+            return
+        self._recorded = True
+        committed = self.decision.result()
+        if self.user_message is None:
+            # 对话任务还没有运行，没有发出请求
+            return
+        saved = 0.0
+        if committed and self._first_token_at is not None:
+            # 串行时首token延迟为 意图耗时+对话首token耗时，并行后为两者的较大值
+            saved = min(
+                self._decided_at - self._started_at,
+                self._first_token_at - self._started_at,
+            )
+        speculation_metrics.record(committed, self._tokens, saved)
+
+
+# 创建全局推测对话统计实例
+speculation_metrics = SpeculationMetrics()
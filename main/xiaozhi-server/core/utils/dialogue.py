@@ -1,7 +1,41 @@
+import json
 import uuid
 import re
+import threading
 from typing import List, Dict
 from datetime import datetime
+from config.logger import setup_logging
+from core.utils.worker_pool import worker_pool
+
+TAG = __name__
+logger = setup_logging()
+
+_memory_block_pattern = re.compile(r"<memory>.*?</memory>", re.DOTALL)
+# 只匹配独占一行开头的标签，正文中提到的`<context>`不算
+_context_block_pattern = re.compile(
+    r"^<context>.*?</context>", re.DOTALL | re.MULTILINE
+)
+_memory_line_pattern = re.compile(r"^<memory>.*?</memory>", re.DOTALL | re.MULTILINE)
+_blank_lines_pattern = re.compile(r"\n{3,}")
+
+# 每条消息的角色、分隔符等固定开销
+MESSAGE_TOKEN_OVERHEAD = 4
+
+dialogue_summary_prompt = """你是对话摘要助手。请把"历史摘要"和"新增对话"合并成一段新的摘要，供后续对话参考。
+要求：
+1. 保留用户提到的事实、偏好、约定和未完成的事项，以及工具调用得到的关键结果
+2. 省略寒暄和重复内容，不要编造对话中没有的信息
+3. 使用第三人称简洁描述，不超过300字，直接输出摘要正文"""
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数：中日韩文字约1字1个token，其余约4个字符1个token"""
+    if not text:
+        return 0
+    length = len(text)
+    # 中日韩文字的UTF-8编码为3字节，用字节数估算其个数，避免逐字符遍历
+    wide = min((len(text.encode("utf-8")) - length) // 2, length)
+    return wide + (length - wide + 3) // 4
 
 
 class Message:
@@ -18,13 +52,42 @@ class Message:
         self.content = content
         self.tool_calls = tool_calls
         self.tool_call_id = tool_call_id
+        self._token_source = None
+        self._token_count = 0
+
+    @property
+    def tokens(self) -> int:
+        """估算的token数，内容不变时只计算一次"""
+        source = self.content
+        if self.tool_calls is not None:
+            source = json.dumps(self.tool_calls, ensure_ascii=False)
+        if source is not self._token_source:
+            self._token_source = source
+            self._token_count = estimate_tokens(source) + MESSAGE_TOKEN_OVERHEAD
+        return self._token_count
 
 
 class Dialogue:
-    def __init__(self):
+    def __init__(self, max_tokens: int = 0, stable_prefix: bool = False):
         self.dialogue: List[Message] = []
         # 获取当前时间
         self.current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # 发送给大模型的上下文估算token上限，0为不限制
+        self.max_tokens = max_tokens
+        # 被移出上下文的早期对话的摘要
+        self.summary = ""
+        # summarizer(summary, messages) -> str，为None时移出的对话直接丢弃
+        self.summarizer = None
+        self._evicted: List[Message] = []
+        self._summarizing = False
+        self._summary_lock = threading.Lock()
+        # 稳定前缀模式：系统提示词只保留不变的内容，时间、记忆、说话人等
+        # 放到最后一条用户消息前面，每轮请求的前缀保持一致，便于大模型服务复用前缀缓存
+        self.stable_prefix = stable_prefix
+        # 渲染后的系统提示词缓存：(输入, 结果)
+        self._system_prompt_cache = (None, None)
+        # 稳定前缀模式下拆分后的系统提示词缓存：(原始内容, (不变部分, 上下文模板))
+        self._stable_prompt_cache = (None, (None, None))
 
     def put(self, message: Message):
         self.dialogue.append(message)
@@ -33,12 +96,13 @@ class Dialogue:
         if m.tool_calls is not None:
             dialogue.append({"role": m.role, "tool_calls": m.tool_calls})
         elif m.role == "tool":
+            if m.tool_call_id is None:
+                # 只生成一次，之后每轮的上下文保持一致
+                m.tool_call_id = str(uuid.uuid4())
             dialogue.append(
                 {
                     "role": m.role,
-                    "tool_call_id": (
-                        str(uuid.uuid4()) if m.tool_call_id is None else m.tool_call_id
-                    ),
+                    "tool_call_id": m.tool_call_id,
                     "content": m.content,
                 }
             )
@@ -59,6 +123,15 @@ class Dialogue:
         else:
             self.put(Message(role="system", content=new_content))
 
+    def get_messages_for_memory(self) -> List[Message]:
+        """用于保存记忆的对话，早期对话已被压缩时以摘要代替"""
+        messages = [msg for msg in self.dialogue if msg.role != "system"]
+        if self.summary:
+            messages.insert(
+                0, Message(role="user", content=f"之前的对话摘要：{self.summary}")
+            )
+        return messages
+
     def get_llm_dialogue_with_memory(
         self, memory_str: str = None, voiceprint_config: dict = None
     ) -> List[Dict[str, str]]:
@@ -70,49 +143,202 @@ class Dialogue:
             (msg for msg in self.dialogue if msg.role == "system"), None
         )
 
-        if system_message:
-            # 基础系统提示
-            enhanced_system_prompt = system_message.content
-            # 替换时间占位符
-            enhanced_system_prompt = enhanced_system_prompt.replace(
-                "{{current_time}}", datetime.now().strftime("%H:%M")
-            )
-
-            # 添加说话人个性化描述
-            try:
-                speakers = voiceprint_config.get("speakers", [])
-                if speakers:
-                    enhanced_system_prompt += "\n\n<speakers_info>"
-                    for speaker_str in speakers:
-                        try:
-                            parts = speaker_str.split(",", 2)
-                            if len(parts) >= 2:
-                                name = parts[1].strip()
-                                # 如果描述为空，则为""
-                                description = (
-                                    parts[2].strip() if len(parts) >= 3 else ""
-                                )
-                                enhanced_system_prompt += f"\n- {name}：{description}"
-                        except:
-                            pass
-                    enhanced_system_prompt += "\n\n</speakers_info>"
-            except:
-                # 配置读取失败时忽略错误，不影响其他功能
-                pass
+        speakers = ()
+        if isinstance(voiceprint_config, dict):
+            speakers = tuple(voiceprint_config.get("speakers") or ())
 
-            # 使用正则表达式匹配 <memory> 标签，不管中间有什么内容
-            if memory_str is not None:
-                enhanced_system_prompt = re.sub(
-                    r"<memory>.*?</memory>",
-                    f"<memory>\n{memory_str}\n</memory>",
-                    enhanced_system_prompt,
-                    flags=re.DOTALL,
+        system_prompt = None
+        context = None
+        if system_message:
+            if self.stable_prefix:
+                system_prompt, context = self._render_stable_prompt(
+                    system_message.content, memory_str, speakers
+                )
+            else:
+                system_prompt = self._render_system_prompt(
+                    system_message.content, memory_str, speakers
                 )
-            dialogue.append({"role": "system", "content": enhanced_system_prompt})
+            dialogue.append({"role": "system", "content": system_prompt})
+
+        self._enforce_budget(estimate_tokens(system_prompt) + estimate_tokens(context))
 
         # 添加用户和助手的对话
         for m in self.dialogue:
             if m.role != "system":  # 跳过原始的系统消息
                 self.getMessages(m, dialogue)
 
+        if context:
+            self._attach_context(dialogue, context)
+
         return dialogue
+
+    @staticmethod
+    def _render_speakers(speakers) -> str:
+        """说话人个性化描述"""
+        speakers_info = "<speakers_info>"
+        for speaker_str in speakers:
+            try:
+                parts = speaker_str.split(",", 2)
+                if len(parts) >= 2:
+                    name = parts[1].strip()
+                    # 如果描述为空，则为""
+                    description = parts[2].strip() if len(parts) >= 3 else ""
+                    speakers_info += f"\n- {name}：{description}"
+            except:
+                pass
+        return speakers_info + "\n\n</speakers_info>"
+
+    def _render_system_prompt(self, content, memory_str, speakers):
+        """渲染系统提示词，输入没有变化时直接使用缓存"""
+        current_time = datetime.now().strftime("%H:%M")
+        inputs = (content, memory_str, speakers, current_time, self.summary)
+        cached_inputs, cached_prompt = self._system_prompt_cache
+        if cached_inputs == inputs:
+            return cached_prompt
+
+        # 替换时间占位符
+        enhanced_system_prompt = content.replace("{{current_time}}", current_time)
+
+        # 添加说话人个性化描述
+        if speakers:
+            enhanced_system_prompt += "\n\n" + self._render_speakers(speakers)
+
+        # 使用正则表达式匹配 <memory> 标签，不管中间有什么内容
+        if memory_str is not None:
+            enhanced_system_prompt = _memory_block_pattern.sub(
+                lambda _: f"<memory>\n{memory_str}\n</memory>",
+                enhanced_system_prompt,
+            )
+
+        if self.summary:
+            enhanced_system_prompt += (
+                f"\n\n<dialogue_summary>\n{self.summary}\n</dialogue_summary>"
+            )
+
+        self._system_prompt_cache = (inputs, enhanced_system_prompt)
+        return enhanced_system_prompt
+
+    def _split_system_prompt(self, content):
+        """把系统提示词拆成不变部分和<context>模板，<memory>块移出不变部分"""
+        cached_content, cached = self._stable_prompt_cache
+        if cached_content == content:
+            return cached
+        context_template = "\n".join(_context_block_pattern.findall(content))
+        stable = _context_block_pattern.sub("", content)
+        stable = _memory_line_pattern.sub("", stable)
+        if "{{current_time}}" in stable:
+            # 自定义提示词中<context>以外的时间占位符，时间统一放到上下文中
+            stable = stable.replace("{{current_time}}", "（见<context>中的当前时间）")
+            context_template = "\n".join(
+                part for part in ("当前时间：{{current_time}}", context_template) if part
+            )
+        stable = _blank_lines_pattern.sub("\n\n", stable).strip()
+        result = (stable, context_template)
+        self._stable_prompt_cache = (content, result)
+        return result
+
+    def _render_stable_prompt(self, content, memory_str, speakers):
+        """稳定前缀模式，返回(不变的系统提示词, 本轮的上下文)"""
+        stable, context_template = self._split_system_prompt(content)
+        parts = []
+        if context_template:
+            parts.append(
+                context_template.replace(
+                    "{{current_time}}", datetime.now().strftime("%H:%M")
+                )
+            )
+        if memory_str:
+            parts.append(f"<memory>\n{memory_str}\n</memory>")
+        if speakers:
+            parts.append(self._render_speakers(speakers))
+        if self.summary:
+            parts.append(f"<dialogue_summary>\n{self.summary}\n</dialogue_summary>")
+        return stable, "\n\n".join(parts)
+
+    @staticmethod
+    def _attach_context(dialogue, context):
+        """把本轮的上下文放到最后一条用户消息前面，之前的消息保持不变"""
+        for index in range(len(dialogue) - 1, -1, -1):
+            message = dialogue[index]
+            if message["role"] == "user" and isinstance(message.get("content"), str):
+                dialogue[index] = dict(
+                    message, content=f"{context}\n\n{message['content']}"
+                )
+                return
+
+    def _enforce_budget(self, system_tokens: int):
+        """上下文超出token上限时，从最早的对话轮次开始整轮移出
+
+        每轮从一条用户消息开始，工具调用和工具结果总在同一轮中，会被一起移出；
+        最后一轮（当前正在进行的对话）始终保留。
+        """
+        if not self.max_tokens:
+            return
+        history = [msg for msg in self.dialogue if msg.role != "system"]
+        total = system_tokens + sum(msg.tokens for msg in history)
+        if total <= self.max_tokens:
+            return
+
+        cut = 0
+        for index, msg in enumerate(history):
+            if index > 0 and msg.role == "user":
+                cut = index
+                if total <= self.max_tokens:
+                    break
+            total -= msg.tokens
+        if cut == 0:
+            return
+
+        evicted = history[:cut]
+        evicted_ids = {id(msg) for msg in evicted}
+        self.dialogue = [msg for msg in self.dialogue if id(msg) not in evicted_ids]
+        logger.bind(tag=TAG).debug(
+            f"上下文超出{self.max_tokens} tokens，移出最早的{len(evicted)}条消息"
+        )
+        if self.summarizer is not None:
+            self._schedule_summary(evicted)
+
+    def _schedule_summary(self, messages: List[Message]):
+        """把移出的对话合并进摘要，在共享线程池中执行，不阻塞当前对话"""
+        with self._summary_lock:
+            self._evicted.extend(messages)
+            if self._summarizing:
+                return
+            self._summarizing = True
+        worker_pool.submit("llm", self._summarize_evicted)
+
+    def _summarize_evicted(self):
+        while True:
+            with self._summary_lock:
+                messages, self._evicted = self._evicted, []
+                if not messages:
+                    self._summarizing = False
+                    return
+            try:
+                summary = self.summarizer(self.summary, messages)
+                if summary:
+                    self.summary = summary.strip()
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"生成对话摘要失败: {e}")
+
+
+def summarize_dialogue(llm, summary: str, messages: List[Message]) -> str:
+    """用大模型把移出上下文的对话合并进已有摘要，失败时返回None"""
+    lines = []
+    for msg in messages:
+        if msg.role == "user":
+            lines.append(f"User: {msg.content}")
+        elif msg.role == "assistant" and msg.content:
+            lines.append(f"Assistant: {msg.content}")
+        elif msg.role == "tool":
+            lines.append(f"Tool: {msg.content}")
+    if not lines:
+        return None
+    user_prompt = f"历史摘要：\n{summary or '无'}\n\n新增对话：\n" + "\n".join(lines)
+    result = llm.response_no_stream(
+        dialogue_summary_prompt, user_prompt, max_tokens=500, temperature=0.2
+    )
+    if not result or result.startswith("【"):
+        # response_no_stream出错时返回【LLM服务响应异常】
+        return None
+    return result
@@ -0,0 +1,188 @@
+"""
+进程内共享的异步HTTP连接池
+
+大模型等外部服务按服务地址（scheme+host+port）共用一个httpx.AsyncClient，
+同一地址的请求复用keep-alive连接和TLS会话，安装了h2时启用HTTP/2多路复用。
+httpx的连接绑定在创建它的事件循环上，所以每个事件循环各自持有一组客户端。
+插件等短请求通过request/get/post发送，按服务地址限制并发数并使用默认超时；
+只能在线程中同步调用的地方使用get_sync_client，同样按服务地址复用连接。
+"""
+
+import threading
+import weakref
+import asyncio
+import httpx
+from urllib.parse import urlsplit
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HttpClientPool:
+    """按服务地址共享的httpx.AsyncClient"""
+
+    def __init__(self):
+        self._logger = None
+        self.max_connections = 200
+        self.max_keepalive_connections = 50
+        self.keepalive_expiry = 60.0
+        self.http2 = True
+        # 每个服务地址同时进行的request请求数上限
+        self.per_host_concurrency = 20
+        # request请求的默认超时（秒）
+        self.request_timeout = 10.0
+        self._ssl_context = None
+        # 事件循环 -> {服务地址: AsyncClient}，事件循环结束后自动释放
+        self._clients = weakref.WeakKeyDictionary()
+        # 事件循环 -> {服务地址: Semaphore}
+        self._semaphores = weakref.WeakKeyDictionary()
+        # 服务地址 -> Client，线程安全，供线程中的同步调用使用
+        self._sync_clients = {}
+        self._lock = threading.Lock()
+
+    @property
+    def logger(self):
+        """延迟初始化 logger 以避免循环导入"""
+        if self._logger is None:
+            from config.logger import setup_logging
+
+            self._logger = setup_logging()
+        return self._logger
+
+    def configure(self, config: dict):
+        """根据配置文件设置连接数上限、空闲连接保持时间和是否启用HTTP/2
+
+        只影响之后新建的客户端。
+        """
+        client_config = (config or {}).get("http_client") or {}
+        if client_config.get("max_connections"):
+            self.max_connections = int(client_config["max_connections"])
+        if client_config.get("max_keepalive_connections") is not None:
+            self.max_keepalive_connections = int(
+                client_config["max_keepalive_connections"]
+            )
+        if client_config.get("keepalive_expiry") is not None:
+            self.keepalive_expiry = float(client_config["keepalive_expiry"])
+        if client_config.get("per_host_concurrency"):
+            self.per_host_concurrency = int(client_config["per_host_concurrency"])
+        if client_config.get("request_timeout"):
+            self.request_timeout = float(client_config["request_timeout"])
+        if "http2" in client_config:
+            self.http2 = str(client_config["http2"]).lower() in ("true", "1", "yes")
+        if self.http2 and not HTTP2_AVAILABLE:
+            self.logger.warning("未安装h2库，HTTP连接池使用HTTP/1.1")
+
+    @staticmethod
+    def _origin(base_url: str) -> str:
+        parts = urlsplit(base_url or "")
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+    def _get_ssl_context(self):
+        # 所有客户端共用一个SSL上下文，TLS会话可以跨客户端复用
+        if self._ssl_context is None:
+            self._ssl_context = httpx.create_ssl_context()
+        return self._ssl_context
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def get_async_client(self, base_url: str) -> httpx.AsyncClient:
+        """获取当前事件循环中该服务地址共享的AsyncClient，必须在事件循环中调用
+
+        请求超时由调用方按请求设置，客户端不会被调用方关闭。
+        """
+        loop = asyncio.get_running_loop()
+        origin = self._origin(base_url)
+        with self._lock:
+            clients = self._clients.setdefault(loop, {})
+            client = clients.get(origin)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    http2=self.http2 and HTTP2_AVAILABLE,
+                    verify=self._get_ssl_context(),
+                    limits=self._limits(),
+                    timeout=httpx.Timeout(300, connect=10),
+                )
+                clients[origin] = client
+            return client
+
+    def _get_semaphore(self, origin: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._semaphores.setdefault(loop, {})
+            semaphore = semaphores.get(origin)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.per_host_concurrency)
+                semaphores[origin] = semaphore
+            return semaphore
+
+    async def request(
+        self, method: str, url: str, timeout: float = None, **kwargs
+    ) -> httpx.Response:
+        """通过共享连接发送一个完整读取响应体的请求，必须在事件循环中调用
+
+        同一服务地址的并发请求数受per_host_concurrency限制，超时默认为request_timeout，
+        与requests一致默认跟随重定向。
+        """
+        kwargs.setdefault("follow_redirects", True)
+        origin = self._origin(url)
+        client = self.get_async_client(origin)
+        async with self._get_semaphore(origin):
+            return await client.request(
+                method,
+                url,
+                timeout=timeout if timeout is not None else self.request_timeout,
+                **kwargs,
+            )
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def get_sync_client(self, base_url: str) -> httpx.Client:
+        """获取该服务地址共享的同步Client，用于只能在线程中同步调用的场景"""
+        origin = self._origin(base_url)
+        with self._lock:
+            client = self._sync_clients.get(origin)
+            if client is None or client.is_closed:
+                client = httpx.Client(
+                    verify=self._get_ssl_context(),
+                    limits=self._limits(),
+                    timeout=self.request_timeout,
+                )
+                self._sync_clients[origin] = client
+            return client
+
+    async def aclose(self):
+        """关闭当前事件循环中的所有客户端"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._clients.pop(loop, {})
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                self.logger.warning(f"关闭HTTP客户端失败: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loops": len(self._clients),
+                "clients": sum(len(clients) for clients in self._clients.values()),
+                "sync_clients": len(self._sync_clients),
+                "http2": self.http2 and HTTP2_AVAILABLE,
+            }
+
+
+# 创建全局HTTP连接池实例
+http_client_pool = HttpClientPool()
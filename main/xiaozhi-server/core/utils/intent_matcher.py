@@ -0,0 +1,520 @@
+"""
+本地意图快速匹配
+
+intent_llm原先每句话都要请求一次意图识别大模型，"你好"、"播放音乐"这类简单指令也要等几百毫秒。
+这里在大模型之前加两层本地匹配，只有置信度达到阈值时才直接返回结果，其余仍交给大模型：
+第一层是确定性匹配，用Aho-Corasick自动机一次扫描找出句子中的歌名、设备名和工具名，再结合动作关键词判断意图；
+第二层可选，按字符n-gram的TF-IDF向量计算与示例语句的余弦相似度，取最相似的示例，不需要额外的模型文件。
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+
+import numpy as np
+import yaml
+
+CONTINUE_CHAT = "continue_chat"
+
+# 去除标点、空白和表情后再匹配
+_non_word_pattern = re.compile(r"[\W_]+")
+# 否定或停止类的说法不做本地匹配，比如"不要播放音乐"
+_negation_pattern = re.compile(r"不要|不想|不用|别|停止|暂停")
+# 只问时间日期的短句，系统提示词中已有当前时间，直接交给对话模型回答
+_time_pattern = re.compile(
+    r"^(现在|当前|今天|今天是|现在是)?(几点|几点了|几点钟|几点钟了|什么时间|几号|星期几|礼拜几|周几)"
+    r"(了|啊|呀|呢|吗)?$"
+)
+_greetings = frozenset(("你好", "你好啊", "您好", "在吗", "在不在", "嗨", "哈喽", "hello", "hi"))
+# 播放音乐的动作词，后面跟歌名或"音乐"、"歌"等泛称
+_music_verb_pattern = re.compile(
+    r"播放|放一首|放首|放一下|放点|来一首|来首|来点|我想听|想听|我要听|听一下|唱一首|唱首"
+)
+_random_music_tails = frozenset(
+    (
+        "",
+        "音乐",
+        "歌",
+        "歌曲",
+        "一首歌",
+        "首歌",
+        "一首音乐",
+        "一首",
+        "歌吧",
+        "音乐吧",
+        "一首歌吧",
+        "随机",
+        "随便",
+        "随机音乐",
+        "随便一首",
+    )
+)
+_turn_on_pattern = re.compile(r"打开|开启|开一下|开灯")
+_turn_off_pattern = re.compile(r"关闭|关掉|关上|关一下|关灯")
+_number = r"(\d{1,3}|[零一二两三四五六七八九十百]{1,4})"
+# 设置音量、亮度等数值，键是工具参数名
+_set_level_patterns = {
+    "volume": re.compile(rf"音量(?:调到|调成|调至|设置为|设置成|设为|设到|设置到|改为|到)?{_number}"),
+    "brightness": re.compile(
+        rf"亮度(?:调到|调成|调至|设置为|设置成|设为|设到|设置到|改为|到)?{_number}"
+    ),
+}
+_chinese_digits = {
+    "零": 0,
+    "一": 1,
+    "二": 2,
+    "两": 2,
+    "三": 3,
+    "四": 4,
+    "五": 5,
+    "六": 6,
+    "七": 7,
+    "八": 8,
+    "九": 9,
+}
+_EXIT_GOODBYE = "再见，祝您生活愉快！"
+
+
+def normalize_text(text: str) -> str:
+    """去除标点、空白和表情，英文转为小写"""
+    return _non_word_pattern.sub("", text or "").lower()
+
+
+def parse_number(text: str):
+    """解析阿拉伯数字或一百以内的中文数字，无法解析时返回None"""
+    if text.isdigit():
+        return int(text)
+    if text == "百" or text == "一百":
+        return 100
+    if "百" in text:
+        return None
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        if len(tens) > 1 or len(ones) > 1:
+            return None
+        value = _chinese_digits.get(tens, 1 if not tens else None)
+        unit = _chinese_digits.get(ones, 0 if not ones else None)
+        if value is None or unit is None:
+            return None
+        return value * 10 + unit
+    if len(text) == 1:
+        return _chinese_digits.get(text)
+    return None
+
+
+@dataclass
+class IntentMatch:
+    """本地匹配结果，格式与意图识别大模型的返回保持一致"""
+
+    name: str
+    arguments: dict = field(default_factory=dict)
+    confidence: float = 1.0
+    tier: str = "rule"
+
+    def to_json(self) -> str:
+        function_call = {"name": self.name}
+        if self.arguments:
+            function_call["arguments"] = self.arguments
+        return json.dumps({"function_call": function_call}, ensure_ascii=False)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick多模式匹配，一次扫描找出文本中出现的所有关键词"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+    def add(self, word: str, payload):
+        node = 0
+        for char in word:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = child
+            node = child
+        self._output[node].append((len(word), payload))
+
+    def build(self):
+        """添加完所有关键词后计算失败指针"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = (
+                    self._output[child] + self._output[self._fail[child]]
+                )
+        return self
+
+    def search(self, text: str) -> list:
+        """返回所有匹配 (起点, 终点, payload)"""
+        matches = []
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, payload in self._output[node]:
+                matches.append((i - length + 1, i + 1, payload))
+        return matches
+
+    def longest(self, text: str) -> list:
+        """返回最长匹配的所有payload，没有匹配时返回空列表"""
+        matches = self.search(text)
+        if not matches:
+            return []
+        longest = max(end - start for start, end, _ in matches)
+        return [payload for start, end, payload in matches if end - start == longest]
+
+
+class IntentCatalogue:
+    """本地匹配用到的词表：可用工具、歌名、Home Assistant设备、退出命令和唤醒词"""
+
+    def __init__(
+        self,
+        tools=None,
+        music_names=(),
+        hass_devices=(),
+        exit_commands=(),
+        wakeup_words=(),
+        key=None,
+    ):
+        # 工具名 -> 参数的JSON Schema
+        self.tools = tools or {}
+        self.music_names = tuple(music_names or ())
+        self.hass_devices = tuple(hass_devices or ())
+        self.exit_commands = tuple(exit_commands or ())
+        self.wakeup_words = tuple(wakeup_words or ())
+        # 已有工具、歌名和设备列表的摘要时用摘要代替完整列表作为索引缓存的键
+        self.key = (
+            key
+            or (tuple(sorted(self.tools)), self.music_names, self.hass_devices),
+            self.exit_commands,
+            self.wakeup_words,
+        )
+
+    @classmethod
+    def from_functions(cls, functions, **kwargs):
+        """由function calling格式的函数描述列表创建"""
+        tools = {}
+        for func in functions or []:
+            func_info = func.get("function", func)
+            name = func_info.get("name")
+            if name:
+                tools[name] = func_info.get("parameters") or {}
+        return cls(tools=tools, **kwargs)
+
+    def has_tool(self, name: str) -> bool:
+        return name == CONTINUE_CHAT or name in self.tools
+
+    def accepts(self, name: str, arguments: dict) -> bool:
+        """工具存在且必填参数齐全"""
+        if name == CONTINUE_CHAT:
+            return True
+        if name not in self.tools:
+            return False
+        required = self.tools[name].get("required") or []
+        return all(param in (arguments or {}) for param in required)
+
+
+class _RuleIndex:
+    """由词表编译出的第一层匹配索引，词表不变时复用"""
+
+    def __init__(self, catalogue: IntentCatalogue):
+        self.catalogue = catalogue
+        self.exit_commands = frozenset(
+            normalize_text(cmd) for cmd in catalogue.exit_commands
+        )
+        self.chat_phrases = _greetings | frozenset(
+            normalize_text(word) for word in catalogue.wakeup_words
+        )
+
+        self.music = KeywordAutomaton()
+        for name in catalogue.music_names:
+            # 歌名可能带有子目录，完整路径和文件名都可以匹配
+            for alias in {name, name.replace("\\", "/").rsplit("/", 1)[-1]}:
+                alias_key = normalize_text(alias)
+                if len(alias_key) >= 2:
+                    self.music.add(alias_key, alias)
+        self.music.build()
+
+        self.devices = KeywordAutomaton()
+        for device in catalogue.hass_devices:
+            parts = [part.strip() for part in re.split(r"[,，]", str(device))]
+            if len(parts) < 3 or not parts[1] or not parts[2]:
+                continue
+            location, name, entity_id = parts[0], parts[1], parts[2]
+            for alias in {name, location + name}:
+                alias_key = normalize_text(alias)
+                if alias_key:
+                    self.devices.add(alias_key, entity_id)
+        self.devices.build()
+
+        self.tool_names = KeywordAutomaton()
+        self.level_tools = {}
+        for name, params in catalogue.tools.items():
+            properties = params.get("properties") or {}
+            if not params.get("required") and len(name) >= 4:
+                self.tool_names.add(name.lower(), name)
+            for param in _set_level_patterns:
+                if name.endswith(f"set_{param}") and param in properties:
+                    self.level_tools.setdefault(param, name)
+        self.tool_names.build()
+
+    def match(self, text: str):
+        catalogue = self.catalogue
+        plain = normalize_text(text)
+        if not plain:
+            return None
+        if plain in self.exit_commands and catalogue.has_tool("handle_exit_intent"):
+            return IntentMatch("handle_exit_intent", {"say_goodbye": _EXIT_GOODBYE})
+        if plain in self.chat_phrases:
+            return IntentMatch(CONTINUE_CHAT)
+        if _time_pattern.match(plain):
+            return IntentMatch(CONTINUE_CHAT, confidence=0.95)
+        if _negation_pattern.search(plain):
+            return None
+        return (
+            self._match_level(plain)
+            or self._match_device(plain)
+            or self._match_music(plain)
+            or self._match_tool_name(plain)
+        )
+
+    def _match_level(self, plain):
+        for param, tool_name in self.level_tools.items():
+            match = _set_level_patterns[param].search(plain)
+            if not match:
+                continue
+            value = parse_number(match.group(1))
+            if value is not None and 0 <= value <= 100:
+                return IntentMatch(tool_name, {param: value}, confidence=0.95)
+        return None
+
+    def _match_device(self, plain):
+        if not self.catalogue.has_tool("hass_set_state"):
+            return None
+        turn_on = _turn_on_pattern.search(plain)
+        turn_off = _turn_off_pattern.search(plain)
+        if bool(turn_on) == bool(turn_off):
+            return None
+        entity_ids = set(self.devices.longest(plain))
+        # 同名设备分布在多个位置且没有说明位置时交给大模型
+        if len(entity_ids) != 1:
+            return None
+        return IntentMatch(
+            "hass_set_state",
+            {
+                "entity_id": entity_ids.pop(),
+                "state": {"type": "turn_on" if turn_on else "turn_off"},
+            },
+            confidence=0.95,
+        )
+
+    def _match_music(self, plain):
+        if not self.catalogue.has_tool("play_music"):
+            return None
+        verb = _music_verb_pattern.search(plain)
+        if not verb:
+            return None
+        names = self.music.longest(plain)
+        if names:
+            return IntentMatch("play_music", {"song_name": names[0]})
+        if plain[verb.end() :] in _random_music_tails:
+            return IntentMatch("play_music", {"song_name": "random"}, confidence=0.95)
+        # 歌名不在本地曲库中，可能是外部音乐服务或故事，交给大模型
+        return None
+
+    def _match_tool_name(self, plain):
+        names = self.tool_names.longest(plain)
+        if len(names) == 1:
+            return IntentMatch(names[0], confidence=0.9)
+        return None
+
+
+class _ExampleIndex:
+    """第二层：字符n-gram TF-IDF向量的最近邻分类"""
+
+    def __init__(self, examples, dim=4096, ngram_range=(1, 3)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.labels = []
+        counts = []
+        for name, text, arguments in examples:
+            plain = normalize_text(text)
+            if plain:
+                self.labels.append((name, arguments, plain))
+                counts.append(self._counts(plain))
+        matrix = np.zeros((len(counts), dim), dtype=np.float32)
+        for row, bucket_counts in enumerate(counts):
+            for bucket, count in bucket_counts.items():
+                matrix[row, bucket] = count
+        document_freq = np.count_nonzero(matrix, axis=0)
+        self.idf = np.log((1 + len(counts)) / (1 + document_freq)).astype(
+            np.float32
+        ) + np.float32(1)
+        self.matrix = self._normalize(matrix * self.idf)
+
+    def _counts(self, plain):
+        counts = {}
+        low, high = self.ngram_range
+        for size in range(low, high + 1):
+            for start in range(len(plain) - size + 1):
+                gram = plain[start : start + size]
+                bucket = zlib.crc32(gram.encode()) % self.dim
+                counts[bucket] = counts.get(bucket, 0) + 1
+        return counts
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+    def nearest(self, text: str, accept):
+        """返回可接受的最相似示例 (函数名, 参数, 相似度)，没有时返回None"""
+        plain = normalize_text(text)
+        if not plain or not self.labels:
+            return None
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for bucket, count in self._counts(plain).items():
+            vector[bucket] = count
+        scores = self.matrix @ self._normalize(vector * self.idf)
+        for row in np.argsort(scores)[::-1][:5]:
+            name, arguments, _ = self.labels[row]
+            if accept(name, arguments):
+                return name, arguments, float(scores[row])
+        return None
+
+
+def load_examples(path: str) -> list:
+    """读取示例语句文件，格式为 函数名 -> 语句列表，语句可以是字符串或带arguments的字典"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    examples = []
+    for name, items in data.items():
+        for item in items or []:
+            if isinstance(item, dict):
+                examples.append((name, item.get("text", ""), item.get("arguments") or {}))
+            else:
+                examples.append((name, str(item), {}))
+    return examples
+
+
+class IntentMetrics:
+    """各层意图识别的命中率和耗时统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, tier: str, hit: bool, elapsed: float):
+        with self._lock:
+            stats = self._stats.setdefault(tier, {"calls": 0, "hits": 0, "seconds": 0.0})
+            stats["calls"] += 1
+            stats["hits"] += 1 if hit else 0
+            stats["seconds"] += elapsed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                tier: {
+                    "calls": stats["calls"],
+                    "hits": stats["hits"],
+                    "hit_rate": stats["hits"] / stats["calls"],
+                    "avg_ms": stats["seconds"] * 1000 / stats["calls"],
+                }
+                for tier, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class LocalIntentMatcher:
+    """大模型之前的本地意图匹配，match返回None时应继续使用大模型识别"""
+
+    # 缓存的词表索引数量，不同设备的MCP工具不同时会有多份
+    MAX_INDEXES = 16
+
+    def __init__(self, config=None, metrics=None):
+        config = config or {}
+        self.enabled = str(config.get("enabled", True)).lower() in ("true", "1", "yes")
+        # 低于该置信度的本地结果不采用
+        self.confidence_threshold = float(config.get("confidence_threshold", 0.85))
+        self.similarity_enabled = str(config.get("similarity_enabled", False)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        # 第二层的余弦相似度阈值
+        self.similarity_threshold = float(config.get("similarity_threshold", 0.85))
+        self.examples_file = config.get("examples_file") or ""
+        self.metrics = metrics or intent_metrics
+        self._indexes = OrderedDict()
+        self._examples = None
+        self._lock = threading.Lock()
+
+    def _rule_index(self, catalogue: IntentCatalogue) -> _RuleIndex:
+        with self._lock:
+            index = self._indexes.get(catalogue.key)
+            if index is not None:
+                self._indexes.move_to_end(catalogue.key)
+                return index
+        index = _RuleIndex(catalogue)
+        with self._lock:
+            self._indexes[catalogue.key] = index
+            while len(self._indexes) > self.MAX_INDEXES:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _example_index(self):
+        if self._examples is None:
+            with self._lock:
+                if self._examples is None:
+                    examples = []
+                    if self.examples_file and os.path.exists(self.examples_file):
+                        examples = load_examples(self.examples_file)
+                    self._examples = _ExampleIndex(examples)
+        return self._examples
+
+    def match(self, catalogue: IntentCatalogue, text: str):
+        """依次尝试各层本地匹配，返回IntentMatch或None"""
+        if not self.enabled:
+            return None
+
+        start = time.perf_counter()
+        result = self._rule_index(catalogue).match(text)
+        if result is not None and result.confidence < self.confidence_threshold:
+            result = None
+        self.metrics.record("rule", result is not None, time.perf_counter() - start)
+        if result is not None or not self.similarity_enabled:
+            return result
+
+        start = time.perf_counter()
+        nearest = self._example_index().nearest(text, catalogue.accepts)
+        if nearest is not None:
+            name, arguments, score = nearest
+            if score >= self.similarity_threshold:
+                result = IntentMatch(name, dict(arguments), confidence=score, tier="similarity")
+        self.metrics.record("similarity", result is not None, time.perf_counter() - start)
+        return result
+
+
+# 创建全局意图识别统计实例
+intent_metrics = IntentMetrics()
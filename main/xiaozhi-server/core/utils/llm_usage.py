@@ -0,0 +1,100 @@
+"""
+大模型token用量与提示词前缀缓存统计
+
+OpenAI兼容接口在流式回复的最后一个chunk中返回CompletionUsage，
+其中prompt_tokens_details.cached_tokens（DeepSeek为prompt_cache_hit_tokens）
+是命中服务端前缀缓存的输入token数。这里汇总各次请求的用量，并决定请求时携带哪些缓存相关参数。
+"""
+
+import hashlib
+import threading
+
+
+class LLMUsageStats:
+    """进程内的大模型token用量统计"""
+
+    def __init__(self):
+        self._logger = None
+        # 流式请求时要求服务端返回用量，默认关闭
+        self.report_usage = False
+        # 向OpenAI接口传递prompt_cache_key
+        self.cache_key = False
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0,
+        }
+
+    @property
+    def logger(self):
+        """延迟初始化 logger 以避免循环导入"""
+        if self._logger is None:
+            from config.logger import setup_logging
+
+            self._logger = setup_logging()
+        return self._logger
+
+    def configure(self, config: dict):
+        """根据配置文件的prompt_cache设置请求参数"""
+        cache_config = (config or {}).get("prompt_cache") or {}
+        if "report_usage" in cache_config:
+            self.report_usage = str(cache_config["report_usage"]).lower() in (
+                "true",
+                "1",
+                "yes",
+            )
+        if "cache_key" in cache_config:
+            self.cache_key = str(cache_config["cache_key"]).lower() in (
+                "true",
+                "1",
+                "yes",
+            )
+
+    def request_options(self, dialogue) -> dict:
+        """OpenAI兼容接口chat.completions.create的额外参数"""
+        options = {}
+        if self.report_usage:
+            options["stream_options"] = {"include_usage": True}
+        if self.cache_key and dialogue and dialogue[0].get("role") == "system":
+            # 系统提示词相同的请求使用相同的键，服务端会尽量路由到持有该前缀缓存的节点
+            digest = hashlib.sha1(dialogue[0]["content"].encode()).hexdigest()
+            options["extra_body"] = {"prompt_cache_key": digest[:32]}
+        return options
+
+    def record(self, usage, tag: str = __name__):
+        """记录一次请求的用量并输出日志，usage为CompletionUsage或同结构的对象"""
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None)
+        if cached_tokens is None:
+            cached_tokens = getattr(usage, "prompt_cache_hit_tokens", None)
+        cached_tokens = cached_tokens or 0
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["cached_tokens"] += cached_tokens
+            self._stats["completion_tokens"] += completion_tokens
+        self.logger.bind(tag=tag).info(
+            f"Token 消耗：输入 {prompt_tokens}（命中缓存 {cached_tokens}），"
+            f"输出 {completion_tokens}，"
+            f"共计 {getattr(usage, 'total_tokens', None) or prompt_tokens + completion_tokens}"
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            prompt_tokens = self._stats["prompt_tokens"]
+            return dict(
+                self._stats,
+                cache_hit_rate=(
+                    self._stats["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0
+                ),
+            )
+
+
+# 创建全局大模型用量统计实例
+llm_usage = LLMUsageStats()
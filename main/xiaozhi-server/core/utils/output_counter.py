@@ -1,11 +1,47 @@
+import os
+import sqlite3
 import datetime
+import threading
 from typing import Dict, Tuple
 
+from core.utils.worker_pool import worker_pool
+
 # 全局字典，用于存储每个设备的每日输出字数
 _device_daily_output: Dict[Tuple[str, datetime.date], int] = {}
 # 记录最后一次检查的日期
 _last_check_date: datetime.date = None
 
+# 多进程模式下使用的SQLite共享存储，为None时使用进程内字典
+# 读写各用一个连接：WAL模式下读不会被写阻塞，事件循环上的查询不用等待其他进程提交
+_shared_db: sqlite3.Connection = None
+_shared_lock = threading.Lock()
+_write_db: sqlite3.Connection = None
+_write_lock = threading.Lock()
+# 尚未写入SQLite的增量，(device_id, day) -> 字数，由io线程池合并为一次事务写入
+_pending_output: Dict[Tuple[str, str], int] = {}
+# 正在写入的增量，写入完成前查询时同样计入
+_flushing_output: Dict[Tuple[str, str], int] = {}
+_pending_lock = threading.Lock()
+_flush_scheduled = False
+
+
+def use_shared_store(db_path: str):
+    """
+    切换到SQLite共享存储，多个工作进程共用同一份每日输出字数
+    """
+    global _shared_db, _write_db
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    db = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS device_daily_output ("
+        "device_id TEXT NOT NULL, day TEXT NOT NULL, count INTEGER NOT NULL, "
+        "PRIMARY KEY (device_id, day))"
+    )
+    db.commit()
+    _write_db = db
+    _shared_db = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+
 
 def reset_device_output():
     """
@@ -13,6 +49,12 @@ def reset_device_output():
     每天0点调用此函数
     """
     _device_daily_output.clear()
+    if _write_db is not None:
+        with _pending_lock:
+            _pending_output.clear()
+        with _write_lock:
+            _write_db.execute("DELETE FROM device_daily_output")
+            _write_db.commit()
 
 
 def get_device_output(device_id: str) -> int:
@@ -20,6 +62,17 @@ def get_device_output(device_id: str) -> int:
     获取设备当日的输出字数
     """
     current_date = datetime.datetime.now().date()
+    if _shared_db is not None:
+        key = (device_id, current_date.isoformat())
+        with _shared_lock:
+            row = _shared_db.execute(
+                "SELECT count FROM device_daily_output WHERE device_id = ? AND day = ?",
+                key,
+            ).fetchone()
+        # 先查库再加未写入的增量，写入恰好在两者之间完成时最多少算一次，不会重复计算
+        with _pending_lock:
+            unsaved = _pending_output.get(key, 0) + _flushing_output.get(key, 0)
+        return (row[0] if row else 0) + unsaved
     return _device_daily_output.get((device_id, current_date), 0)
 
 
@@ -28,7 +81,18 @@ def add_device_output(device_id: str, char_count: int):
     增加设备的输出字数
     """
     current_date = datetime.datetime.now().date()
-    global _last_check_date
+    global _last_check_date, _flush_scheduled
+
+    if _write_db is not None:
+        # 在事件循环上调用，只记录增量，SQLite写入交给io线程池
+        key = (device_id, current_date.isoformat())
+        with _pending_lock:
+            _pending_output[key] = _pending_output.get(key, 0) + char_count
+            schedule = not _flush_scheduled
+            _flush_scheduled = True
+        if schedule:
+            worker_pool.submit("io", _flush_pending_output)
+        return
 
     # 如果是第一次调用或者日期发生变化，清空计数器
     if _last_check_date is None or _last_check_date != current_date:
@@ -39,6 +103,46 @@ def add_device_output(device_id: str, char_count: int):
     _device_daily_output[(device_id, current_date)] = current_count + char_count
 
 
+def _flush_pending_output():
+    """把累积的增量合并为一次事务写入SQLite，在io线程池中执行"""
+    global _flush_scheduled, _last_check_date
+    # 同一时间只有一次写入，_flushing_output只属于当前这次写入
+    with _write_lock:
+        with _pending_lock:
+            _flushing_output.update(_pending_output)
+            _pending_output.clear()
+            _flush_scheduled = False
+            items = list(_flushing_output.items())
+        if not items:
+            return
+        current_day = datetime.datetime.now().date()
+        try:
+            # 日期变化时清理前一天的记录
+            if _last_check_date != current_day:
+                _write_db.execute(
+                    "DELETE FROM device_daily_output WHERE day < ?",
+                    (current_day.isoformat(),),
+                )
+                _last_check_date = current_day
+            # 原子累加，多个进程同时写入也不会丢失计数
+            _write_db.executemany(
+                "INSERT INTO device_daily_output (device_id, day, count) VALUES (?, ?, ?) "
+                "ON CONFLICT(device_id, day) DO UPDATE SET count = count + excluded.count",
+                [(device_id, day, count) for (device_id, day), count in items],
+            )
+            _write_db.commit()
+        except sqlite3.Error:
+            # 写入失败（比如其他进程长时间持有写锁），增量放回，下次写入时一起提交
+            _write_db.rollback()
+            with _pending_lock:
+                for key, count in items:
+                    _pending_output[key] = _pending_output.get(key, 0) + count
+                _flushing_output.clear()
+            raise
+        with _pending_lock:
+            _flushing_output.clear()
+
+
 def check_device_output_limit(device_id: str, max_output_size: int) -> bool:
     """
     检查设备是否超过输出限制
@@ -0,0 +1,151 @@
+"""
+设备差异化配置缓存
+
+从智控台获取设备差异化配置（/config/agent-models）是带重试的同步HTTP请求，
+这里把请求放到共享线程池中执行，事件循环只需等待结果：
+- 按设备缓存配置，有效期内设备重连、视觉分析直接使用缓存
+- 同一设备同时发起的多个请求合并为一次
+- 过期不久的配置先返回旧值，同时在后台刷新
+- 服务器配置更新（update_config）时清空缓存
+"""
+
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from config.config_loader import get_private_config_from_api
+from config.layered_config import LayeredConfig
+from core.utils.worker_pool import worker_pool
+
+
+class PrivateConfigService:
+    """按设备缓存智控台下发的差异化配置"""
+
+    def __init__(self):
+        self._logger = None
+        self.ttl = 30
+        self.stale_ttl = 300
+        self.max_entries = 10000
+        self._entries = OrderedDict()  # (device_id, client_id) -> (fetched_at, config)
+        self._inflight = {}  # (device_id, client_id) -> (Future, 请求序号)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "joined": 0,
+            "fetches": 0,
+            "fetch_errors": 0,
+            "invalidations": 0,
+        }
+
+    @property
+    def logger(self):
+        """延迟初始化 logger 以避免循环导入"""
+        if self._logger is None:
+            from config.logger import setup_logging
+
+            self._logger = setup_logging()
+        return self._logger
+
+    def configure(self, config: dict):
+        """根据配置文件设置缓存有效期和容量"""
+        cache_config = (config or {}).get("private_config") or {}
+        with self._lock:
+            if cache_config.get("ttl") is not None:
+                self.ttl = max(float(cache_config["ttl"]), 0)
+            if cache_config.get("stale_ttl") is not None:
+                self.stale_ttl = max(float(cache_config["stale_ttl"]), 0)
+            if cache_config.get("max_entries"):
+                self.max_entries = max(int(cache_config["max_entries"]), 1)
+
+    async def get(self, config: dict, device_id: str, client_id: str) -> dict:
+        """获取设备的差异化配置，返回写时复制的视图，调用方可以随意修改，不影响缓存
+
+        设备未找到、未绑定等异常原样抛出，不做缓存。
+        """
+        key = (device_id, client_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                fetched_at, private_config = entry
+                age = now - fetched_at
+                if age <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return LayeredConfig(private_config)
+                if age <= self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    self._fetch_locked(key, config)
+                    return LayeredConfig(private_config)
+            self._stats["misses"] += 1
+            future = self._fetch_locked(key, config)
+        return LayeredConfig(await asyncio.wrap_future(future))
+
+    def _fetch_locked(self, key, config: dict) -> Future:
+        """发起请求，同一设备已有请求进行中时直接复用，需持有锁调用"""
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._stats["joined"] += 1
+            return inflight[0]
+        self._stats["fetches"] += 1
+        self._generation += 1
+        generation = self._generation
+        future = worker_pool.submit("connection", self._fetch, key, config, generation)
+        self._inflight[key] = (future, generation)
+        return future
+
+    def _fetch(self, key, config: dict, generation: int) -> dict:
+        device_id, client_id = key
+        private_config = None
+        try:
+            private_config = get_private_config_from_api(config, device_id, client_id)
+            return private_config
+        except Exception as e:
+            with self._lock:
+                self._stats["fetch_errors"] += 1
+                if key in self._entries:
+                    self.logger.warning(
+                        f"刷新设备{device_id}的差异化配置失败，继续使用缓存: {e}"
+                    )
+            raise
+        finally:
+            with self._lock:
+                inflight = self._inflight.get(key)
+                # 请求期间缓存被清空时，结果只返回给已在等待的调用方，不写入缓存
+                if inflight is not None and inflight[1] == generation:
+                    del self._inflight[key]
+                    if private_config is not None:
+                        self._entries[key] = (time.monotonic(), private_config)
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+
+    def invalidate(self, device_id: str = None):
+        """清空缓存，指定device_id时只清空该设备"""
+        with self._lock:
+            self._stats["invalidations"] += 1
+            if device_id is None:
+                self._entries.clear()
+                self._inflight.clear()
+                return
+            for key in [k for k in self._entries if k[0] == device_id]:
+                del self._entries[key]
+            for key in [k for k in self._inflight if k[0] == device_id]:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["inflight"] = len(self._inflight)
+        return stats
+
+
+# 创建全局差异化配置缓存实例
+private_config_service = PrivateConfigService()
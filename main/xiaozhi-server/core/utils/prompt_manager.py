@@ -4,6 +4,7 @@
 """
 
 import os
+import asyncio
 import cnlunar
 from typing import Dict, Any
 from config.logger import setup_logging
@@ -131,8 +132,8 @@ class PromptManager:
 
         return today_date, today_weekday, lunar_date
 
-    def _get_location_info(self, client_ip: str) -> str:
-        """获取位置信息"""
+    def _get_location_info(self, conn, client_ip: str) -> str:
+        """获取位置信息，在线程中调用，请求在连接的事件循环中执行"""
         try:
             # 先从缓存获取
             cached_location = self.cache_manager.get(self.CacheType.LOCATION, client_ip)
@@ -142,7 +143,9 @@ class PromptManager:
             # 缓存未命中，调用API获取
             from core.utils.util import get_ip_info
 
-            ip_info = get_ip_info(client_ip, self.logger)
+            ip_info = asyncio.run_coroutine_threadsafe(
+                get_ip_info(client_ip, self.logger), conn.loop
+            ).result()
             city = ip_info.get("city", "未知位置")
             location = f"{city}"
 
@@ -154,7 +157,7 @@ class PromptManager:
             return "未知位置"
 
     def _get_weather_info(self, conn, location: str) -> str:
-        """获取天气信息"""
+        """获取天气信息，在线程中调用，请求在连接的事件循环中执行"""
         try:
             # 先从缓存获取
             cached_weather = self.cache_manager.get(self.CacheType.WEATHER, location)
@@ -166,7 +169,9 @@ class PromptManager:
             from plugins_func.register import ActionResponse
 
             # 调用get_weather函数
-            result = get_weather(conn, location=location, lang="zh_CN")
+            result = asyncio.run_coroutine_threadsafe(
+                get_weather(conn, location=location, lang="zh_CN"), conn.loop
+            ).result()
             if isinstance(result, ActionResponse):
                 weather_report = result.result
                 self.cache_manager.set(self.CacheType.WEATHER, location, weather_report)
@@ -181,7 +186,7 @@ class PromptManager:
         """同步更新上下文信息"""
         try:
             # 获取位置信息（使用全局缓存）
-            local_address = self._get_location_info(client_ip)
+            local_address = self._get_location_info(conn, client_ip)
             # 获取天气信息（使用全局缓存）
             self._get_weather_info(conn, local_address)
             self.logger.bind(tag=TAG).info(f"上下文信息更新完成")
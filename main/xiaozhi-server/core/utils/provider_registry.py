@@ -0,0 +1,170 @@
+"""
+提供者共享实例池
+
+使用智控台时每个设备都有自己的差异化配置，原先每个连接都会新建LLM实例
+（主模型、意图识别和记忆总结的专用模型），每个实例各自持有HTTP客户端，连接都是冷的。
+这里按 类别+类型+生效配置 的哈希共享实例：配置相同的连接拿到同一个实例，
+按引用计数管理，最后一个连接释放后保留一段时间，供设备重连时复用。
+
+只有不保存会话状态的提供者才能共享（LLM按session_id区分会话，VLLM无状态）。
+TTS、ASR实例持有连接的队列、websocket和opus编码器，仍然每个连接一个实例，
+只共享其中的访问令牌等客户端部分，见shared_credential。
+"""
+
+import json
+import time
+import hashlib
+import threading
+
+
+class ProviderRegistry:
+    """按生效配置共享提供者实例，引用计数管理生命周期"""
+
+    def __init__(self):
+        self._logger = None
+        self.enabled = True
+        # 引用数归零后实例保留的时间（秒）
+        self.idle_ttl = 300
+        self._entries = {}  # key -> {"kind", "instance", "refs", "idle_since"}
+        self._keys = {}  # id(instance) -> key
+        self._creating = {}  # key -> 创建中的锁
+        self._credentials = {}  # key -> (value, fetched_at)
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "reused": 0, "evicted": 0, "credential_hits": 0}
+
+    @property
+    def logger(self):
+        """延迟初始化 logger 以避免循环导入"""
+        if self._logger is None:
+            from config.logger import setup_logging
+
+            self._logger = setup_logging()
+        return self._logger
+
+    def configure(self, config: dict):
+        """根据配置文件设置开关和空闲实例保留时间"""
+        pool_config = (config or {}).get("provider_pool") or {}
+        with self._lock:
+            if "enabled" in pool_config:
+                self.enabled = str(pool_config["enabled"]).lower() in (
+                    "true",
+                    "1",
+                    "yes",
+                )
+            if pool_config.get("idle_ttl") is not None:
+                self.idle_ttl = max(float(pool_config["idle_ttl"]), 0)
+
+    @staticmethod
+    def make_key(kind: str, type_name: str, config: dict) -> str:
+        body = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+        digest = hashlib.sha1(body.encode("utf-8")).hexdigest()
+        return f"{kind}|{type_name}|{digest}"
+
+    def acquire(self, kind: str, type_name: str, config: dict, factory):
+        """获取共享实例，不存在时调用factory创建，用完后调用release归还"""
+        if not self.enabled:
+            return factory()
+        key = self.make_key(kind, type_name, config)
+        with self._lock:
+            self._evict_idle_locked()
+            instance = self._reuse_locked(key)
+            if instance is not None:
+                return instance
+            create_lock = self._creating.setdefault(key, threading.Lock())
+        # 创建实例可能很慢，不持有全局锁，同一配置并发创建时只创建一次
+        with create_lock:
+            with self._lock:
+                instance = self._reuse_locked(key)
+                if instance is not None:
+                    return instance
+            try:
+                instance = factory()
+            except Exception:
+                with self._lock:
+                    self._creating.pop(key, None)
+                raise
+            with self._lock:
+                self._creating.pop(key, None)
+                self._entries[key] = {
+                    "kind": kind,
+                    "instance": instance,
+                    "refs": 1,
+                    "idle_since": None,
+                }
+                self._keys[id(instance)] = key
+                self._stats["created"] += 1
+        self.logger.debug(f"创建共享{kind}实例: {type_name}")
+        return instance
+
+    def _reuse_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry["refs"] += 1
+        entry["idle_since"] = None
+        self._stats["reused"] += 1
+        return entry["instance"]
+
+    def release(self, instance):
+        """归还实例，不是从共享池获取的实例直接忽略"""
+        if instance is None:
+            return
+        with self._lock:
+            key = self._keys.get(id(instance))
+            entry = self._entries.get(key) if key else None
+            if entry is None or entry["instance"] is not instance:
+                return
+            entry["refs"] = max(entry["refs"] - 1, 0)
+            if entry["refs"] == 0:
+                entry["idle_since"] = time.monotonic()
+            self._evict_idle_locked()
+
+    def _evict_idle_locked(self):
+        now = time.monotonic()
+        for key, entry in list(self._entries.items()):
+            idle_since = entry["idle_since"]
+            if idle_since is not None and now - idle_since >= self.idle_ttl:
+                del self._entries[key]
+                self._keys.pop(id(entry["instance"]), None)
+                self._stats["evicted"] += 1
+
+    def shared_credential(self, key, fetch, ttl: float, force: bool = False):
+        """同一账号的访问令牌在所有实例间共享，ttl秒内不重复申请
+
+        force为True时（如服务端返回401）忽略缓存重新申请。
+        """
+        with self._lock:
+            cached = self._credentials.get(key)
+            if (
+                not force
+                and cached is not None
+                and time.monotonic() - cached[1] < ttl
+            ):
+                self._stats["credential_hits"] += 1
+                return cached[0]
+        value = fetch()
+        # 返回None或含None的元组表示申请失败，不缓存
+        parts = value if isinstance(value, tuple) else (value,)
+        if all(part is not None for part in parts):
+            with self._lock:
+                self._credentials[key] = (value, time.monotonic())
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            kinds = {}
+            for entry in self._entries.values():
+                item = kinds.setdefault(
+                    entry["kind"], {"instances": 0, "idle": 0, "references": 0}
+                )
+                item["instances"] += 1
+                item["references"] += entry["refs"]
+                if entry["refs"] == 0:
+                    item["idle"] += 1
+            stats = dict(self._stats)
+        stats["kinds"] = kinds
+        return stats
+
+
+# 创建全局提供者共享实例池
+provider_registry = ProviderRegistry()
@@ -0,0 +1,146 @@
+"""
+聊天记录上报的音频封装
+
+设备上传和TTS输出的都是opus数据包，直接封装为Ogg-Opus（RFC 7845）即可上报和在浏览器中播放，
+不需要解码；只有旧版manager-api才需要解码为16kHz PCM的WAV。
+"""
+
+import struct
+
+OGG_CAPTURE = b"OggS"
+# Ogg页的段表最多255项
+MAX_PAGE_SEGMENTS = 255
+# 每页最多放多少个数据包，控制单页时长，方便播放器定位
+MAX_PAGE_PACKETS = 50
+# Opus的granule position固定以48kHz计
+OPUS_GRANULE_RATE = 48000
+
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        r = i << 24
+        for _ in range(8):
+            r = ((r << 1) ^ 0x04C11DB7) if r & 0x80000000 else (r << 1)
+        table.append(r & 0xFFFFFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def _ogg_crc(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[((crc >> 24) & 0xFF) ^ byte]
+    return crc
+
+
+def packet_samples(packet: bytes) -> int:
+    """由TOC字节计算opus数据包包含的48kHz采样数"""
+    if not packet:
+        return 0
+    toc = packet[0]
+    config = toc >> 3
+    if config < 12:  # SILK: 10/20/40/60ms
+        frame = (480, 960, 1920, 2880)[config & 3]
+    elif config < 16:  # Hybrid: 10/20ms
+        frame = (480, 960)[config & 1]
+    else:  # CELT: 2.5/5/10/20ms
+        frame = (120, 240, 480, 960)[config & 3]
+    code = toc & 3
+    if code == 0:
+        count = 1
+    elif code in (1, 2):
+        count = 2
+    else:
+        count = packet[1] & 0x3F if len(packet) > 1 else 0
+    return frame * count
+
+
+def _page(header_type: int, granule: int, serial: int, seq: int, packets) -> bytes:
+    lacing = bytearray()
+    for packet in packets:
+        lacing.extend(b"\xff" * (len(packet) // 255))
+        lacing.append(len(packet) % 255)
+    header = (
+        OGG_CAPTURE
+        + struct.pack("<BBqIIIB", 0, header_type, granule, serial, seq, 0, len(lacing))
+        + bytes(lacing)
+    )
+    page = bytearray(header + b"".join(packets))
+    struct.pack_into("<I", page, 22, _ogg_crc(page))
+    return bytes(page)
+
+
+def opus_to_ogg(
+    opus_packets, sample_rate: int = 16000, channels: int = 1, serial: int = 1
+) -> bytes:
+    """把opus数据包原样封装为Ogg-Opus，不做转码"""
+    opus_head = b"OpusHead" + struct.pack(
+        "<BBHIhB", 1, channels, 0, sample_rate, 0, 0
+    )
+    vendor = b"xiaozhi-esp32-server"
+    opus_tags = b"OpusTags" + struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", 0)
+
+    pages = [
+        _page(0x02, 0, serial, 0, [opus_head]),
+        _page(0x00, 0, serial, 1, [opus_tags]),
+    ]
+    seq = 2
+    granule = 0
+    page_packets = []
+    page_segments = 0
+    packets = [p for p in opus_packets if p]
+    for i, packet in enumerate(packets):
+        segments = len(packet) // 255 + 1
+        if page_packets and (
+            page_segments + segments > MAX_PAGE_SEGMENTS
+            or len(page_packets) >= MAX_PAGE_PACKETS
+        ):
+            pages.append(_page(0x00, granule, serial, seq, page_packets))
+            seq += 1
+            page_packets = []
+            page_segments = 0
+        page_packets.append(packet)
+        page_segments += segments
+        granule += packet_samples(packet)
+    # 最后一页带结束标记，没有音频时也输出一个空的结束页
+    pages.append(_page(0x04, granule, serial, seq, page_packets))
+    return b"".join(pages)
+
+
+def opus_to_wav(opus_packets, sample_rate: int = 16000, frame_duration_ms: int = 60):
+    """把opus数据包解码为16bit单声道WAV，旧版manager-api使用"""
+    import opuslib_next
+
+    decoder = opuslib_next.Decoder(sample_rate, 1)
+    frame_size = sample_rate * frame_duration_ms // 1000
+    pcm_data = []
+    for opus_packet in opus_packets:
+        try:
+            pcm_data.append(decoder.decode(opus_packet, frame_size))
+        except opuslib_next.OpusError:
+            continue
+
+    if not pcm_data:
+        raise ValueError("没有有效的PCM数据")
+
+    pcm_data_bytes = b"".join(pcm_data)
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + len(pcm_data_bytes),
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,  # PCM
+        1,  # 单声道
+        sample_rate,
+        sample_rate * 2,
+        2,
+        16,
+        b"data",
+        len(pcm_data_bytes),
+    )
+    return header + pcm_data_bytes
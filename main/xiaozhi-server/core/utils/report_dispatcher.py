@@ -0,0 +1,636 @@
+"""
+聊天记录批量上报
+
+所有连接的聊天记录汇总到进程内一个上报队列，按条数、字节数和时间攒批后，
+通过共享的异步HTTP连接池一次请求上报给manager-api。
+记录中保存原始的opus数据包，发送时再按接口版本封装：新版接口用multipart上传Ogg-Opus二进制，
+旧版接口逐条上报base64编码的WAV。
+上报失败时按指数退避加随机抖动重试，期间积压的记录转存到磁盘上有容量上限的队列，
+接口恢复后再补报。submit只做入队，不会阻塞语音流水线。
+"""
+
+import os
+import json
+import base64
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+
+from core.utils.http_client import http_client_pool
+from core.utils.worker_pool import worker_pool
+from core.utils.report_audio import opus_to_ogg, opus_to_wav
+
+BATCH_ENDPOINT = "/agent/chat-history/report/batch"
+SINGLE_ENDPOINT = "/agent/chat-history/report"
+# 接口版本：2 批量multipart上传音频，1 批量JSON，0 逐条JSON
+API_MULTIPART, API_BATCH_JSON, API_SINGLE = 2, 1, 0
+# 接口不存在时网关或反向代理可能返回的状态码
+UNSUPPORTED_STATUS = (404, 405, 415)
+# manager-api的异常处理器把所有错误都以HTTP 200返回，错误类型放在code中：
+# 接口不存在时返回404，未在ShiroConfig中登记的接口被Oauth2Filter拦截，返回401
+UNSUPPORTED_CODES = (401, 404)
+# 请求内容校验失败（参数为空、格式错误等），重试也不会成功，见ErrorCode
+REJECTED_CODES = frozenset([10001, 10003, *range(10034, 10041)])
+# _classify的结果
+SENT, UNSUPPORTED, RETRY, REJECTED = "sent", "unsupported", "retry", "rejected"
+# 多进程共用磁盘队列时，发送前把文件改名认领，进程异常退出后超过这个时间的认领失效
+SPOOL_CLAIM_TIMEOUT = 600
+
+
+class ReportDispatcher:
+    """进程内共享的聊天记录上报队列"""
+
+    def __init__(self):
+        self._logger = None
+        self.enabled = False
+        self.base_url = ""
+        self.headers = {}
+        self.timeout = 30.0
+        # 攒批条件：条数、字节数、最早一条记录的等待时间
+        self.batch_size = 20
+        self.batch_bytes = 2 * 1024 * 1024
+        self.flush_interval = 2.0
+        # 内存中最多积压的记录数，超出后丢弃最早的记录
+        self.max_pending = 2000
+        # 退避重试的初始和最大间隔（秒）
+        self.retry_base = 1.0
+        self.retry_max = 60.0
+        # 磁盘队列目录和容量上限，目录为空时不转存
+        self.spool_dir = ""
+        self.spool_max_bytes = 256 * 1024 * 1024
+        # multipart上传的音频格式：ogg直接封装opus数据包，wav需要解码
+        self.audio_format = "ogg"
+        # 用户音频会被用来注册声纹，声纹服务只接受WAV
+        self.user_audio_format = "wav"
+
+        self._lock = threading.Lock()
+        self._pending = deque()  # (入队时间, 记录, 字节数)
+        self._pending_bytes = 0
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._failures = 0
+        self._retry_at = 0.0
+        # manager-api较旧时没有批量或multipart接口，逐级退回；
+        # 某一级接口上报成功后确认接口版本，之后不再退回
+        self._api_level = API_MULTIPART
+        self._api_confirmed = False
+        self._spool_seq = 0
+        self._stats = {
+            "submitted": 0,
+            "sent_records": 0,
+            "sent_batches": 0,
+            "failed_batches": 0,
+            "rejected_records": 0,
+            # 音频封装失败、只上报了文字的记录数
+            "audio_errors": 0,
+            "dropped_records": 0,
+            "spooled_records": 0,
+            "uploaded_bytes": 0,
+            "encode_seconds": 0.0,
+        }
+        self._last_error = None
+
+    @property
+    def logger(self):
+        """延迟初始化 logger 以避免循环导入"""
+        if self._logger is None:
+            from config.logger import setup_logging
+
+            self._logger = setup_logging()
+        return self._logger
+
+    def configure(self, config: dict):
+        """根据manager-api和chat_report配置启用上报"""
+        api_config = (config or {}).get("manager-api") or {}
+        url = api_config.get("url") or ""
+        secret = api_config.get("secret") or ""
+        self.enabled = bool(url and secret and "你" not in secret)
+        self.base_url = url.rstrip("/")
+        self.headers = {
+            "Accept": "application/json",
+            "Authorization": "Bearer " + secret,
+        }
+        self.timeout = float(api_config.get("timeout", 30))
+
+        report_config = (config or {}).get("chat_report") or {}
+        if report_config.get("batch_size"):
+            self.batch_size = int(report_config["batch_size"])
+        if report_config.get("batch_kb"):
+            self.batch_bytes = int(float(report_config["batch_kb"]) * 1024)
+        if report_config.get("flush_interval") is not None:
+            self.flush_interval = float(report_config["flush_interval"])
+        if report_config.get("max_pending"):
+            self.max_pending = int(report_config["max_pending"])
+        if report_config.get("retry_base"):
+            self.retry_base = float(report_config["retry_base"])
+        if report_config.get("retry_max"):
+            self.retry_max = float(report_config["retry_max"])
+        if "spool_dir" in report_config:
+            self.spool_dir = report_config.get("spool_dir") or ""
+        if report_config.get("spool_max_mb") is not None:
+            self.spool_max_bytes = int(float(report_config["spool_max_mb"]) * 1024 * 1024)
+        self.audio_format = self._parse_audio_format(
+            report_config.get("audio_format"), "ogg"
+        )
+        self.user_audio_format = self._parse_audio_format(
+            report_config.get("user_audio_format"), "wav"
+        )
+
+    def start(self):
+        """在事件循环中启动上报任务，重复调用无副作用"""
+        if not self.enabled or self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+        self.logger.info(
+            f"聊天记录批量上报已启动: 每批{self.batch_size}条/{self.batch_bytes // 1024}KB/{self.flush_interval}秒"
+        )
+
+    @staticmethod
+    def _record_size(record: dict) -> int:
+        return len(record.get("content") or "") + sum(
+            len(packet) for packet in record.get("opus") or ()
+        )
+
+    def submit(self, record: dict):
+        """加入上报队列，可以在任意线程中调用
+
+        record中opus为原始opus数据包列表，没有音频时为None，其余字段与上报接口一致。
+        """
+        if not self.enabled or self._loop is None:
+            return
+        size = self._record_size(record)
+        with self._lock:
+            self._pending.append((time.monotonic(), record, size))
+            self._pending_bytes += size
+            self._stats["submitted"] += 1
+            while len(self._pending) > self.max_pending:
+                _, _, dropped_size = self._pending.popleft()
+                self._pending_bytes -= dropped_size
+                self._stats["dropped_records"] += 1
+            ready = (
+                len(self._pending) >= self.batch_size
+                or self._pending_bytes >= self.batch_bytes
+            )
+        if ready:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _take_batch(self) -> list:
+        """从内存队列头部取出一批记录"""
+        batch = []
+        batch_bytes = 0
+        with self._lock:
+            while self._pending and len(batch) < self.batch_size:
+                _, record, size = self._pending[0]
+                if batch and batch_bytes + size > self.batch_bytes:
+                    break
+                self._pending.popleft()
+                self._pending_bytes -= size
+                batch.append(record)
+                batch_bytes += size
+        return batch
+
+    def _requeue(self, batch: list):
+        """没有磁盘队列时把发送失败的记录放回内存队列头部"""
+        now = time.monotonic()
+        with self._lock:
+            for record in reversed(batch):
+                size = self._record_size(record)
+                self._pending.appendleft((now, record, size))
+                self._pending_bytes += size
+            while len(self._pending) > self.max_pending:
+                _, _, dropped_size = self._pending.popleft()
+                self._pending_bytes -= dropped_size
+                self._stats["dropped_records"] += 1
+
+    def _batch_ready(self) -> bool:
+        with self._lock:
+            if not self._pending:
+                return False
+            return (
+                len(self._pending) >= self.batch_size
+                or self._pending_bytes >= self.batch_bytes
+                or time.monotonic() - self._pending[0][0] >= self.flush_interval
+            )
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._dispatch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"聊天记录上报任务异常: {e}")
+
+    async def _dispatch(self):
+        """发送所有已攒够的批次，接口不可用时转存到磁盘"""
+        while True:
+            if time.monotonic() < self._retry_at:
+                # 退避期间不请求接口，积压的记录转存到磁盘，内存只保留最近的记录
+                if self.spool_dir and self._batch_ready():
+                    await self._spool(self._take_batch())
+                    continue
+                return
+
+            spool_file = None
+            if self._batch_ready():
+                batch = self._take_batch()
+            else:
+                spool_file = await worker_pool.run("io", self._claim_spool_file)
+                if spool_file is None:
+                    return
+                batch = await worker_pool.run("io", self._read_spool_file, spool_file)
+
+            if not batch:
+                if spool_file:
+                    await worker_pool.run("io", self._remove_spool_file, spool_file)
+                continue
+
+            remaining = await self._send(batch)
+            if not remaining:
+                if spool_file:
+                    await worker_pool.run("io", self._remove_spool_file, spool_file)
+                continue
+
+            if spool_file is not None and len(remaining) == len(batch):
+                await worker_pool.run("io", self._release_spool_file, spool_file)
+                return
+            if spool_file is not None:
+                # 逐条上报时部分记录已经成功，只把剩余的记录放回磁盘队列，避免重复上报
+                await worker_pool.run("io", self._remove_spool_file, spool_file)
+            if self.spool_dir:
+                await self._spool(remaining)
+            else:
+                self._requeue(remaining)
+            return
+
+    def _parse_audio_format(self, value, default: str) -> str:
+        if not value:
+            return default
+        value = str(value).lower()
+        if value not in ("ogg", "wav"):
+            self.logger.warning(f"不支持的上报音频格式{value}，使用{default}")
+            return default
+        return value
+
+    @staticmethod
+    def _metadata(record: dict) -> dict:
+        return {k: v for k, v in record.items() if k != "opus"}
+
+    def _encode_multipart(self, batch: list) -> list:
+        """封装音频并组装multipart请求的各个部分"""
+        records = []
+        files = []
+        for i, record in enumerate(batch):
+            item = self._metadata(record)
+            audio_format = (
+                self.user_audio_format
+                if record.get("chatType") == 1
+                else self.audio_format
+            )
+            audio = self._encode_audio(record, audio_format)
+            if audio is not None:
+                part = f"audio{i}"
+                item["audioPart"] = part
+                item["audioFormat"] = audio_format
+                files.append(
+                    (part, (f"{part}.{audio_format}", audio, f"audio/{audio_format}"))
+                )
+            records.append(item)
+        body = json.dumps(records, ensure_ascii=False).encode("utf-8")
+        return [("records", (None, body, "application/json"))] + files
+
+    def _encode_json(self, batch: list) -> list:
+        """旧版接口：音频解码为WAV后base64编码放入JSON"""
+        records = []
+        for record in batch:
+            item = self._metadata(record)
+            audio = self._encode_audio(record, "wav")
+            item["audioBase64"] = (
+                base64.b64encode(audio).decode("utf-8") if audio is not None else None
+            )
+            records.append(item)
+        return records
+
+    def _encode_audio(self, record: dict, audio_format: str):
+        """封装一条记录的音频，没有音频或封装失败时返回None
+
+        封装失败（比如pcm格式设备上传的不是opus数据）只影响这一条记录的音频，
+        记录照常上报，不能让整批重试而阻塞后面的上报。
+        """
+        if not record.get("opus"):
+            return None
+        try:
+            if audio_format == "wav":
+                return opus_to_wav(record["opus"])
+            return opus_to_ogg(record["opus"])
+        except Exception as e:
+            with self._lock:
+                self._stats["audio_errors"] += 1
+            self.logger.warning(f"聊天记录音频封装失败，不上报这条记录的音频: {e}")
+            return None
+
+    async def _encode(self, fn, batch: list):
+        started = time.perf_counter()
+        result = await worker_pool.run("report", fn, batch)
+        with self._lock:
+            self._stats["encode_seconds"] += time.perf_counter() - started
+        return result
+
+    async def _post(self, endpoint: str, **kwargs):
+        response = await http_client_pool.post(
+            self.base_url + endpoint,
+            headers=self.headers,
+            timeout=self.timeout,
+            **kwargs,
+        )
+        uploaded = response.request.headers.get("content-length")
+        with self._lock:
+            self._stats["uploaded_bytes"] += int(uploaded or 0)
+        return response
+
+    async def _send(self, batch: list) -> list:
+        """发送一批记录，返回需要稍后重试的记录，全部完成（成功或被拒绝）时返回空列表"""
+        remaining = batch
+        # 是否正在用JSON批量接口试探multipart是否受支持
+        probing = False
+        try:
+            if self._api_level == API_MULTIPART:
+                files = await self._encode(self._encode_multipart, batch)
+                result, reason = self._classify(await self._post(BATCH_ENDPOINT, files=files))
+                if result == UNSUPPORTED:
+                    self._downgrade(API_SINGLE, "manager-api不支持批量上报接口，改为逐条上报", reason)
+                elif result == RETRY and not self._api_confirmed:
+                    # 只有JSON批量接口的版本收到multipart请求时同样返回500，
+                    # 接口版本确认前改用JSON批量接口试探，成功则说明不支持multipart
+                    self._downgrade(
+                        API_BATCH_JSON, "multipart上报失败，尝试JSON批量上报", reason
+                    )
+                    probing = True
+                else:
+                    remaining = self._finish(result, reason, batch)
+            if self._api_level <= API_BATCH_JSON:
+                records = await self._encode(self._encode_json, batch)
+            if self._api_level == API_BATCH_JSON:
+                result, reason = self._classify(await self._post(BATCH_ENDPOINT, json=records))
+                if result == UNSUPPORTED:
+                    self._downgrade(API_SINGLE, "manager-api不支持批量上报接口，改为逐条上报", reason)
+                else:
+                    remaining = self._finish(result, reason, batch)
+                    if result == RETRY and probing:
+                        # 两种接口都暂时不可用，无法判断是否支持multipart，下次仍从multipart开始
+                        self._api_level = API_MULTIPART
+            if self._api_level == API_SINGLE:
+                for i, record in enumerate(records):
+                    # 已成功的记录不再重试，避免重复上报
+                    remaining = batch[i:]
+                    result, reason = self._classify(
+                        await self._post(SINGLE_ENDPOINT, json=record)
+                    )
+                    if result == UNSUPPORTED:
+                        # 逐条上报是最早的接口，不存在只可能是密钥或地址配置错误
+                        result = RETRY
+                    if self._finish(result, reason, batch[i : i + 1]):
+                        break
+                else:
+                    remaining = []
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._last_error = str(e) or type(e).__name__
+            if probing:
+                self._api_level = API_MULTIPART
+
+        if remaining:
+            self._failures += 1
+            delay = min(self.retry_max, self.retry_base * 2 ** (self._failures - 1))
+            # 随机抖动，避免接口恢复时所有进程同时重试
+            delay *= random.uniform(0.5, 1.0)
+            self._retry_at = time.monotonic() + delay
+            with self._lock:
+                self._stats["failed_batches"] += 1
+            self.logger.warning(
+                f"聊天记录上报失败，{delay:.1f}秒后重试（第{self._failures}次）: {self._last_error}"
+            )
+            return remaining
+
+        self._failures = 0
+        self._retry_at = 0.0
+        with self._lock:
+            self._stats["sent_batches"] += 1
+        return []
+
+    def _downgrade(self, level: int, message: str, reason: str):
+        self.logger.warning(f"{message}: {reason}")
+        self._api_level = level
+
+    def _finish(self, result: str, reason: str, records: list) -> list:
+        """处理一次请求的结果，返回需要重试的记录"""
+        if result == SENT:
+            self._api_confirmed = True
+            with self._lock:
+                self._stats["sent_records"] += len(records)
+            return []
+        self._last_error = reason
+        if result == REJECTED:
+            # 内容校验失败，重试没有意义，丢弃
+            self._api_confirmed = True
+            with self._lock:
+                self._stats["rejected_records"] += len(records)
+            self.logger.error(f"聊天记录上报被拒绝，丢弃{len(records)}条记录: {reason}")
+            return []
+        return records
+
+    def _classify(self, response):
+        """判断响应的类型，返回(结果, 原因)
+
+        接口版本确认后不再退回，接口不存在按可重试处理（比如密钥被修改后返回401）。
+        """
+        result, reason = self._classify_response(response)
+        if result == UNSUPPORTED and self._api_confirmed:
+            return RETRY, reason
+        return result, reason
+
+    @staticmethod
+    def _classify_response(response):
+        status = response.status_code
+        if status in UNSUPPORTED_STATUS:
+            return UNSUPPORTED, f"HTTP {status}"
+        if status >= 400:
+            # 网关错误、限流、认证失败等，都可能在稍后恢复
+            return RETRY, f"HTTP {status}"
+        try:
+            result = response.json()
+        except ValueError:
+            return RETRY, "响应不是JSON"
+        code = result.get("code")
+        msg = result.get("msg") or "未知错误"
+        if code == 0:
+            return SENT, ""
+        reason = f"API返回错误: {code} {msg}"
+        if code in UNSUPPORTED_CODES:
+            return UNSUPPORTED, reason
+        if code in REJECTED_CODES:
+            return REJECTED, reason
+        # 数据库等服务端异常返回500，稍后重试
+        return RETRY, reason
+
+    # ---------- 磁盘队列 ----------
+
+    async def _spool(self, batch: list):
+        if not batch:
+            return
+        await worker_pool.run("io", self._write_spool_file, batch)
+
+    def _spool_files(self) -> list:
+        if not self.spool_dir or not os.path.isdir(self.spool_dir):
+            return []
+        return sorted(
+            os.path.join(self.spool_dir, name)
+            for name in os.listdir(self.spool_dir)
+            if name.endswith(".jsonl")
+        )
+
+    def _write_spool_file(self, batch: list):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._spool_seq += 1
+        name = f"{time.time_ns()}_{os.getpid()}_{self._spool_seq}.jsonl"
+        path = os.path.join(self.spool_dir, name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in batch:
+                item = self._metadata(record)
+                if record.get("opus"):
+                    item["opus"] = [
+                        base64.b64encode(packet).decode("ascii")
+                        for packet in record["opus"]
+                    ]
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._stats["spooled_records"] += len(batch)
+
+        # 超出容量上限时删除最早的文件
+        files = self._spool_files()
+        total = sum(os.path.getsize(f) for f in files)
+        while files and total > self.spool_max_bytes:
+            oldest = files.pop(0)
+            total -= os.path.getsize(oldest)
+            dropped = self._count_lines(oldest)
+            os.remove(oldest)
+            with self._lock:
+                self._stats["dropped_records"] += dropped
+            self.logger.warning(f"聊天记录磁盘队列已满，丢弃{dropped}条最早的记录")
+
+    @staticmethod
+    def _count_lines(path: str) -> int:
+        with open(path, "rb") as f:
+            return sum(1 for _ in f)
+
+    def _claim_spool_file(self):
+        """认领最早的磁盘队列文件，没有可发送的文件时返回None"""
+        self._recover_stale_claims()
+        for path in self._spool_files():
+            claimed = f"{path}.{os.getpid()}.sending"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                # 已被其他进程认领
+                continue
+            os.utime(claimed)
+            return claimed
+        return None
+
+    @staticmethod
+    def _release_spool_file(claimed: str):
+        """发送失败，放回磁盘队列"""
+        try:
+            os.rename(claimed, claimed.rsplit(".", 2)[0])
+        except OSError:
+            pass
+
+    def _recover_stale_claims(self):
+        """放回认领后长时间没有完成的文件"""
+        now = time.time()
+        for name in os.listdir(self.spool_dir) if os.path.isdir(self.spool_dir) else []:
+            if not name.endswith(".sending"):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                if now - os.path.getmtime(path) > SPOOL_CLAIM_TIMEOUT:
+                    self._release_spool_file(path)
+            except OSError:
+                continue
+
+    @staticmethod
+    def _read_spool_file(path: str) -> list:
+        batch = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if record.get("opus"):
+                        record["opus"] = [base64.b64decode(p) for p in record["opus"]]
+                    batch.append(record)
+        return batch
+
+    @staticmethod
+    def _remove_spool_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    async def close(self):
+        """停止上报任务，内存中未上报的记录转存到磁盘"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.spool_dir:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                self._write_spool_file(batch)
+
+    def stats(self) -> dict:
+        files = self._spool_files()
+        with self._lock:
+            stats = dict(self._stats)
+            stats["queue_depth"] = len(self._pending)
+            stats["queue_kb"] = round(self._pending_bytes / 1024, 1)
+        stats["spool_files"] = len(files)
+        stats["avg_batch_size"] = (
+            round(stats["sent_records"] / stats["sent_batches"], 1)
+            if stats["sent_batches"]
+            else 0.0
+        )
+        stats["uploaded_kb"] = round(stats.pop("uploaded_bytes") / 1024, 1)
+        stats["encode_ms"] = round(stats.pop("encode_seconds") * 1000, 1)
+        stats["api_level"] = self._api_level
+        stats["api_confirmed"] = self._api_confirmed
+        stats["consecutive_failures"] = self._failures
+        stats["last_error"] = self._last_error
+        return stats
+
+
+# 创建全局聊天记录上报实例
+report_dispatcher = ReportDispatcher()
@@ -0,0 +1,225 @@
+"""
+大模型流式输出的增量分句
+
+大模型每输出一个token就追加一次文本，这里只扫描新追加的字符：已切出的句子从缓冲区移除，
+扫描游标之前的字符不会再被扫描，一次回复的分句总开销与文本长度成线性关系。
+第一句遇到逗号等短停顿就切分以尽快出声，之后只在句末标点处切分。
+英文标点要看到下一个字符才能确定是否切分，"3.5"、"1,000"、网址中的"?"等不会被切开；
+代码块在流式过程中直接丢弃，其余Markdown标记在切出句子时清理。
+
+双向流式TTS服务自己按token合成，不需要分句，使用MarkdownStreamFilter原样转发文本，
+只去掉代码块和跨token的Markdown标记。
+"""
+
+import re
+from core.utils import textUtils
+from core.utils.tts import MarkdownCleaner
+
+# 超过该长度仍没有句末标点时，在最近的逗号或空白处强制切分
+DEFAULT_MAX_LENGTH = 200
+# 网址开头，网址中的英文标点不作为分句点
+_URL_PREFIXES = ("http://", "https://", "www.")
+# 清理后仍残留的Markdown标记，比如跨句的粗体只有一半落在当前句中
+_residual_marker_pattern = re.compile(r"[*`]+")
+_CODE_FENCE = "```"
+
+
+def clean_segment(text: str) -> str:
+    """清理一段待合成的文本：去除Markdown标记以及首尾的标点、空白和表情"""
+    text = MarkdownCleaner.clean_markdown(text)
+    text = _residual_marker_pattern.sub("", text)
+    return textUtils.get_string_no_punctuation_or_emoji(text)
+
+
+class TextSegmenter:
+    """增量分句器，每轮对话开始时调用reset
+
+    feed追加一段文本并返回新切出的句子，flush返回剩余的文本。
+    返回的句子已经过clean_segment清理，只含标点或表情的片段会被丢弃。
+    """
+
+    def __init__(
+        self,
+        punctuations,
+        first_sentence_punctuations=None,
+        min_length=0,
+        max_length=DEFAULT_MAX_LENGTH,
+    ):
+        self.punctuations = frozenset(punctuations)
+        self.first_sentence_punctuations = frozenset(
+            first_sentence_punctuations or punctuations
+        )
+        # 强制切分时优先选择的位置
+        self.soft_punctuations = self.first_sentence_punctuations | frozenset(
+            "，,、；;：:"
+        )
+        # 清理后不足min_length个字的句子与下一句合并，0表示不限制
+        self.min_length = min_length
+        # 没有标点时的最大长度，0表示不限制
+        self.max_length = max_length
+        self.reset()
+
+    def reset(self):
+        self._pending = ""  # 尚未切出的原始文本
+        self._cursor = 0  # _pending中下一个待扫描字符的位置
+        self._is_first = True
+        self._lookahead = -1  # 等待下一个字符确认的英文标点位置
+        self._soft_pos = -1  # 最近一个可强制切分的位置
+        self._word_start = 0  # 当前连续非空白字符的起点，用于识别网址
+        self._ticks = 0  # 连续的反引号个数
+        self._code_start = -1  # 未闭合代码块的起点
+
+    @property
+    def is_first_sentence(self) -> bool:
+        return self._is_first
+
+    @property
+    def pending(self) -> str:
+        return self._pending
+
+    def feed(self, text: str) -> list:
+        """追加文本，返回本次新切出的句子"""
+        if not text:
+            return []
+        self._pending += text
+        segments = []
+        i = self._cursor
+        while i < len(self._pending):
+            i = self._scan(i, segments)
+        self._cursor = len(self._pending)
+        return segments
+
+    def flush(self) -> str:
+        """结束本轮输入，返回剩余文本清理后的结果，并重置状态"""
+        pending = self._pending
+        if self._code_start >= 0:
+            # 未闭合的代码块直接丢弃
+            pending = pending[: self._code_start]
+        self.reset()
+        return clean_segment(pending) if pending else ""
+
+    def _scan(self, i: int, segments: list) -> int:
+        """处理位置i的字符，返回下一个待扫描的位置"""
+        pending = self._pending
+        char = pending[i]
+
+        if char == "`":
+            self._ticks += 1
+            if self._ticks == len(_CODE_FENCE):
+                self._ticks = 0
+                if self._code_start < 0:
+                    self._code_start = i - len(_CODE_FENCE) + 1
+                    self._lookahead = -1
+                    return i + 1
+                # 代码块闭合，从缓冲区中删除整个代码块
+                start = self._code_start
+                self._pending = pending[:start] + pending[i + 1 :]
+                self._code_start = -1
+                self._soft_pos = min(self._soft_pos, start - 1)
+                self._word_start = min(self._word_start, start)
+                return start
+            return i + 1
+        self._ticks = 0
+        if self._code_start >= 0:
+            return i + 1
+
+        if self._lookahead >= 0:
+            lookahead, self._lookahead = self._lookahead, -1
+            # 英文标点后紧跟字母或数字时不切分，比如3.5、1,000、e.g
+            if not (char.isascii() and char.isalnum()):
+                i -= self._cut(lookahead, segments)
+
+        if char.isspace():
+            self._word_start = i + 1
+            self._soft_pos = i
+        elif char in self._active_punctuations():
+            if not char.isascii():
+                i -= self._cut(i, segments)
+            elif not self._is_guarded(i):
+                self._lookahead = i
+        elif char in self.soft_punctuations:
+            self._soft_pos = i
+
+        if self.max_length and i + 1 >= self.max_length and self._lookahead < 0:
+            end = self._soft_pos if self._soft_pos > 0 else i
+            i -= self._cut(end, segments, force=True)
+        return i + 1
+
+    def _active_punctuations(self):
+        return self.first_sentence_punctuations if self._is_first else self.punctuations
+
+    def _is_guarded(self, i: int) -> bool:
+        """英文标点是否处于数字或网址中"""
+        pending = self._pending
+        if pending[i] == "." and i > 0 and pending[i - 1].isdigit():
+            # 3.5中的小数点和"1. "形式的列表序号
+            return True
+        # 中文里的网址前面通常没有空格，所以在整个词中查找网址开头
+        word = pending[self._word_start : i].lower()
+        return any(prefix in word for prefix in _URL_PREFIXES)
+
+    def _cut(self, end: int, segments: list, force=False) -> int:
+        """在end处（含）切出一句，返回缓冲区前移的字符数，未切分时返回0"""
+        raw = self._pending[: end + 1]
+        segment = clean_segment(raw)
+        if not force and self.min_length and len(segment) < self.min_length:
+            return 0
+        if segment:
+            segments.append(segment)
+        shift = end + 1
+        self._pending = self._pending[shift:]
+        self._is_first = False
+        self._soft_pos = -1
+        self._word_start = max(self._word_start - shift, 0)
+        if self._code_start >= 0:
+            self._code_start -= shift
+        return shift
+
+
+class MarkdownStreamFilter:
+    """双向流式TTS的文本过滤，每轮对话开始时调用reset
+
+    feed返回可以立即发送的文本，不等待整句：丢弃代码块和行内的*、`标记，
+    去掉行首的标题、引用符号。只有末尾可能属于代码块标记的反引号会留到下一次。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """开始新一轮输入，未闭合的代码块和残留的反引号随之丢弃"""
+        self._held = ""  # 末尾尚未确定的反引号
+        self._in_code = False
+        self._line_start = True
+
+    def feed(self, text: str) -> str:
+        """追加文本，返回过滤后可以立即发送的部分"""
+        if not text:
+            return ""
+        text = self._held + text
+        self._held = ""
+        output = []
+        i = 0
+        while i < len(text):
+            char = text[i]
+            if char == "`":
+                end = i
+                while end < len(text) and text[end] == "`":
+                    end += 1
+                ticks = end - i
+                if end == len(text) and ticks < len(_CODE_FENCE):
+                    # 可能是被拆到下一个token中的代码块标记
+                    self._held = text[i:]
+                    break
+                if ticks >= len(_CODE_FENCE):
+                    self._in_code = not self._in_code
+                i = end
+                continue
+            i += 1
+            if self._in_code or char == "*":
+                continue
+            if self._line_start and char in "#>":
+                continue
+            self._line_start = char == "\n" or (self._line_start and char in " \t")
+            output.append(char)
+        return "".join(output)
@@ -0,0 +1,62 @@
+"""
+流式工具调用的拼接
+
+OpenAI兼容接口一次回复中可以有多个工具调用，流式返回时每个增量通过index指明属于哪个调用，
+id和函数名只出现在该调用的第一个增量中，参数分散在后续增量里。
+这里按index累积出完整的调用列表；没有index字段的实现（如gemini）每个带新id的增量视为一个新调用。
+"""
+
+import uuid
+
+
+class ToolCallAccumulator:
+    """累积流式返回的tool_calls增量"""
+
+    def __init__(self):
+        self._calls = {}  # index -> {"id", "name", "arguments"}
+        self._last_index = None
+
+    def __bool__(self):
+        return bool(self._calls)
+
+    def feed(self, tool_calls):
+        """追加一个chunk中的tool_calls增量"""
+        for delta in tool_calls or []:
+            call_id = getattr(delta, "id", None)
+            index = getattr(delta, "index", None)
+            if index is None:
+                if call_id is not None and not any(
+                    call["id"] == call_id for call in self._calls.values()
+                ):
+                    index = len(self._calls)
+                else:
+                    index = self._last_index if self._last_index is not None else 0
+            call = self._calls.setdefault(
+                index, {"id": None, "name": None, "arguments": ""}
+            )
+            self._last_index = index
+            if call_id is not None:
+                call["id"] = call_id
+            function = getattr(delta, "function", None)
+            if function is None:
+                continue
+            if getattr(function, "name", None) is not None:
+                call["name"] = function.name
+            if getattr(function, "arguments", None) is not None:
+                call["arguments"] += function.arguments
+
+    def calls(self) -> list:
+        """按index顺序返回完整的调用，缺少id时补充一个"""
+        result = []
+        for index in sorted(self._calls):
+            call = self._calls[index]
+            if not call["name"]:
+                continue
+            result.append(
+                {
+                    "id": call["id"] or str(uuid.uuid4().hex),
+                    "name": call["name"],
+                    "arguments": call["arguments"],
+                }
+            )
+        return result
@@ -0,0 +1,271 @@
+"""
+整句TTS合成结果缓存
+
+问候语、功能调用的错误提示、"正在为您播放音乐"、输出字数超限提示、退出语等句子
+会反复出现。这里按 TTS配置+规范化文本+音频格式 缓存编码后的帧列表：
+内存中按字节数做LRU淘汰，可选以p3格式持久化到磁盘，两级缓存都有过期时间。
+"""
+
+import os
+import re
+import json
+import time
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from core.utils import p3
+
+_whitespace_pattern = re.compile(r"\s+")
+
+
+class TTSResultCache:
+    """整句TTS合成结果缓存"""
+
+    def __init__(self):
+        self._logger = None
+        self.enabled = True
+        self.max_memory_bytes = 32 * 1024 * 1024
+        self.cache_dir = None
+        self.max_disk_bytes = 512 * 1024 * 1024
+        self.ttl = 7 * 24 * 3600
+        self.max_text_length = 64
+        self._entries = OrderedDict()  # key -> (datas, size, created_at)
+        self._memory_bytes = 0
+        self._disk_bytes = None  # 首次写入磁盘时统计
+        self._lock = threading.RLock()
+        self._stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "disk_evictions": 0,
+            "hit_bytes": 0,
+        }
+
+    @property
+    def logger(self):
+        """延迟初始化 logger 以避免循环导入"""
+        if self._logger is None:
+            from config.logger import setup_logging
+
+            self._logger = setup_logging()
+        return self._logger
+
+    def configure(self, config: dict):
+        """根据配置文件设置缓存开关、容量、持久化目录和过期时间"""
+        cache_config = (config or {}).get("tts_cache") or {}
+        with self._lock:
+            if "enabled" in cache_config:
+                self.enabled = str(cache_config["enabled"]).lower() in (
+                    "true",
+                    "1",
+                    "yes",
+                )
+            if cache_config.get("max_memory_mb") is not None:
+                self.max_memory_bytes = int(
+                    float(cache_config["max_memory_mb"]) * 1024 * 1024
+                )
+            if "cache_dir" in cache_config:
+                self.cache_dir = cache_config["cache_dir"] or None
+                self._disk_bytes = None
+            if cache_config.get("max_disk_mb") is not None:
+                self.max_disk_bytes = int(
+                    float(cache_config["max_disk_mb"]) * 1024 * 1024
+                )
+            if cache_config.get("ttl") is not None:
+                self.ttl = int(cache_config["ttl"])
+            if cache_config.get("max_text_length") is not None:
+                self.max_text_length = int(cache_config["max_text_length"])
+            self._evict_memory()
+
+    @staticmethod
+    def fingerprint(provider_name: str, tts_config: dict) -> str:
+        """TTS模块配置的指纹，音色、语速、音调等任何参数变化都会得到不同的缓存"""
+        raw = json.dumps(tts_config or {}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(f"{provider_name}|{raw}".encode()).hexdigest()
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return _whitespace_pattern.sub(" ", text or "").strip()
+
+    def make_key(self, fingerprint: str, text: str, is_opus=True):
+        """返回缓存键，文本为空、过长或缓存关闭时返回None"""
+        if not self.enabled:
+            return None
+        text = self.normalize_text(text)
+        if not text or (self.max_text_length and len(text) > self.max_text_length):
+            return None
+        fmt = "opus" if is_opus else "pcm"
+        return hashlib.sha256(f"{fingerprint}|{fmt}|{text}".encode()).hexdigest()
+
+    def get(self, key):
+        """获取缓存的帧列表，未命中返回None。返回的列表被缓存共享，调用方不要修改"""
+        if key is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                datas, size, created_at = entry
+                if self.ttl and now - created_at > self.ttl:
+                    del self._entries[key]
+                    self._memory_bytes -= size
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["hit_bytes"] += size
+                    return datas
+
+        loaded = self._load_from_disk(key, now)
+        if loaded is None:
+            self._stats["misses"] += 1
+            return None
+        datas, created_at = loaded
+        self._stats["disk_hits"] += 1
+        self._put_memory(key, datas, created_at)
+        with self._lock:
+            self._stats["hit_bytes"] += sum(len(frame) for frame in datas)
+        return datas
+
+    def put(self, key, datas):
+        """缓存合成结果，key为None或没有音频时忽略"""
+        if key is None or not datas:
+            return
+        datas = list(datas)
+        self._put_memory(key, datas, time.time())
+        self._save_to_disk(key, datas)
+        with self._lock:
+            self._stats["stores"] += 1
+
+    def _put_memory(self, key, datas, created_at):
+        size = sum(len(frame) for frame in datas)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= old[1]
+            if size > self.max_memory_bytes:
+                return
+            self._entries[key] = (datas, size, created_at)
+            self._memory_bytes += size
+            self._evict_memory()
+
+    def _evict_memory(self):
+        while self._memory_bytes > self.max_memory_bytes and self._entries:
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._memory_bytes -= size
+            self._stats["evictions"] += 1
+
+    def _disk_path(self, key) -> str:
+        # 按键的前两位分目录，避免单个目录下文件过多
+        return os.path.join(self.cache_dir, key[:2], f"{key}.p3")
+
+    def _load_from_disk(self, key, now):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            created_at = os.path.getmtime(path)
+        except OSError:
+            return None
+        if self.ttl and now - created_at > self.ttl:
+            self._remove_file(path)
+            return None
+        try:
+            datas, _ = p3.decode_opus_from_file(path)
+            return datas, created_at
+        except Exception as e:
+            self.logger.warning(f"读取TTS缓存文件失败: {path}, {e}")
+            self._remove_file(path)
+            return None
+
+    def _save_to_disk(self, key, datas):
+        """以p3格式写入磁盘，写入临时文件后再替换，避免其他进程读到不完整的文件"""
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                for frame in datas:
+                    f.write(struct.pack(">BBH", 0, 0, len(frame)))
+                    f.write(frame)
+            written = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.warning(f"写入TTS缓存文件失败: {path}, {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_usage()
+            else:
+                self._disk_bytes += written
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _scan_disk_usage(self) -> int:
+        return sum(size for _, _, size in self._list_disk_files())
+
+    def _list_disk_files(self):
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith(".p3"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, path, stat.st_size))
+        return files
+
+    def _evict_disk(self):
+        """删除过期和最早写入的文件，直到占用降到上限的90%"""
+        now = time.time()
+        files = sorted(self._list_disk_files())
+        total = sum(size for _, _, size in files)
+        target = self.max_disk_bytes * 0.9
+        for mtime, path, size in files:
+            expired = self.ttl and now - mtime > self.ttl
+            if not expired and total <= target:
+                break
+            if self._remove_file(path):
+                total -= size
+                self._stats["disk_evictions"] += 1
+        self._disk_bytes = total
+
+    @staticmethod
+    def _remove_file(path) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            hit_rate = (
+                (self._stats["hits"] + self._stats["disk_hits"]) / lookups
+                if lookups
+                else 0.0
+            )
+            return dict(
+                self._stats,
+                hit_rate=hit_rate,
+                entries=len(self._entries),
+                memory_bytes=self._memory_bytes,
+                disk_bytes=self._disk_bytes or 0,
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+
+
+# 创建全局TTS缓存实例
+tts_cache = TTSResultCache()
@@ -5,12 +5,13 @@ import re
 import os
 import wave
 from io import BytesIO
+from collections.abc import Mapping
 from core.utils import p3
+from core.utils.audio_decode import decode_native, is_wav
+from core.utils.http_client import http_client_pool
 import numpy as np
-import requests
 import opuslib_next
 from pydub import AudioSegment
-import copy
 
 TAG = __name__
 emoji_map = {
@@ -94,7 +95,7 @@ def is_private_ip(ip_addr):
         return False  # IP address format error or insufficient segments
 
 
-def get_ip_info(ip_addr, logger):
+async def get_ip_info(ip_addr, logger):
     try:
         # 导入全局缓存管理器
         from core.utils.cache.manager import cache_manager, CacheType
@@ -108,7 +109,8 @@ def get_ip_info(ip_addr, logger):
         if is_private_ip(ip_addr):
             ip_addr = ""
         url = f"https://whois.pconline.com.cn/ipJson.jsp?json=true&ip={ip_addr}"
-        resp = requests.get(url).json()
+        # 接口返回GBK编码，按响应头的字符集解码后再解析
+        resp = json.loads((await http_client_pool.get(url)).text)
         ip_info = {"city": resp.get("city")}
 
         # 存入缓存
@@ -215,7 +217,15 @@ def audio_to_data(audio_file_path, is_opus=True):
     # 获取文件后缀名
     file_type = os.path.splitext(audio_file_path)[1]
     if file_type:
-        file_type = file_type.lstrip(".")
+        file_type = file_type.lstrip(".").lower()
+    if file_type == "p3":
+        opus_datas, duration = p3.decode_opus_from_file(audio_file_path)
+        return _p3_to_data(opus_datas, is_opus), duration
+    if file_type in ("wav", "pcm"):
+        with open(audio_file_path, "rb") as f:
+            raw_data = decode_native(f.read(), file_type)
+        if raw_data is not None:
+            return pcm_to_data(raw_data, is_opus), len(raw_data) / 2 / 16000
     # 读取音频文件，-nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
     audio = AudioSegment.from_file(
         audio_file_path, format=file_type, parameters=["-nostdin"]
@@ -234,20 +244,33 @@ def audio_to_data(audio_file_path, is_opus=True):
 
 def audio_bytes_to_data(audio_bytes, file_type, is_opus=True):
     """
-    直接用音频二进制数据转为opus/pcm数据，支持wav、mp3、p3
+    直接用音频二进制数据转为opus/pcm数据，支持wav、pcm、mp3、p3
+    wav和pcm在进程内解码，只有mp3等压缩格式才调用ffmpeg
     """
     if file_type == "p3":
         # 直接用p3解码
-        return p3.decode_opus_from_bytes(audio_bytes)
-    else:
-        # 其他格式用pydub
-        audio = AudioSegment.from_file(
-            BytesIO(audio_bytes), format=file_type, parameters=["-nostdin"]
-        )
-        audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
-        duration = len(audio) / 1000.0
-        raw_data = audio.raw_data
-        return pcm_to_data(raw_data, is_opus), duration
+        opus_datas, duration = p3.decode_opus_from_bytes(audio_bytes)
+        return _p3_to_data(opus_datas, is_opus), duration
+    if file_type in ("wav", "pcm") or is_wav(audio_bytes):
+        raw_data = decode_native(audio_bytes, file_type)
+        if raw_data is not None:
+            return pcm_to_data(raw_data, is_opus), len(raw_data) / 2 / 16000
+    # 其他格式用pydub
+    audio = AudioSegment.from_file(
+        BytesIO(audio_bytes), format=file_type, parameters=["-nostdin"]
+    )
+    audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
+    duration = len(audio) / 1000.0
+    raw_data = audio.raw_data
+    return pcm_to_data(raw_data, is_opus), duration
+
+
+def _p3_to_data(opus_datas, is_opus):
+    """p3文件本身就是opus帧，需要pcm时逐帧解码"""
+    if is_opus:
+        return opus_datas
+    decoder = opuslib_next.Decoder(16000, 1)
+    return [decoder.decode(opus_frame, 960) for opus_frame in opus_datas]
 
 
 def pcm_to_data(raw_data, is_opus=True):
@@ -354,38 +377,80 @@ def check_asr_update(before_config, new_config):
     return update_asr
 
 
-def filter_sensitive_info(config: dict) -> dict:
+SENSITIVE_KEYS = (
+    "api_key",
+    "personal_access_token",
+    "access_token",
+    "token",
+    "secret",
+    "access_key_secret",
+    "secret_key",
+)
+
+
+class _SensitiveInfoView(Mapping):
+    """配置的只读视图，读取时把敏感字段替换为***，不复制原配置
+
+    原配置是dict时直接读取底层存储，LayeredConfig不会因为打日志而触发写时复制。
+    转为字符串时输出JSON。
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data):
+        self._data = data
+
+    @staticmethod
+    def _wrap(value):
+        if isinstance(value, Mapping):
+            return _SensitiveInfoView(value)
+        if isinstance(value, list):
+            return [_SensitiveInfoView._wrap(item) for item in value]
+        return value
+
+    def __getitem__(self, key):
+        if isinstance(key, str) and any(
+            sensitive in key.lower() for sensitive in SENSITIVE_KEYS
+        ):
+            # 先读取一次，不存在的键照常抛出KeyError
+            self._raw(key)
+            return "***"
+        return self._wrap(self._raw(key))
+
+    def _raw(self, key):
+        if isinstance(self._data, dict):
+            return dict.__getitem__(self._data, key)
+        return self._data[key]
+
+    def __iter__(self):
+        if isinstance(self._data, dict):
+            return iter(dict.keys(self._data))
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    @staticmethod
+    def _json_default(value):
+        if isinstance(value, _SensitiveInfoView):
+            return {key: value[key] for key in value}
+        return str(value)
+
+    def __str__(self):
+        return json.dumps(self, ensure_ascii=False, default=self._json_default)
+
+    __repr__ = __str__
+
+
+def filter_sensitive_info(config: dict) -> Mapping:
     """
     过滤配置中的敏感信息
     Args:
         config: 原始配置字典
     Returns:
-        过滤后的配置字典
+        只读的过滤视图，读取时才替换敏感字段，str()得到JSON
     """
-    sensitive_keys = [
-        "api_key",
-        "personal_access_token",
-        "access_token",
-        "token",
-        "secret",
-        "access_key_secret",
-        "secret_key",
-    ]
-
-    def _filter_dict(d: dict) -> dict:
-        filtered = {}
-        for k, v in d.items():
-            if any(sensitive in k.lower() for sensitive in sensitive_keys):
-                filtered[k] = "***"
-            elif isinstance(v, dict):
-                filtered[k] = _filter_dict(v)
-            elif isinstance(v, list):
-                filtered[k] = [_filter_dict(i) if isinstance(i, dict) else i for i in v]
-            else:
-                filtered[k] = v
-        return filtered
-
-    return _filter_dict(copy.deepcopy(config))
+    return _SensitiveInfoView(config)
 
 
 def get_vision_url(config: dict) -> str:
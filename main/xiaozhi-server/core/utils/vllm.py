@@ -8,6 +8,7 @@ sys.path.insert(0, project_root)
 
 from config.logger import setup_logging
 import importlib
+from core.utils.provider_registry import provider_registry
 
 logger = setup_logging()
 
@@ -21,3 +22,10 @@ def create_instance(class_name, *args, **kwargs):
         return sys.modules[lib_name].VLLMProvider(*args, **kwargs)
 
     raise ValueError(f"不支持的VLLM类型: {class_name}，请检查该配置的type是否设置正确")
+
+
+def acquire_instance(class_name, config):
+    """从共享实例池获取VLLM实例，配置相同的连接共用一个实例，用完后调用provider_registry.release归还"""
+    return provider_registry.acquire(
+        "VLLM", class_name, config, lambda: create_instance(class_name, config)
+    )
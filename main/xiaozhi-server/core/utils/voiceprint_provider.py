@@ -1,12 +1,13 @@
 import asyncio
 import time
 import aiohttp
-import requests
+import httpx
 from urllib.parse import urlparse, parse_qs
 from typing import Optional, Dict
 from config.logger import setup_logging
 from core.utils.cache.manager import cache_manager
 from core.utils.cache.config import CacheType
+from core.utils.http_client import http_client_pool
 
 TAG = __name__
 logger = setup_logging()
@@ -104,8 +105,10 @@ class VoiceprintProvider:
             parsed_url = urlparse(self.api_url)
             health_url = f"{parsed_url.scheme}://{parsed_url.netloc}/voiceprint/health?key={self.api_key}"
             
-            # 发送健康检查请求
-            response = requests.get(health_url, timeout=3)
+            # 发送健康检查请求，在连接初始化线程中同步执行，复用共享连接
+            response = http_client_pool.get_sync_client(health_url).get(
+                health_url, timeout=3
+            )
             
             if response.status_code == 200:
                 result = response.json()
@@ -119,10 +122,10 @@ class VoiceprintProvider:
                 logger.bind(tag=TAG).warning(f"声纹识别服务器健康检查失败: HTTP {response.status_code}")
                 is_healthy = False
                 
-        except requests.exceptions.ConnectTimeout:
+        except httpx.ConnectTimeout:
             logger.bind(tag=TAG).warning("声纹识别服务器连接超时")
             is_healthy = False
-        except requests.exceptions.ConnectionError:
+        except httpx.ConnectError:
             logger.bind(tag=TAG).warning("声纹识别服务器连接被拒绝")
             is_healthy = False
         except Exception as e:
@@ -72,10 +72,21 @@ class WakeupWordsConfig:
 
     def _save_config(self, config: Dict):
         """保存配置到文件，使用文件锁保护"""
+        self._update_config(lambda _: config)
+
+    def _update_config(self, update):
+        """在文件锁内读取、修改并写回配置，多个进程同时更新时不会互相覆盖"""
         try:
-            with open(self.config_file, "w") as f:
+            # 用a+打开，拿到锁之后再清空，避免其他进程读到被截断的文件
+            with open(self.config_file, "a+") as f:
                 with FileLock(f, timeout=self._lock_timeout):
+                    f.seek(0)
+                    content = f.read()
+                    config = update(yaml.safe_load(content) if content else {})
+                    f.seek(0)
+                    f.truncate()
                     yaml.dump(config, f, allow_unicode=True)
+                    f.flush()
                     self._config_cache = config
                     self._last_load_time = time.time()
         except (TimeoutError, IOError) as e:
@@ -106,15 +117,18 @@ class WakeupWordsConfig:
             # 过滤表情符号
             filtered_text = re.sub(r'[\U0001F600-\U0001F64F\U0001F900-\U0001F9FF]', '', text)
             
-            config = self._load_config()
             voice_hash = hashlib.md5(voice.encode()).hexdigest()
-            config[voice_hash] = {
-                "voice": voice,
-                "file_path": file_path,
-                "time": time.time(),
-                "text": filtered_text,
-            }
-            self._save_config(config)
+
+            def update(config):
+                config[voice_hash] = {
+                    "voice": voice,
+                    "file_path": file_path,
+                    "time": time.time(),
+                    "text": filtered_text,
+                }
+                return config
+
+            self._update_config(update)
         except Exception as e:
             print(f"更新唤醒词回复配置失败: {e}")
             raise
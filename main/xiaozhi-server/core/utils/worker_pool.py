@@ -0,0 +1,186 @@
+"""
+服务级别的共享线程池
+
+连接流水线（音频接收 → VAD → ASR → 意图 → LLM → TTS → 发送）以asyncio任务的形式
+运行在服务的事件循环上，只有阻塞的提供者调用才会被派发到这里的线程池。
+线程池按流水线阶段划分并限制线程数，总线程数不再随连接数增长。
+"""
+
+import queue
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 各阶段默认线程数，可以通过配置文件中的worker_pool覆盖
+DEFAULT_STAGE_SIZES = {
+    "connection": 4,  # 连接初始化、私有配置加载等
+    "asr": 8,  # 本地语音识别、声纹识别
+    "llm": 32,  # 大模型对话、意图识别和函数调用
+    "tts": 32,  # 语音合成
+    "report": 4,  # 聊天记录上报
+    "io": 2,  # 音频文件写入等磁盘IO
+    # 同步的服务端插件多为阻塞的网络请求，超时的调用不会释放线程，需要单独的线程池
+    "tools": 16,
+}
+
+
+def in_loop_thread(loop) -> bool:
+    """当前线程是否正在运行指定的事件循环"""
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+class WorkerPool:
+    """按流水线阶段划分的有界线程池，所有连接共享"""
+
+    def __init__(self):
+        self._logger = None
+        self._stage_sizes = dict(DEFAULT_STAGE_SIZES)
+        self._executors = {}
+        self._lock = threading.Lock()
+
+    @property
+    def logger(self):
+        """延迟初始化 logger 以避免循环导入"""
+        if self._logger is None:
+            from config.logger import setup_logging
+
+            self._logger = setup_logging()
+        return self._logger
+
+    def configure(self, config: dict):
+        """根据配置文件设置各阶段线程数，只对之后新建的线程池生效"""
+        stage_sizes = (config or {}).get("worker_pool") or {}
+        with self._lock:
+            for stage, size in stage_sizes.items():
+                if size:
+                    self._stage_sizes[stage] = max(int(size), 1)
+
+    def executor(self, stage: str) -> ThreadPoolExecutor:
+        """获取阶段对应的线程池，不存在时创建"""
+        executor = self._executors.get(stage)
+        if executor is not None:
+            return executor
+        with self._lock:
+            if stage not in self._executors:
+                size = self._stage_sizes.get(stage, 4)
+                self._executors[stage] = ThreadPoolExecutor(
+                    max_workers=size, thread_name_prefix=f"worker-{stage}"
+                )
+                self.logger.debug(f"创建共享线程池 {stage}，线程数上限 {size}")
+            return self._executors[stage]
+
+    def submit(self, stage: str, fn, *args, **kwargs):
+        """提交阻塞任务，返回concurrent.futures.Future"""
+        return self.executor(stage).submit(fn, *args, **kwargs)
+
+    async def run(self, stage: str, fn, *args):
+        """在事件循环中等待阻塞任务完成"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor(stage), fn, *args)
+
+    async def iterate(self, stage: str, iterable):
+        """在线程池中迭代同步生成器，逐个返回结果
+
+        调用方提前退出或任务被取消时，生成器在取下一个结果后停止并被关闭。
+        """
+        loop = asyncio.get_running_loop()
+        results = asyncio.Queue()
+        stopped = threading.Event()
+        end = object()
+
+        def put(item, error=None):
+            try:
+                loop.call_soon_threadsafe(results.put_nowait, (item, error))
+            except RuntimeError:
+                # 事件循环已经关闭
+                stopped.set()
+
+        def produce():
+            try:
+                for item in iterable:
+                    if stopped.is_set():
+                        break
+                    put(item)
+            except BaseException as e:
+                put(end, e)
+                return
+            finally:
+                close = getattr(iterable, "close", None)
+                if close is not None:
+                    close()
+            put(end)
+
+        self.submit(stage, produce)
+        try:
+            while True:
+                item, error = await results.get()
+                if item is end:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            stopped.set()
+
+    def stats(self) -> dict:
+        """各阶段已创建的线程数"""
+        return {
+            stage: len(executor._threads)
+            for stage, executor in list(self._executors.items())
+        }
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            for executor in self._executors.values():
+                executor.shutdown(wait=wait)
+            self._executors.clear()
+
+
+class LoopQueue:
+    """绑定到事件循环的队列
+
+    任意线程都可以put，事件循环上的任务通过await get()消费，消费端不再需要
+    一个线程循环get(timeout=1)。put/get_nowait/qsize/empty与queue.Queue保持一致，
+    原有的生产者代码不用修改。
+    """
+
+    def __init__(self, loop=None):
+        self._queue = asyncio.Queue()
+        self._loop = loop
+
+    def bind(self, loop):
+        """绑定消费端所在的事件循环"""
+        self._loop = loop
+
+    def put(self, item, block=True, timeout=None):
+        loop = self._loop
+        if loop is None or in_loop_thread(loop):
+            self._queue.put_nowait(item)
+        else:
+            # asyncio.Queue不是线程安全的，交给事件循环线程写入
+            loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    def put_nowait(self, item):
+        self.put(item)
+
+    async def get(self):
+        return await self._queue.get()
+
+    def get_nowait(self):
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            raise queue.Empty
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+
+# 创建全局共享线程池实例
+worker_pool = WorkerPool()
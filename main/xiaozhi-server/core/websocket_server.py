@@ -5,15 +5,44 @@ from core.connection import ConnectionHandler
 from config.config_loader import get_config_from_api
 from core.utils.modules_initialize import initialize_modules
 from core.utils.util import check_vad_update, check_asr_update
+from core.utils.worker_pool import worker_pool
+from core.utils.audio_cache import audio_asset_cache
+from core.utils.tts_cache import tts_cache
+from core.utils.http_client import http_client_pool
+from core.utils.llm_usage import llm_usage
+from core.utils.intent_matcher import intent_metrics
+from core.utils.chat_speculation import speculation_metrics
+from core.providers.tools.tool_runtime import tool_metrics
+from core.utils.report_dispatcher import report_dispatcher
+from core.utils.private_config import private_config_service
+from core.utils.provider_registry import provider_registry
+from core.worker_supervisor import is_worker_process, notify_config_updated
 
 TAG = __name__
 
 
 class WebSocketServer:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, reuse_port: bool = False):
         self.config = config
+        # 多进程模式下各工作进程通过SO_REUSEPORT共同监听同一个端口
+        self.reuse_port = reuse_port
         self.logger = setup_logging()
         self.config_lock = asyncio.Lock()
+        # 设置共享线程池各阶段的线程数
+        worker_pool.configure(self.config)
+        # 设置静态音频转码缓存和整句TTS缓存
+        audio_asset_cache.configure(self.config)
+        tts_cache.configure(self.config)
+        # 设置大模型等外部服务共用的HTTP连接池
+        http_client_pool.configure(self.config)
+        # 设置大模型请求的用量统计和缓存参数
+        llm_usage.configure(self.config)
+        # 设置聊天记录批量上报
+        report_dispatcher.configure(self.config)
+        # 设置设备差异化配置缓存
+        private_config_service.configure(self.config)
+        # 设置提供者共享实例池
+        provider_registry.configure(self.config)
         modules = initialize_modules(
             self.logger,
             self.config,
@@ -37,10 +66,53 @@ class WebSocketServer:
         host = server_config.get("ip", "0.0.0.0")
         port = int(server_config.get("port", 8000))
 
-        async with websockets.serve(
-            self._handle_connection, host, port, process_request=self._http_response
-        ):
-            await asyncio.Future()
+        report_dispatcher.start()
+        stats_task = asyncio.create_task(self._log_stats_periodically())
+        try:
+            async with websockets.serve(
+                self._handle_connection,
+                host,
+                port,
+                process_request=self._http_response,
+                reuse_port=self.reuse_port or None,
+            ):
+                await asyncio.Future()
+        finally:
+            stats_task.cancel()
+            # 未上报的聊天记录转存到磁盘，下次启动后补报
+            await report_dispatcher.close()
+
+    async def _log_stats_periodically(self):
+        """定期把各共享组件的运行统计输出到DEBUG日志，只在DEBUG级别下运行"""
+        log_config = self.config.get("log") or {}
+        interval = float(log_config.get("stats_interval") or 0)
+        if interval <= 0 or str(log_config.get("log_level", "INFO")).upper() != "DEBUG":
+            return
+        while True:
+            await asyncio.sleep(interval)
+            # 延迟计算，日志级别高于DEBUG时不会加锁收集统计
+            self.logger.bind(tag=TAG).opt(lazy=True).debug(
+                "运行统计:\n{}", self._collect_stats
+            )
+
+    def _collect_stats(self) -> str:
+        lines = [
+            f"连接数: {len(self.active_connections)}",
+            f"线程池: {worker_pool.stats()}",
+            f"音频缓存: {audio_asset_cache.stats()}",
+            f"TTS缓存: {tts_cache.stats()}",
+            f"HTTP连接池: {http_client_pool.stats()}",
+            f"大模型用量: {llm_usage.stats()}",
+            f"意图识别: {intent_metrics.stats()}",
+            f"推测对话: {speculation_metrics.stats()}",
+            f"工具执行: {tool_metrics.stats()}",
+            f"共享实例: {provider_registry.stats()}",
+        ]
+        if self.config.get("read_config_from_api", False):
+            lines.append(f"差异化配置缓存: {private_config_service.stats()}")
+        if report_dispatcher.enabled:
+            lines.append(f"聊天记录上报: {report_dispatcher.stats()}")
+        return "\n".join(lines)
 
     async def _handle_connection(self, websocket):
         """处理新连接，每次创建独立的ConnectionHandler"""
@@ -86,9 +158,12 @@ class WebSocketServer:
             # 如果是普通 HTTP 请求，返回 "server is running"
             return websocket.respond(200, "Server is running\n")
 
-    async def update_config(self) -> bool:
+    async def update_config(self, broadcast: bool = True) -> bool:
         """更新服务器配置并重新初始化组件
 
+        Args:
+            broadcast: 多进程模式下是否通知其他工作进程同步更新
+
         Returns:
             bool: 更新是否成功
         """
@@ -100,6 +175,8 @@ class WebSocketServer:
                     self.logger.bind(tag=TAG).error("获取新配置失败")
                     return False
                 self.logger.bind(tag=TAG).info(f"获取新配置成功")
+                # 智控台修改了配置，设备差异化配置需要重新获取
+                private_config_service.invalidate()
                 # 检查 VAD 和 ASR 类型是否需要更新
                 update_vad = check_vad_update(self.config, new_config)
                 update_asr = check_asr_update(self.config, new_config)
@@ -132,6 +209,8 @@ class WebSocketServer:
                 if "memory" in modules:
                     self._memory = modules["memory"]
                 self.logger.bind(tag=TAG).info(f"更新配置任务执行完毕")
+                if broadcast and is_worker_process():
+                    notify_config_updated()
                 return True
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"更新服务器配置失败: {str(e)}")
@@ -0,0 +1,203 @@
+import os
+import sys
+import time
+import signal
+import socket
+import asyncio
+import multiprocessing
+from config.logger import setup_logging
+from core.utils.private_config import private_config_service
+
+TAG = __name__
+logger = setup_logging()
+
+# 工作进程编号，未设置时表示单进程模式
+WORKER_ID_ENV = "XIAOZHI_WORKER_ID"
+# 工作进程启动后这么短时间内退出，视为启动失败，延迟重启
+MIN_WORKER_UPTIME = 5
+# 工作进程意外退出后的最长重启等待时间（秒）
+MAX_RESTART_DELAY = 30
+
+# 工作进程与主进程通信的队列，由主进程在启动工作进程时传入
+_control_queue = None
+
+
+def is_worker_process() -> bool:
+    """当前是否运行在多进程模式的工作进程中"""
+    return os.environ.get(WORKER_ID_ENV) is not None
+
+
+def notify_config_updated():
+    """通知主进程本进程已更新配置，由主进程让其他工作进程同步更新"""
+    if _control_queue is not None:
+        _control_queue.put(("update_config", os.getpid()))
+
+
+def request_restart():
+    """请求主进程重启所有工作进程"""
+    if _control_queue is not None:
+        _control_queue.put(("restart", os.getpid()))
+
+
+def run_worker(worker_id: int, control_queue, config_overrides: dict):
+    """工作进程入口"""
+    global _control_queue
+    # 启动过程中收到的配置更新通知直接忽略，启动时加载的就是最新配置
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    os.environ[WORKER_ID_ENV] = str(worker_id)
+    _control_queue = control_queue
+    try:
+        asyncio.run(_worker_main(config_overrides))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _worker_main(config_overrides: dict):
+    from config.settings import load_config
+    from core.utils import output_counter
+    from core.websocket_server import WebSocketServer
+
+    config = load_config()
+    config["server"].update(config_overrides.get("server", {}))
+    if "mcp_endpoint" in config_overrides:
+        config["mcp_endpoint"] = config_overrides["mcp_endpoint"]
+
+    # 每日输出字数限制需要在所有工作进程之间共享
+    output_counter.use_shared_store(
+        os.path.join(config.get("log", {}).get("data_dir", "data"), ".output_counter.db")
+    )
+
+    ws_server = WebSocketServer(config, reuse_port=True)
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stop_event.set)
+    loop.add_signal_handler(signal.SIGINT, stop_event.set)
+    # 其他工作进程更新了配置，本进程同步更新，不再向外广播
+    loop.add_signal_handler(
+        signal.SIGUSR1,
+        lambda: loop.create_task(ws_server.update_config(broadcast=False)),
+    )
+
+    ws_task = asyncio.create_task(ws_server.start())
+    logger.bind(tag=TAG).info(
+        f"工作进程 {os.environ[WORKER_ID_ENV]} 已启动，pid {os.getpid()}"
+    )
+    stop_task = asyncio.create_task(stop_event.wait())
+    await asyncio.wait([ws_task, stop_task], return_when=asyncio.FIRST_COMPLETED)
+    ws_task.cancel()
+    stop_task.cancel()
+    await asyncio.wait([ws_task, stop_task], timeout=3.0)
+
+
+class WorkerSupervisor:
+    """多进程模式的主进程
+
+    启动N个工作进程，每个工作进程通过SO_REUSEPORT绑定同一个websocket端口，
+    独立加载VAD/ASR/LLM等模块。工作进程意外退出后自动重启，某个工作进程收到
+    配置更新后由主进程通知其他工作进程同步更新。
+    """
+
+    def __init__(self, worker_count: int, config_overrides: dict):
+        self.worker_count = worker_count
+        self.config_overrides = config_overrides
+        # 使用spawn，避免复制主进程中已初始化的线程和模型状态
+        self.ctx = multiprocessing.get_context("spawn")
+        self.control_queue = self.ctx.Queue()
+        self.workers = {}  # worker_id -> (process, start_time)
+        self.restart_delays = {}
+        self.stopping = False
+
+    @staticmethod
+    def supported() -> bool:
+        return sys.platform != "win32" and hasattr(socket, "SO_REUSEPORT")
+
+    def _start_worker(self, worker_id: int):
+        process = self.ctx.Process(
+            target=run_worker,
+            args=(worker_id, self.control_queue, self.config_overrides),
+            name=f"xiaozhi-worker-{worker_id}",
+            daemon=False,
+        )
+        process.start()
+        self.workers[worker_id] = (process, time.monotonic())
+
+    def _stop_worker(self, worker_id: int, timeout=5.0):
+        process, _ = self.workers[worker_id]
+        # 先标记为等待重启，避免监控任务把正在停止的进程当作意外退出
+        self.workers[worker_id] = (None, time.monotonic())
+        if process is not None and process.is_alive():
+            process.terminate()
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    async def _monitor_workers(self):
+        """检查工作进程状态，意外退出的进程自动重启，连续启动失败时逐步加长等待"""
+        loop = asyncio.get_running_loop()
+        while not self.stopping:
+            now = time.monotonic()
+            for worker_id, (process, start_time) in list(self.workers.items()):
+                if process is None or process.is_alive():
+                    continue
+                if now - start_time < MIN_WORKER_UPTIME:
+                    delay = min(self.restart_delays.get(worker_id, 0.5) * 2, MAX_RESTART_DELAY)
+                    self.restart_delays[worker_id] = delay
+                else:
+                    delay = 0
+                    self.restart_delays.pop(worker_id, None)
+                logger.bind(tag=TAG).error(
+                    f"工作进程 {worker_id} 已退出，退出码 {process.exitcode}，{delay:.1f}秒后重启"
+                )
+                # 等待重启期间不再重复处理
+                self.workers[worker_id] = (None, now)
+                loop.call_later(delay, self._restart_if_running, worker_id)
+            await asyncio.sleep(1)
+
+    def _restart_if_running(self, worker_id: int):
+        if not self.stopping:
+            self._start_worker(worker_id)
+
+    async def _handle_control_messages(self):
+        loop = asyncio.get_running_loop()
+        while not self.stopping:
+            action, sender_pid = await loop.run_in_executor(None, self.control_queue.get)
+            if action is None:
+                break
+            if action == "update_config":
+                logger.bind(tag=TAG).info(f"工作进程 {sender_pid} 更新了配置，通知其他工作进程")
+                # 主进程的视觉分析接口也缓存了设备差异化配置
+                private_config_service.invalidate()
+                for process, _ in list(self.workers.values()):
+                    if process and process.is_alive() and process.pid != sender_pid:
+                        os.kill(process.pid, signal.SIGUSR1)
+            elif action == "restart":
+                logger.bind(tag=TAG).info("收到重启指令，依次重启所有工作进程")
+                await loop.run_in_executor(None, self._restart_all)
+
+    def _restart_all(self):
+        """逐个重启工作进程，重启期间其他进程继续提供服务"""
+        for worker_id in list(self.workers):
+            self._stop_worker(worker_id)
+            self._start_worker(worker_id)
+            self.restart_delays.pop(worker_id, None)
+
+    async def run(self):
+        """启动所有工作进程并持续监控，任务被取消时停止所有工作进程"""
+        for worker_id in range(self.worker_count):
+            self._start_worker(worker_id)
+        logger.bind(tag=TAG).info(f"已启动 {self.worker_count} 个工作进程")
+
+        monitor_task = asyncio.create_task(self._monitor_workers())
+        control_task = asyncio.create_task(self._handle_control_messages())
+        try:
+            await asyncio.Future()
+        finally:
+            self.stopping = True
+            monitor_task.cancel()
+            # 唤醒阻塞在队列上的读取线程
+            self.control_queue.put((None, None))
+            await asyncio.wait([control_task], timeout=3.0)
+            for worker_id in list(self.workers):
+                self._stop_worker(worker_id)
+            logger.bind(tag=TAG).info("所有工作进程已退出")
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import threading
+import psutil
+import websockets
+import opuslib_next
+from tabulate import tabulate
+from config.settings import load_config
+from core.websocket_server import WebSocketServer
+from core.utils.worker_pool import worker_pool
+
+# 设置全局日志级别为WARNING，抑制INFO级别日志
+logging.basicConfig(level=logging.WARNING)
+
+description = "并发连接线程数与内存占用测试"
+
+
+class ConnectionLoadTester:
+    def __init__(self, port):
+        self.config = load_config()
+        self.config["server"]["port"] = port
+        self.url = f"ws://127.0.0.1:{port}/xiaozhi/v1/"
+        self.process = psutil.Process()
+        self.clients = []
+        self.client_tasks = []
+        self.results = []
+        # 60ms静音帧，模拟设备持续上报音频
+        encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_VOIP)
+        self.silence_frame = encoder.encode(b"\x00\x00" * 960, 960)
+
+    async def _open_client(self, index):
+        headers = {
+            "device-id": f"load-test-{index:05d}",
+            "client-id": f"load-test-client-{index:05d}",
+        }
+        ws = await websockets.connect(self.url, additional_headers=headers)
+        await ws.send(
+            json.dumps(
+                {
+                    "type": "hello",
+                    "version": 1,
+                    "transport": "websocket",
+                    "audio_params": {
+                        "format": "opus",
+                        "sample_rate": 16000,
+                        "channels": 1,
+                        "frame_duration": 60,
+                    },
+                }
+            )
+        )
+        self.clients.append(ws)
+        self.client_tasks.append(asyncio.create_task(self._client_loop(ws)))
+
+    async def _client_loop(self, ws):
+        """持续发送静音帧并丢弃服务端消息"""
+
+        async def drain():
+            async for _ in ws:
+                pass
+
+        drain_task = asyncio.create_task(drain())
+        try:
+            while True:
+                await ws.send(self.silence_frame)
+                await asyncio.sleep(0.06)
+        except (websockets.exceptions.ConnectionClosed, asyncio.CancelledError):
+            pass
+        finally:
+            drain_task.cancel()
+
+    def _sample(self, connection_count, base_threads, base_rss):
+        threads = self.process.num_threads()
+        rss = self.process.memory_info().rss / 1024 / 1024
+        per_100 = 100 / connection_count if connection_count else 0
+        self.results.append(
+            {
+                "connections": connection_count,
+                "threads": threads,
+                "python_threads": threading.active_count(),
+                "rss": rss,
+                "threads_per_100": (threads - base_threads) * per_100,
+                "rss_per_100": (rss - base_rss) * per_100,
+                "pool": sum(worker_pool.stats().values()),
+            }
+        )
+
+    def _print_results(self):
+        table_data = [
+            [
+                r["connections"],
+                r["threads"],
+                r["python_threads"],
+                r["pool"],
+                f"{r['rss']:.1f}",
+                f"{r['threads_per_100']:.1f}",
+                f"{r['rss_per_100']:.1f}",
+            ]
+            for r in self.results
+        ]
+        print(
+            tabulate(
+                table_data,
+                headers=[
+                    "连接数",
+                    "进程线程数",
+                    "Python线程数",
+                    "共享线程池线程数",
+                    "RSS(MB)",
+                    "每100连接新增线程",
+                    "每100连接新增RSS(MB)",
+                ],
+                tablefmt="grid",
+            )
+        )
+        print("\n测试说明：")
+        print("- 服务端与模拟设备运行在同一进程，统计的是整个进程的线程数和内存")
+        print("- 每个模拟设备发送hello后持续以60ms间隔发送静音opus帧")
+        print("- 每100连接新增值以0连接时为基线折算")
+
+    async def run(self, connection_levels, settle_seconds):
+        server = WebSocketServer(self.config)
+        server_task = asyncio.create_task(server.start())
+        await asyncio.sleep(1)
+
+        base_threads = self.process.num_threads()
+        base_rss = self.process.memory_info().rss / 1024 / 1024
+        self._sample(0, base_threads, base_rss)
+        print(f"开始并发连接测试，连接数: {connection_levels}")
+        try:
+            for level in sorted(connection_levels):
+                while len(self.clients) < level:
+                    await self._open_client(len(self.clients))
+                # 等待连接完成组件初始化
+                await asyncio.sleep(settle_seconds)
+                print(f"{level} 个连接已建立，当前活动连接 {len(server.active_connections)}")
+                self._sample(level, base_threads, base_rss)
+        finally:
+            for task in self.client_tasks:
+                task.cancel()
+            for ws in self.clients:
+                await ws.close()
+            server_task.cancel()
+        self._print_results()
+
+
+async def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="并发连接线程数与内存占用测试工具")
+    parser.add_argument(
+        "--connections",
+        type=int,
+        nargs="+",
+        default=[100, 200, 500],
+        help="依次建立的连接数",
+    )
+    parser.add_argument("--port", type=int, default=18000, help="测试服务端口")
+    parser.add_argument(
+        "--settle-seconds", type=float, default=5, help="每档连接建立后等待的秒数"
+    )
+    args, _ = parser.parse_known_args()
+    await ConnectionLoadTester(args.port).run(args.connections, args.settle_seconds)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
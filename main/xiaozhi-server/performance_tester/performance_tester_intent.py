@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from tabulate import tabulate
+from config.settings import load_config
+from core.utils.intent_matcher import IntentCatalogue, LocalIntentMatcher, IntentMetrics
+
+# 设置全局日志级别为WARNING，抑制INFO级别日志
+logging.basicConfig(level=logging.WARNING)
+
+description = "意图识别本地匹配离线评测"
+
+DEFAULT_SAMPLES = os.path.join(os.path.dirname(__file__), "intent_samples.jsonl")
+# 样本中用到的设备端MCP工具，评测时没有设备连接，按常见的工具描述补充
+DEVICE_TOOLS = {
+    "self_audio_speaker_set_volume": {
+        "type": "object",
+        "properties": {"volume": {"type": "integer"}},
+        "required": ["volume"],
+    },
+    "self_screen_set_brightness": {
+        "type": "object",
+        "properties": {"brightness": {"type": "integer"}},
+        "required": ["brightness"],
+    },
+}
+
+
+def load_samples(path):
+    """读取标注文件，每行一个JSON：{"text", "name", "arguments"(可选)}"""
+    samples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                samples.append(json.loads(line))
+    return samples
+
+
+def build_catalogue(config):
+    """按配置文件构建与服务端一致的词表"""
+    from plugins_func.loadplugins import auto_import_modules
+    from plugins_func.register import all_function_registry
+    from plugins_func.functions.play_music import get_music_files
+
+    auto_import_modules("plugins_func.functions")
+    intent_config = config["Intent"].get("intent_llm", {})
+    names = ["handle_exit_intent", "play_music"] + list(
+        intent_config.get("functions") or []
+    )
+    functions = [
+        all_function_registry[name].description
+        for name in names
+        if name in all_function_registry
+    ]
+    catalogue = IntentCatalogue.from_functions(functions)
+    catalogue.tools.update(DEVICE_TOOLS)
+
+    music_config = config["plugins"].get("play_music", {})
+    music_dir = os.path.abspath(music_config.get("music_dir", "./music"))
+    music_ext = music_config.get("music_ext", (".mp3", ".wav", ".p3"))
+    music_names = get_music_files(music_dir, music_ext)[1] if os.path.isdir(music_dir) else []
+    home_assistant_cfg = config["plugins"].get("home_assistant") or {}
+
+    return IntentCatalogue(
+        tools=catalogue.tools,
+        music_names=music_names,
+        hass_devices=home_assistant_cfg.get("devices", []),
+        exit_commands=config.get("exit_commands", []),
+        wakeup_words=config.get("wakeup_words", []),
+    )
+
+
+def create_intent_llm(config, llm_name):
+    """创建意图识别大模型和系统提示词，与intent_llm使用相同的提示词"""
+    from core.utils.llm import create_instance as create_llm_instance
+    from core.providers.intent.intent_llm.intent_llm import IntentProvider
+
+    llm_config = config["LLM"][llm_name]
+    llm = create_llm_instance(llm_config.get("type", llm_name), llm_config)
+    provider = IntentProvider(config["Intent"].get("intent_llm", {}))
+    return llm, provider
+
+
+def is_correct(sample, name, arguments):
+    if name != sample["name"]:
+        return False
+    expected = sample.get("arguments") or {}
+    return all(arguments.get(key) == value for key, value in expected.items())
+
+
+async def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="意图识别本地匹配离线评测工具")
+    parser.add_argument("--file", default=DEFAULT_SAMPLES, help="标注语句文件(jsonl)")
+    parser.add_argument(
+        "--similarity", action="store_true", help="启用第二层示例语句相似度匹配"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=None, help="覆盖配置中的置信度阈值"
+    )
+    parser.add_argument(
+        "--llm", default=None, help="本地未命中的语句交给该大模型识别，不填则只评测本地匹配"
+    )
+    args, _ = parser.parse_known_args()
+
+    config = load_config()
+    match_config = dict(
+        (config["Intent"].get("intent_llm", {}) or {}).get("local_match") or {}
+    )
+    match_config["enabled"] = True
+    if args.similarity:
+        match_config["similarity_enabled"] = True
+    if args.threshold is not None:
+        match_config["confidence_threshold"] = args.threshold
+        match_config["similarity_threshold"] = args.threshold
+
+    metrics = IntentMetrics()
+    matcher = LocalIntentMatcher(match_config, metrics=metrics)
+    catalogue = build_catalogue(config)
+    samples = load_samples(args.file)
+    llm, provider = create_intent_llm(config, args.llm) if args.llm else (None, None)
+    system_prompt = None
+    if provider:
+        functions = [
+            {"function": {"name": name, "parameters": params}}
+            for name, params in catalogue.tools.items()
+        ]
+        system_prompt = (
+            f"{provider.get_intent_system_prompt(functions)}\n"
+            f"<musicNames>{list(catalogue.music_names)}\n</musicNames>"
+        )
+
+    # 每层的 [样本数, 正确数]
+    tier_results = {}
+    errors = []
+    for sample in samples:
+        result = matcher.match(catalogue, sample["text"])
+        if result is not None:
+            tier, name, arguments = result.tier, result.name, result.arguments
+        elif llm is not None:
+            start = time.perf_counter()
+            reply = llm.response_no_stream(
+                system_prompt, f"current dialogue:\nUser: {sample['text']}\n"
+            )
+            metrics.record("llm", True, time.perf_counter() - start)
+            tier, name, arguments = "llm", "continue_chat", {}
+            match = re.search(r"\{.*\}", reply or "", re.DOTALL)
+            try:
+                function_call = json.loads(match.group(0))["function_call"]
+                name = function_call.get("name", name)
+                arguments = function_call.get("arguments") or {}
+            except (AttributeError, KeyError, TypeError, json.JSONDecodeError):
+                pass
+        else:
+            tier, name, arguments = "未命中", None, {}
+        counts = tier_results.setdefault(tier, [0, 0])
+        counts[0] += 1
+        if is_correct(sample, name, arguments):
+            counts[1] += 1
+        elif name is not None:
+            errors.append([sample["text"], tier, sample["name"], name, arguments])
+
+    total = len(samples)
+    stats = metrics.stats()
+    table_data = []
+    for tier, (count, correct) in tier_results.items():
+        tier_stats = stats.get(tier, {})
+        table_data.append(
+            [
+                tier,
+                count,
+                f"{count / total:.1%}",
+                f"{correct / count:.1%}" if tier != "未命中" else "-",
+                f"{tier_stats['avg_ms']:.3f}" if tier_stats else "-",
+            ]
+        )
+    print(
+        tabulate(
+            table_data,
+            headers=["识别层", "语句数", "占比", "准确率", "平均耗时(ms)"],
+            tablefmt="grid",
+        )
+    )
+    if errors:
+        print("\n识别错误的语句：")
+        print(
+            tabulate(
+                errors,
+                headers=["语句", "识别层", "标注", "识别结果", "参数"],
+                tablefmt="grid",
+            )
+        )
+    print("\n测试说明：")
+    print("- rule为第一层确定性匹配，similarity为第二层示例语句相似度匹配")
+    print("- 平均耗时为该层每次尝试的耗时，包含未命中的尝试")
+    print("- 未指定--llm时，本地未命中的语句记为未命中，实际运行时会交给大模型识别")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,244 @@
+import json
+import time
+import asyncio
+import logging
+import statistics
+import threading
+import psutil
+from aiohttp import web
+from tabulate import tabulate
+from config.settings import load_config
+from core.utils.llm import create_instance as create_llm_instance
+from core.providers.llm.base import LLMProviderBase
+from core.utils.http_client import http_client_pool
+
+# 设置全局日志级别为WARNING，抑制INFO级别日志
+logging.basicConfig(level=logging.WARNING)
+
+description = "大模型并发对话首字延迟与连接数测试"
+
+
+class MockLLMServer:
+    """模拟OpenAI兼容接口的流式回复，固定首字延迟和字间隔"""
+
+    def __init__(self, port, ttft, token_interval, token_count):
+        self.port = port
+        self.ttft = ttft
+        self.token_interval = token_interval
+        self.token_count = token_count
+        self.runner = None
+
+    async def _handle_chat(self, request):
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+        await asyncio.sleep(self.ttft)
+        try:
+            for i in range(self.token_count):
+                chunk = {
+                    "id": "mock",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": "mock",
+                    "choices": [
+                        {"index": 0, "delta": {"content": f"字{i}"}, "finish_reason": None}
+                    ],
+                }
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                await asyncio.sleep(self.token_interval)
+            await response.write(b"data: [DONE]\n\n")
+        except ConnectionResetError:
+            pass
+        return response
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._handle_chat)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", self.port).start()
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+
+class LLMConcurrencyTester:
+    def __init__(self, args):
+        self.args = args
+        self.process = psutil.Process()
+        self.results = []
+        self.dialogue = [
+            {"role": "system", "content": "你是小智，一个聪明可爱的AI助手"},
+            {"role": "user", "content": "给我讲一个简短的故事"},
+        ]
+
+    def _create_llm(self):
+        if self.args.llm:
+            config = load_config()
+            llm_config = config["LLM"][self.args.llm]
+            llm_type = llm_config.get("type", self.args.llm)
+            return create_llm_instance(llm_type, llm_config), None
+        return (
+            create_llm_instance(
+                "openai",
+                {
+                    "type": "openai",
+                    "base_url": f"http://127.0.0.1:{self.args.port}/v1",
+                    "api_key": "mock",
+                    "model_name": "mock",
+                },
+            ),
+            self.args.port,
+        )
+
+    def _count_sockets(self, remote_port):
+        """统计本进程作为客户端打开的TCP连接"""
+        count = 0
+        for conn in self.process.connections(kind="tcp"):
+            if not conn.raddr or conn.status != psutil.CONN_ESTABLISHED:
+                continue
+            if remote_port is None or conn.raddr.port == remote_port:
+                count += 1
+        return count
+
+    async def _sample(self, remote_port, peak, stop_event):
+        while not stop_event.is_set():
+            peak["sockets"] = max(peak["sockets"], self._count_sockets(remote_port))
+            peak["threads"] = max(peak["threads"], threading.active_count())
+            await asyncio.sleep(0.05)
+
+    async def _one_chat(self, responses):
+        start = time.perf_counter()
+        ttft = None
+        async for token in responses:
+            if ttft is None and token:
+                ttft = time.perf_counter() - start
+        return ttft, time.perf_counter() - start
+
+    async def run_mode(self, mode, llm, remote_port):
+        if mode == "async":
+            make_responses = lambda: llm.aresponse("perf_test", self.dialogue)
+        else:
+            # 同步接口经线程池适配，对应原先每个对话占用一个线程的方式
+            make_responses = lambda: LLMProviderBase.aresponse(
+                llm, "perf_test", self.dialogue
+            )
+
+        peak = {"sockets": 0, "threads": 0}
+        stop_event = asyncio.Event()
+        sampler = asyncio.create_task(self._sample(remote_port, peak, stop_event))
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(self._one_chat(make_responses()) for _ in range(self.args.concurrency)),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - start
+        stop_event.set()
+        await sampler
+
+        ttfts = [o[0] for o in outcomes if isinstance(o, tuple) and o[0] is not None]
+        failures = len(outcomes) - len(ttfts)
+        ttfts.sort()
+        self.results.append(
+            {
+                "mode": mode,
+                "ok": len(ttfts),
+                "failures": failures,
+                "ttft_p50": statistics.median(ttfts) if ttfts else 0,
+                "ttft_p95": ttfts[int(len(ttfts) * 0.95) - 1] if ttfts else 0,
+                "ttft_max": ttfts[-1] if ttfts else 0,
+                "elapsed": elapsed,
+                "sockets": peak["sockets"],
+                "threads": peak["threads"],
+            }
+        )
+
+    def _print_results(self):
+        table_data = [
+            [
+                "原生异步(AsyncOpenAI+共享连接池)" if r["mode"] == "async" else "同步接口线程池适配",
+                f"{r['ok']}/{r['ok'] + r['failures']}",
+                f"{r['ttft_p50'] * 1000:.0f}",
+                f"{r['ttft_p95'] * 1000:.0f}",
+                f"{r['ttft_max'] * 1000:.0f}",
+                f"{r['elapsed']:.2f}",
+                r["sockets"],
+                r["threads"],
+            ]
+            for r in self.results
+        ]
+        print(
+            tabulate(
+                table_data,
+                headers=[
+                    "调用方式",
+                    "成功数",
+                    "首字P50(ms)",
+                    "首字P95(ms)",
+                    "首字最大(ms)",
+                    "总耗时(s)",
+                    "峰值TCP连接数",
+                    "峰值Python线程数",
+                ],
+                tablefmt="grid",
+            )
+        )
+        print("\n测试说明：")
+        print(f"- 同时发起 {self.args.concurrency} 个流式对话，统计首个token的到达时间")
+        print("- 峰值TCP连接数只统计本进程连向大模型服务的连接")
+        if not self.args.llm:
+            print(
+                f"- 使用本地模拟服务，首字延迟 {self.args.ttft * 1000:.0f}ms，"
+                f"字间隔 {self.args.token_interval * 1000:.0f}ms，每次 {self.args.tokens} 个token"
+            )
+
+    async def run(self):
+        server = None
+        if not self.args.llm:
+            server = MockLLMServer(
+                self.args.port, self.args.ttft, self.args.token_interval, self.args.tokens
+            )
+            await server.start()
+        try:
+            llm, remote_port = self._create_llm()
+            for mode in self.args.modes:
+                print(f"开始测试 {mode} 模式，并发数 {self.args.concurrency}")
+                await self.run_mode(mode, llm, remote_port)
+                # 两轮之间等待空闲连接回收，避免互相影响
+                await asyncio.sleep(1)
+        finally:
+            await http_client_pool.aclose()
+            if server:
+                await server.stop()
+        self._print_results()
+
+
+async def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="大模型并发对话首字延迟与连接数测试工具")
+    parser.add_argument("--concurrency", type=int, default=200, help="并发对话数")
+    parser.add_argument(
+        "--llm", type=str, default=None, help="配置文件中的LLM名称，不指定时使用本地模拟服务"
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["async", "sync"],
+        default=["async", "sync"],
+        help="测试的调用方式",
+    )
+    parser.add_argument("--port", type=int, default=18080, help="模拟服务端口")
+    parser.add_argument("--ttft", type=float, default=0.3, help="模拟服务首字延迟（秒）")
+    parser.add_argument(
+        "--token-interval", type=float, default=0.02, help="模拟服务字间隔（秒）"
+    )
+    parser.add_argument("--tokens", type=int, default=50, help="模拟服务每次返回的token数")
+    args, _ = parser.parse_known_args()
+    await LLMConcurrencyTester(args).run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+import math
+import json
+import time
+import base64
+import random
+import asyncio
+import logging
+
+import httpx
+import opuslib_next
+from tabulate import tabulate
+from core.utils.report_audio import opus_to_ogg, opus_to_wav
+
+# 设置全局日志级别为WARNING，抑制INFO级别日志
+logging.basicConfig(level=logging.WARNING)
+
+description = "聊天记录上报音频编码耗时与数据量测试"
+
+SAMPLE_RATE = 16000
+FRAME_DURATION_MS = 60
+
+
+def make_opus_packets(seconds, seed=0):
+    """生成模拟语音的opus数据包（16kHz单声道，60ms一帧），与设备上传的格式一致"""
+    rng = random.Random(seed)
+    encoder = opuslib_next.Encoder(SAMPLE_RATE, 1, opuslib_next.APPLICATION_VOIP)
+    frame_size = SAMPLE_RATE * FRAME_DURATION_MS // 1000
+    packets = []
+    phase = 0.0
+    for _ in range(int(seconds * 1000 / FRAME_DURATION_MS)):
+        # 基频随机变化的谐波加噪声，接近人声的编码码率
+        freq = rng.uniform(120, 300)
+        samples = []
+        for _ in range(frame_size):
+            phase += 2 * math.pi * freq / SAMPLE_RATE
+            value = 0.3 * math.sin(phase) + 0.15 * math.sin(2 * phase)
+            value += rng.uniform(-0.05, 0.05)
+            samples.append(int(value * 32767))
+        pcm = b"".join(s.to_bytes(2, "little", signed=True) for s in samples)
+        packets.append(encoder.encode(pcm, frame_size))
+    return packets
+
+
+def metadata():
+    return {
+        "macAddress": "00:11:22:33:44:55",
+        "sessionId": "79578c31-f1fb-426a-900e-1e934215f05a",
+        "chatType": 2,
+        "content": "今天天气不错，适合出去走走。",
+        "reportTime": int(time.time()),
+    }
+
+
+def encode_wav_base64(packets):
+    """旧版接口：解码为WAV后base64编码放入JSON"""
+    record = metadata()
+    record["audioBase64"] = base64.b64encode(opus_to_wav(packets)).decode("utf-8")
+    return json.dumps([record], ensure_ascii=False).encode("utf-8")
+
+
+def encode_ogg_base64(packets):
+    """对照组：Ogg封装后仍用base64放入JSON"""
+    record = metadata()
+    record["audioBase64"] = base64.b64encode(opus_to_ogg(packets)).decode("utf-8")
+    return json.dumps([record], ensure_ascii=False).encode("utf-8")
+
+
+def encode_ogg_multipart(packets):
+    """新版接口：Ogg封装后以二进制multipart上传"""
+    record = metadata()
+    record["audioPart"] = "audio0"
+    record["audioFormat"] = "ogg"
+    files = [
+        ("records", (None, json.dumps([record]).encode("utf-8"), "application/json")),
+        ("audio0", ("audio0.ogg", opus_to_ogg(packets), "audio/ogg")),
+    ]
+    request = httpx.Request("POST", "http://localhost/report/batch", files=files)
+    return request.read()
+
+
+async def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="聊天记录上报音频编码测试工具")
+    parser.add_argument(
+        "--seconds",
+        type=float,
+        nargs="+",
+        default=[3, 10, 30],
+        help="每条记录的音频时长(秒)",
+    )
+    parser.add_argument("--rounds", type=int, default=20, help="每种时长的测试轮数")
+    args, _ = parser.parse_known_args()
+
+    table_data = []
+    for seconds in args.seconds:
+        packets = make_opus_packets(seconds)
+        opus_bytes = sum(len(p) for p in packets)
+        for name, encode in (
+            ("WAV+base64 JSON(旧版)", encode_wav_base64),
+            ("Ogg+base64 JSON", encode_ogg_base64),
+            ("Ogg multipart(新版)", encode_ogg_multipart),
+        ):
+            cpu = 0.0
+            body = b""
+            for _ in range(args.rounds):
+                start = time.process_time()
+                body = encode(packets)
+                cpu += time.process_time() - start
+            per_minute = 60 / seconds
+            table_data.append(
+                [
+                    name,
+                    f"{seconds:g}",
+                    f"{opus_bytes / 1024:.1f}",
+                    f"{len(body) / 1024:.1f}",
+                    f"{cpu / args.rounds * 1000:.2f}",
+                    f"{cpu / args.rounds * per_minute * 1000:.1f}",
+                    f"{len(body) * per_minute / 1024:.0f}",
+                ]
+            )
+
+    print(
+        tabulate(
+            table_data,
+            headers=[
+                "上报方式",
+                "音频时长(s)",
+                "opus原始大小(KB)",
+                "请求体(KB)",
+                "每条编码CPU(ms)",
+                "每分钟音频CPU(ms)",
+                "每分钟音频请求体(KB)",
+            ],
+            tablefmt="grid",
+        )
+    )
+    print("\n测试说明：")
+    print("- 音频为模拟语音编码得到的16kHz单声道、60ms一帧的opus数据包，与设备上传的格式一致")
+    print("- CPU耗时为小智服务上报前的编码耗时（解码/封装、base64、JSON或multipart序列化）")
+    print("- 请求体大小即上报时的网络传输量，manager-api端也不再需要base64解码")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+import time
+import random
+import asyncio
+import logging
+from tabulate import tabulate
+from core.utils import textUtils
+from core.utils.text_segmenter import TextSegmenter
+
+# 设置全局日志级别为WARNING，抑制INFO级别日志
+logging.basicConfig(level=logging.WARNING)
+
+description = "大模型回复分句耗时测试"
+
+PUNCTUATIONS = ("。", "？", "?", "！", "!", "；", ";", "：", "~", ".")
+FIRST_SENTENCE_PUNCTUATIONS = (
+    "，", "～", "~", "、", ",", "。", "？", "?", "！", "!", "；", ";", "：", ".",
+)
+
+# 模拟大模型回复的token，包含小数、网址、Markdown和较长的无标点段落
+TOKENS = (
+    "今天", "的", "天气", "不错", "，", "气温", "是", "23", ".", "5", "度", "。",
+    "**", "注意", "**", "：", "明天", "可能", "会", "下雨", "！", "访问",
+    "https", "://", "example", ".", "com", "/?", "q", "=1", "了解", "详情",
+    "。", "我们", "可以", "一起", "去", "公园", "散步", "或者", "在家", "看书",
+    "听音乐", "做", "一些", "自己", "喜欢", "的", "事情", "；",
+)
+
+
+class LegacySegmenter:
+    """原先的分句方式：每个token都拼接全部文本并对每个标点rfind"""
+
+    def __init__(self):
+        self.tts_text_buff = []
+        self.processed_chars = 0
+        self.is_first_sentence = True
+
+    def feed(self, text):
+        self.tts_text_buff.append(text)
+        full_text = "".join(self.tts_text_buff)
+        current_text = full_text[self.processed_chars :]
+        last_punct_pos = -1
+        punctuations_to_use = (
+            FIRST_SENTENCE_PUNCTUATIONS if self.is_first_sentence else PUNCTUATIONS
+        )
+        for punct in punctuations_to_use:
+            pos = current_text.rfind(punct)
+            if (pos != -1 and last_punct_pos == -1) or (
+                pos != -1 and pos < last_punct_pos
+            ):
+                last_punct_pos = pos
+        if last_punct_pos == -1:
+            return []
+        segment_text_raw = current_text[: last_punct_pos + 1]
+        self.processed_chars += len(segment_text_raw)
+        self.is_first_sentence = False
+        segment_text = textUtils.get_string_no_punctuation_or_emoji(segment_text_raw)
+        return [segment_text] if segment_text else []
+
+    def flush(self):
+        full_text = "".join(self.tts_text_buff)
+        return textUtils.get_string_no_punctuation_or_emoji(
+            full_text[self.processed_chars :]
+        )
+
+
+def make_tokens(count, seed):
+    rng = random.Random(seed)
+    return [rng.choice(TOKENS) for _ in range(count)]
+
+
+def run_segmenter(segmenter, tokens):
+    """返回 (总耗时, 单token最大耗时, 句子数)"""
+    slowest = 0.0
+    segments = 0
+    start = time.perf_counter()
+    for token in tokens:
+        token_start = time.perf_counter()
+        segments += len(segmenter.feed(token))
+        slowest = max(slowest, time.perf_counter() - token_start)
+    if segmenter.flush():
+        segments += 1
+    return time.perf_counter() - start, slowest, segments
+
+
+async def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="大模型回复分句耗时测试工具")
+    parser.add_argument(
+        "--tokens",
+        type=int,
+        nargs="+",
+        default=[500, 1000, 2000, 4000],
+        help="每次回复的token数",
+    )
+    parser.add_argument("--rounds", type=int, default=20, help="每种长度的测试轮数")
+    parser.add_argument(
+        "--no-punctuation",
+        action="store_true",
+        help="回复中不含任何标点，测试长段落的最坏情况",
+    )
+    args, _ = parser.parse_known_args()
+
+    table_data = []
+    for count in args.tokens:
+        for name, factory in (
+            ("原分句方式(拼接+rfind)", LegacySegmenter),
+            (
+                "增量分句",
+                lambda: TextSegmenter(PUNCTUATIONS, FIRST_SENTENCE_PUNCTUATIONS),
+            ),
+        ):
+            total = 0.0
+            slowest = 0.0
+            segments = 0
+            for round_index in range(args.rounds):
+                tokens = make_tokens(count, round_index)
+                if args.no_punctuation:
+                    tokens = [
+                        t for t in tokens if t not in FIRST_SENTENCE_PUNCTUATIONS
+                    ]
+                elapsed, token_max, segments = run_segmenter(factory(), tokens)
+                total += elapsed
+                slowest = max(slowest, token_max)
+            average = total / args.rounds
+            table_data.append(
+                [
+                    name,
+                    count,
+                    segments,
+                    f"{average * 1000:.2f}",
+                    f"{average / count * 1e6:.2f}",
+                    f"{slowest * 1e6:.0f}",
+                ]
+            )
+
+    print(
+        tabulate(
+            table_data,
+            headers=[
+                "分句方式",
+                "token数",
+                "句子数",
+                "每次回复耗时(ms)",
+                "平均每token(μs)",
+                "单token最大(μs)",
+            ],
+            tablefmt="grid",
+        )
+    )
+    print("\n测试说明：")
+    print("- 模拟大模型逐个token输出，统计分句本身的CPU耗时，不包含语音合成")
+    print("- 增量分句的耗时包含Markdown清理，原分句方式的Markdown清理在合成前另外进行")
+    print("- 原分句方式每个token的耗时随回复长度增长，增量分句只与新增文本有关")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -12,6 +12,7 @@ import random
 from urllib import parse
 from tabulate import tabulate
 from config.settings import load_config
+from core.utils.asr import create_instance as create_asr_instance
 description = "流式ASR首词耗时测试"
 
 class AccessToken:
@@ -60,6 +61,37 @@ class AccessToken:
         return None, None
 
 
+class _BenchWebSocket:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def send(self, message):
+        data = json.loads(message)
+        if data.get("type") == "stt" and not data.get("is_final", True):
+            self.conn.partial_texts.append(data["text"])
+
+
+class _BenchConnection:
+    """测试本地增量识别时代替ConnectionHandler，只保留receive_audio用到的状态"""
+
+    def __init__(self):
+        self.session_id = str(uuid.uuid4())
+        self.audio_format = "pcm"
+        self.client_listen_mode = "auto"
+        self.client_have_voice = True
+        self.client_voice_stop = False
+        self.asr_audio = []
+        self.asr_stream = None
+        self.voiceprint_provider = None
+        self.partial_texts = []
+        self.websocket = _BenchWebSocket(self)
+
+    def reset_vad_states(self):
+        self.asr_stream = None
+        self.client_have_voice = False
+        self.client_voice_stop = False
+
+
 class DoubaoStreamASRPerformanceTester:
     def __init__(self):
         self.config = load_config()
@@ -278,6 +310,97 @@ class DoubaoStreamASRPerformanceTester:
         
         return self._calculate_result("阿里云流式ASR", latencies, test_count)
     
+    async def test_local_stream_asr(self, asr_name, asr_config, test_count=5):
+        """测试本地增量识别：按实时速度经receive_audio送入音频，统计首个中间结果和说完后得到最终结果的耗时
+
+        与服务端处理设备音频的路径一致（receive_audio -> handle_voice_stop），
+        同时检查说完后是否走了增量收尾而不是整段重新识别。
+        """
+        if not self.test_audio_files:
+            print("没有找到测试音频文件")
+            return []
+
+        import core.providers.asr.base as asr_base
+
+        asr = create_asr_instance(asr_config["type"], asr_config, delete_audio_file=True)
+        if not asr.incremental:
+            print(f"{asr_name} 不是流式模型，跳过测试")
+            return []
+
+        audio_data = self.test_audio_files[0]
+        if audio_data.startswith(b"RIFF"):
+            audio_data = audio_data[44:]
+        chunk_bytes = 960 * 2  # 60ms，与设备上报的音频包一致
+        packets = [
+            audio_data[offset : offset + chunk_bytes]
+            for offset in range(0, len(audio_data), chunk_bytes)
+        ]
+
+        # 记录最终结果的到达时间，不进入对话流程
+        final_times = []
+        finish_calls = []
+
+        async def record_final(conn, text):
+            final_times.append(time.time())
+
+        finish_incremental = asr.finish_incremental
+
+        def record_finish(recognizer_stream):
+            finish_calls.append(recognizer_stream)
+            return finish_incremental(recognizer_stream)
+
+        asr.finish_incremental = record_finish
+        original_start_to_chat = asr_base.startToChat
+        original_enqueue_report = asr_base.enqueue_asr_report
+        asr_base.startToChat = record_final
+        asr_base.enqueue_asr_report = lambda *args, **kwargs: None
+
+        first_latencies = []
+        finish_latencies = []
+        full_decodes = 0
+        try:
+            for i in range(test_count):
+                try:
+                    conn = _BenchConnection()
+                    start_time = time.time()
+                    first_latency = 0
+                    final_times.clear()
+                    finish_calls.clear()
+                    for index, packet in enumerate(packets):
+                        if index == len(packets) - 1:
+                            conn.client_voice_stop = True
+                            finish_start = time.time()
+                        await asr.receive_audio(conn, packet, True)
+                        if conn.partial_texts and not first_latency:
+                            first_latency = time.time() - start_time
+                        # 按实时速度送入音频
+                        delay = start_time + (index + 1) * 0.06 - time.time()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+
+                    if not finish_calls:
+                        full_decodes += 1
+                    finish_latencies.append(
+                        final_times[0] - finish_start if final_times else 0
+                    )
+                    first_latencies.append(first_latency)
+                except Exception as e:
+                    print(f"第{i+1}次测试: {str(e)}")
+                    first_latencies.append(0)
+                    finish_latencies.append(0)
+        finally:
+            asr.finish_incremental = finish_incremental
+            asr_base.startToChat = original_start_to_chat
+            asr_base.enqueue_asr_report = original_enqueue_report
+
+        if full_decodes:
+            print(f"{asr_name} 有{full_decodes}次说完后没有走增量收尾，而是整段重新识别")
+
+        return [
+            self._calculate_result(f"{asr_name}首个中间结果", first_latencies, test_count),
+            self._calculate_result(f"{asr_name}说完到最终结果", finish_latencies, test_count),
+        ]
+
     def _generate_header(self):
         """生成请求头"""
         header = bytearray()
@@ -384,6 +507,22 @@ class DoubaoStreamASRPerformanceTester:
             self.results.append(result)
         else:
             print("配置文件中未找到阿里云流式ASR配置，跳过测试")
+
+        # 测试本地增量识别ASR
+        from core.providers.asr.sherpa_onnx_local import STREAMING_MODEL_TYPES
+
+        for asr_name, asr_config in self.config["ASR"].items():
+            if (
+                asr_config.get("type") == "sherpa_onnx_local"
+                and asr_config.get("model_type") in STREAMING_MODEL_TYPES
+            ):
+                try:
+                    results = await self.test_local_stream_asr(
+                        asr_name, asr_config, test_count
+                    )
+                    self.results.extend(results)
+                except Exception as e:
+                    print(f"{asr_name} 初始化失败，跳过测试: {str(e)}")
         
         # 打印结果
         self._print_results(test_count)
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+import numpy as np
+from tabulate import tabulate
+from config.settings import load_config
+from core.providers.vad.silero import (
+    VADProvider,
+    SileroStreamState,
+    SileroBatchScheduler,
+    WINDOW_SIZE,
+)
+
+# 设置全局日志级别为WARNING，抑制INFO级别日志
+logging.basicConfig(level=logging.WARNING)
+
+description = "VAD批量推理并发CPU占用测试"
+
+# 每个模拟设备的音频时长（秒）
+AUDIO_SECONDS = 3
+# 16kHz下每个512采样点窗口的时长（秒）
+WINDOW_SECONDS = WINDOW_SIZE / 16000
+
+
+class VADPerformanceTester:
+    def __init__(self):
+        self.config = load_config()
+        self.results = []
+
+    def _create_vad(self):
+        vad_name = self.config["selected_module"]["VAD"]
+        vad_config = dict(self.config["VAD"][vad_name])
+        # 由测试工具自己创建调度器，避免重复开启
+        vad_config["batch_enabled"] = False
+        return VADProvider(vad_config)
+
+    @staticmethod
+    def _generate_windows(stream_count, window_count):
+        """为每个模拟设备生成带噪声和语音段的音频窗口"""
+        rng = np.random.default_rng(0)
+        t = np.arange(window_count * WINDOW_SIZE) / 16000
+        windows = []
+        for i in range(stream_count):
+            audio = rng.normal(0, 0.01, t.shape).astype(np.float32)
+            # 每个设备在不同的时间段"说话"
+            start = (i % 3) * len(t) // 4
+            audio[start : start + len(t) // 3] += 0.3 * np.sin(
+                2 * np.pi * (200 + i % 50) * t[: len(t) // 3]
+            ).astype(np.float32)
+            windows.append(audio.reshape(window_count, WINDOW_SIZE))
+        return windows
+
+    def _run_sequential(self, vad, windows, window_count):
+        """每个设备每个窗口单独推理，对应未开启批量推理的情况"""
+        states = [SileroStreamState() for _ in windows]
+        for w in range(window_count):
+            for state, stream_windows in zip(states, windows):
+                vad.infer_batch([state], [stream_windows[w]])
+
+    async def _run_batched(self, vad, windows, window_count, batch_window_ms):
+        """所有设备并发提交，由调度器合并成批量推理"""
+        scheduler = SileroBatchScheduler(
+            vad, batch_window_ms=batch_window_ms, max_batch_size=len(windows)
+        )
+
+        async def device(stream_windows):
+            state = SileroStreamState()
+            for w in range(window_count):
+                await scheduler.infer(state, stream_windows[w])
+
+        await asyncio.gather(*(device(stream_windows) for stream_windows in windows))
+        return scheduler.stats
+
+    async def _test_concurrency(self, vad, stream_count, batch_window_ms):
+        window_count = int(AUDIO_SECONDS / WINDOW_SECONDS)
+        windows = self._generate_windows(stream_count, window_count)
+        audio_seconds = window_count * WINDOW_SECONDS
+
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        self._run_sequential(vad, windows, window_count)
+        seq_cpu = time.process_time() - cpu_start
+        seq_wall = time.perf_counter() - wall_start
+
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        stats = await self._run_batched(vad, windows, window_count, batch_window_ms)
+        batch_cpu = time.process_time() - cpu_start
+        batch_wall = time.perf_counter() - wall_start
+
+        # 每路音频流每秒音频消耗的CPU毫秒数
+        per_stream = lambda cpu: cpu * 1000 / stream_count / audio_seconds
+        return {
+            "streams": stream_count,
+            "seq_cpu": per_stream(seq_cpu),
+            "batch_cpu": per_stream(batch_cpu),
+            "seq_rtf": seq_wall / audio_seconds,
+            "batch_rtf": batch_wall / audio_seconds,
+            "avg_batch": stats["windows"] / max(stats["batches"], 1),
+        }
+
+    def _print_results(self):
+        table_data = [
+            [
+                r["streams"],
+                f"{r['seq_cpu']:.2f}",
+                f"{r['batch_cpu']:.2f}",
+                f"{r['seq_cpu'] / max(r['batch_cpu'], 1e-9):.1f}x",
+                f"{r['seq_rtf']:.3f}",
+                f"{r['batch_rtf']:.3f}",
+                f"{r['avg_batch']:.1f}",
+            ]
+            for r in self.results
+        ]
+        print(
+            tabulate(
+                table_data,
+                headers=[
+                    "并发设备数",
+                    "逐个推理CPU(ms/路/秒)",
+                    "批量推理CPU(ms/路/秒)",
+                    "CPU节省",
+                    "逐个推理实时率",
+                    "批量推理实时率",
+                    "平均batch",
+                ],
+                tablefmt="grid",
+            )
+        )
+        print("\n测试说明：")
+        print(f"- 每个模拟设备推送{AUDIO_SECONDS}秒16kHz音频，按512采样点窗口推理")
+        print("- CPU为进程CPU时间，折算成每路音频流每秒音频的CPU毫秒数")
+        print("- 实时率为处理全部音频的墙钟时间/音频时长，小于1才能实时处理")
+
+    async def run(self, concurrency_levels, batch_window_ms):
+        vad = self._create_vad()
+        if not vad.supports_batch:
+            print("当前silero模型不支持状态切换，无法进行批量推理测试")
+            return
+        print(f"开始VAD并发测试，并发设备数: {concurrency_levels}")
+        self.results = []
+        for stream_count in concurrency_levels:
+            print(f"测试 {stream_count} 路并发...")
+            self.results.append(
+                await self._test_concurrency(vad, stream_count, batch_window_ms)
+            )
+        self._print_results()
+
+
+async def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="VAD批量推理并发CPU占用测试工具")
+    parser.add_argument(
+        "--streams",
+        type=int,
+        nargs="+",
+        default=[10, 100, 500],
+        help="模拟的并发设备数",
+    )
+    parser.add_argument(
+        "--batch-window-ms", type=float, default=5, help="批量推理收集窗口(毫秒)"
+    )
+    args, _ = parser.parse_known_args()
+    await VADPerformanceTester().run(args.streams, args.batch_window_ms)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
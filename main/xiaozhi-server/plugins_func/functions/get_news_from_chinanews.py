@@ -1,9 +1,10 @@
 import random
-import requests
 import xml.etree.ElementTree as ET
 from bs4 import BeautifulSoup
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
+from core.utils.http_client import http_client_pool
+from core.utils.worker_pool import worker_pool
 
 TAG = __name__
 logger = setup_logging()
@@ -40,10 +41,10 @@ GET_NEWS_FROM_CHINANEWS_FUNCTION_DESC = {
 }
 
 
-def fetch_news_from_rss(rss_url):
+async def fetch_news_from_rss(rss_url):
     """从RSS源获取新闻列表"""
     try:
-        response = requests.get(rss_url)
+        response = await http_client_pool.get(rss_url)
         response.raise_for_status()
 
         # 解析XML
@@ -82,13 +83,16 @@ def fetch_news_from_rss(rss_url):
         return []
 
 
-def fetch_news_detail(url):
+async def fetch_news_detail(url):
     """获取新闻详情页内容并总结"""
     try:
-        response = requests.get(url)
+        response = await http_client_pool.get(url)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.content, "html.parser")
+        # 页面较大，解析放到线程池中，不占用事件循环
+        soup = await worker_pool.run(
+            "io", BeautifulSoup, response.content, "html.parser"
+        )
 
         # 尝试提取正文内容 (这里的选择器需要根据实际网站结构调整)
         content_div = soup.select_one(
@@ -144,7 +148,7 @@ def map_category(category_text):
     GET_NEWS_FROM_CHINANEWS_FUNCTION_DESC,
     ToolType.SYSTEM_CTL,
 )
-def get_news_from_chinanews(
+async def get_news_from_chinanews(
     conn, category: str = None, detail: bool = False, lang: str = "zh_CN"
 ):
     """获取新闻并随机选择一条进行播报，或获取上一条新闻的详细内容"""
@@ -173,7 +177,7 @@ def get_news_from_chinanews(
             logger.bind(tag=TAG).debug(f"获取新闻详情: {title}, URL={link}")
 
             # 获取新闻详情
-            detail_content = fetch_news_detail(link)
+            detail_content = await fetch_news_detail(link)
 
             if not detail_content or detail_content == "无法获取详细内容":
                 return ActionResponse(
@@ -213,7 +217,7 @@ def get_news_from_chinanews(
         )
 
         # 获取新闻列表
-        news_items = fetch_news_from_rss(rss_url)
+        news_items = await fetch_news_from_rss(rss_url)
 
         if not news_items:
             return ActionResponse(
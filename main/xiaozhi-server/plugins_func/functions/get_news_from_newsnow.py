@@ -1,8 +1,10 @@
+import io
 import random
-import requests
 import json
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
+from core.utils.http_client import http_client_pool
+from core.utils.worker_pool import worker_pool
 from markitdown import MarkItDown
 
 TAG = __name__
@@ -116,7 +118,7 @@ GET_NEWS_FROM_NEWSNOW_FUNCTION_DESC = {
 }
 
 
-def fetch_news_from_api(conn, source="thepaper"):
+async def fetch_news_from_api(conn, source="thepaper"):
     """从API获取新闻列表"""
     try:
         api_url = f"https://newsnow.busiyi.world/api/s?id={source}"
@@ -126,7 +128,7 @@ def fetch_news_from_api(conn, source="thepaper"):
             api_url = conn.config["plugins"]["get_news_from_newsnow"]["url"] + source
 
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(api_url, headers=headers, timeout=10)
+        response = await http_client_pool.get(api_url, headers=headers, timeout=10)
         response.raise_for_status()
 
         data = response.json()
@@ -142,16 +144,21 @@ def fetch_news_from_api(conn, source="thepaper"):
         return []
 
 
-def fetch_news_detail(url):
+async def fetch_news_detail(url):
     """获取新闻详情页内容并使用MarkItDown清理HTML"""
     try:
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=10)
+        response = await http_client_pool.get(url, headers=headers, timeout=10)
         response.raise_for_status()
 
-        # 使用MarkItDown清理HTML内容
+        # 使用MarkItDown清理HTML内容，转换较耗CPU，放到线程池中
         md = MarkItDown(enable_plugins=False)
-        result = md.convert(response)
+        result = await worker_pool.run(
+            "io",
+            lambda: md.convert_stream(
+                io.BytesIO(response.content), file_extension=".html", url=url
+            ),
+        )
 
         # 获取清理后的文本内容
         clean_text = result.text_content
@@ -172,7 +179,7 @@ def fetch_news_detail(url):
     GET_NEWS_FROM_NEWSNOW_FUNCTION_DESC,
     ToolType.SYSTEM_CTL,
 )
-def get_news_from_newsnow(
+async def get_news_from_newsnow(
     conn, source: str = "澎湃新闻", detail: bool = False, lang: str = "zh_CN"
 ):
     """获取新闻并随机选择一条进行播报，或获取上一条新闻的详细内容"""
@@ -209,7 +216,7 @@ def get_news_from_newsnow(
             )
 
             # 获取新闻详情
-            detail_content = fetch_news_detail(url)
+            detail_content = await fetch_news_detail(url)
 
             if not detail_content or detail_content == "无法获取详细内容":
                 return ActionResponse(
@@ -251,7 +258,7 @@ def get_news_from_newsnow(
         logger.bind(tag=TAG).info(f"获取新闻: 新闻源={source}({english_source_id})")
 
         # 获取新闻列表
-        news_items = fetch_news_from_api(conn, english_source_id)
+        news_items = await fetch_news_from_api(conn, english_source_id)
 
         if not news_items:
             return ActionResponse(
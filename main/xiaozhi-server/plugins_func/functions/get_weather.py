@@ -1,8 +1,9 @@
-import requests
 from bs4 import BeautifulSoup
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from core.utils.util import get_ip_info
+from core.utils.http_client import http_client_pool
+from core.utils.worker_pool import worker_pool
 
 TAG = __name__
 logger = setup_logging()
@@ -107,9 +108,9 @@ WEATHER_CODE_MAP = {
 }
 
 
-def fetch_city_info(location, api_key, api_host):
+async def fetch_city_info(location, api_key, api_host):
     url = f"https://{api_host}/geo/v2/city/lookup?key={api_key}&location={location}&lang=zh"
-    response = requests.get(url, headers=HEADERS).json()
+    response = (await http_client_pool.get(url, headers=HEADERS)).json()
     if response.get("error") is not None:
         logger.bind(tag=TAG).error(
             f"获取天气失败，原因：{response.get('error', {}).get('detail')}"
@@ -118,9 +119,12 @@ def fetch_city_info(location, api_key, api_host):
     return response.get("location", [])[0] if response.get("location") else None
 
 
-def fetch_weather_page(url):
-    response = requests.get(url, headers=HEADERS)
-    return BeautifulSoup(response.text, "html.parser") if response.ok else None
+async def fetch_weather_page(url):
+    response = await http_client_pool.get(url, headers=HEADERS)
+    if not response.is_success:
+        return None
+    # 页面较大，解析放到线程池中，不占用事件循环
+    return await worker_pool.run("io", BeautifulSoup, response.text, "html.parser")
 
 
 def parse_weather_info(soup):
@@ -155,7 +159,7 @@ def parse_weather_info(soup):
 
 
 @register_function("get_weather", GET_WEATHER_FUNCTION_DESC, ToolType.SYSTEM_CTL)
-def get_weather(conn, location: str = None, lang: str = "zh_CN"):
+async def get_weather(conn, location: str = None, lang: str = "zh_CN"):
     from core.utils.cache.manager import cache_manager, CacheType
 
     api_host = conn.config["plugins"]["get_weather"].get(
@@ -177,7 +181,7 @@ def get_weather(conn, location: str = None, lang: str = "zh_CN"):
                 location = cached_ip_info.get("city")
             else:
                 # 缓存未命中，调用API获取
-                ip_info = get_ip_info(client_ip, logger)
+                ip_info = await get_ip_info(client_ip, logger)
                 if ip_info:
                     cache_manager.set(CacheType.IP_INFO, client_ip, ip_info)
                     location = ip_info.get("city")
@@ -194,12 +198,12 @@ def get_weather(conn, location: str = None, lang: str = "zh_CN"):
         return ActionResponse(Action.REQLLM, cached_weather_report, None)
 
     # 缓存未命中，获取实时天气数据
-    city_info = fetch_city_info(location, api_key, api_host)
+    city_info = await fetch_city_info(location, api_key, api_host)
     if not city_info:
         return ActionResponse(
             Action.REQLLM, f"未找到相关的城市: {location}，请确认地点是否正确", None
         )
-    soup = fetch_weather_page(city_info["fxLink"])
+    soup = await fetch_weather_page(city_info["fxLink"])
     if not soup:
         return ActionResponse(Action.REQLLM, None, "请求失败")
     city_name, current_abstract, current_basic, temps_list = parse_weather_info(soup)
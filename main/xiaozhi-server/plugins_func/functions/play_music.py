@@ -1,6 +1,8 @@
 import os
 import re
 import time
+import asyncio
+import hashlib
 import random
 import difflib
 import traceback
@@ -47,9 +49,9 @@ def play_music(conn, song_name: str):
                 action=Action.RESPONSE, result="系统繁忙", response="请稍后再试"
             )
 
-        # 提交异步任务
-        task = conn.loop.create_task(
-            handle_music_command(conn, music_intent)  # 封装异步逻辑
+        # 提交异步任务，插件函数在线程池中执行，需要线程安全地提交到事件循环
+        task = asyncio.run_coroutine_threadsafe(
+            handle_music_command(conn, music_intent), conn.loop  # 封装异步逻辑
         )
 
         # 非阻塞回调处理
@@ -134,13 +136,22 @@ def initialize_music_handler(conn):
             MUSIC_CACHE["music_ext"] = (".mp3", ".wav", ".p3")
             MUSIC_CACHE["refresh_time"] = 60
         # 获取音乐文件列表
-        MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = get_music_files(
-            MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"]
-        )
-        MUSIC_CACHE["scan_time"] = time.time()
+        _scan_music_files()
     return MUSIC_CACHE
 
 
+def _scan_music_files():
+    """扫描音乐目录，更新文件列表及其摘要"""
+    MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = get_music_files(
+        MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"]
+    )
+    # 歌名列表变化时摘要随之变化，依赖歌名列表的缓存据此失效
+    MUSIC_CACHE["fingerprint"] = hashlib.sha1(
+        "\n".join(MUSIC_CACHE["music_file_names"]).encode()
+    ).hexdigest()
+    MUSIC_CACHE["scan_time"] = time.time()
+
+
 async def handle_music_command(conn, text):
     initialize_music_handler(conn)
     global MUSIC_CACHE
@@ -153,10 +164,7 @@ async def handle_music_command(conn, text):
     if os.path.exists(MUSIC_CACHE["music_dir"]):
         if time.time() - MUSIC_CACHE["scan_time"] > MUSIC_CACHE["refresh_time"]:
             # 刷新音乐文件列表
-            MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = (
-                get_music_files(MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"])
-            )
-            MUSIC_CACHE["scan_time"] = time.time()
+            _scan_music_files()
 
         potential_song = _extract_song_name(clean_text)
         if potential_song:
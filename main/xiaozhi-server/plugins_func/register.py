@@ -80,7 +80,12 @@ all_function_registry = {}
 
 
 def register_function(name, desc, type=None):
-    """注册函数到函数注册字典的装饰器"""
+    """注册函数到函数注册字典的装饰器
+
+    被装饰的函数可以是async def，异步函数直接在事件循环中执行，
+    网络请求应使用core.utils.http_client中的http_client_pool，不能有阻塞调用；
+    同步函数在io线程池中执行。
+    """
 
     def decorator(func):
         all_function_registry[name] = FunctionItem(name, desc, func, type)